@@ -0,0 +1,408 @@
+# Registro de analitos laboratoriais reconhecidos por analyze_exam_text.
+#
+# Cada entrada define o nome de exibição, os rótulos (sinônimos literais,
+# comparados com o texto normalizado: ver normalizacao.py), as unidades aceitas
+# com o fator que converte o valor para a unidade canônica e a faixa
+# fisiologicamente plausível (na unidade canônica), usada só para pontuar a
+# confiança da extração, e os códigos LOINC usados na ingestão de resultados
+# estruturados (FHIR/HL7). Incluir um novo exame é só acrescentar uma entrada
+# aqui: o índice de rótulos (indice_rotulos.py) é recompilado a partir deste
+# registro e acha todos os rótulos numa única passada, qualquer que seja o
+# tamanho do catálogo.
+import datetime
+import functools
+import re
+
+from indice_rotulos import IndiceRotulos
+from normalizacao import normalizar, trecho_original
+from registros import Extracao
+
+ANALITOS = {
+    "hemoglobina": {
+        "nome": "Hemoglobina",
+        "rotulos": ["hemoglobina", "hgb"],
+        "unidade": "g/dL",
+        "unidades": {"g/dL": 1.0, "g/L": 0.1, "mmol/L": 1.611},
+        "faixa": (2, 25),
+        "loinc": ["718-7", "59260-0"],
+    },
+    "ferritina": {
+        "nome": "Ferritina",
+        "rotulos": ["ferritina"],
+        "unidade": "ng/mL",
+        "unidades": {"ng/mL": 1.0, "µg/L": 1.0, "ug/L": 1.0, "pmol/L": 0.445},
+        "faixa": (1, 10000),
+        "loinc": ["2276-4"],
+    },
+    "transferrina": {
+        "nome": "Saturação Transferrina",
+        "rotulos": ["transferrina"],
+        "unidade": "%",
+        "unidades": {"%": 1.0},
+        "faixa": (1, 100),
+        "loinc": ["2502-3"],
+    },
+    "calcio": {
+        "nome": "Cálcio",
+        "rotulos": ["calcio"],
+        "unidade": "mg/dL",
+        "unidades": {"mg/dL": 1.0, "mmol/L": 4.008, "mEq/L": 2.004},
+        "faixa": (3, 20),
+        "loinc": ["17861-6", "2000-8"],
+    },
+    "fosforo": {
+        "nome": "Fósforo",
+        "rotulos": ["fosforo", "fosfato"],
+        "unidade": "mg/dL",
+        "unidades": {"mg/dL": 1.0, "mmol/L": 3.097},
+        "faixa": (0.5, 20),
+        "loinc": ["2777-1", "14879-1"],
+    },
+    "pth": {
+        "nome": "PTH",
+        "rotulos": ["pth", "paratormonio"],
+        "unidade": "pg/mL",
+        "unidades": {"pg/mL": 1.0, "ng/L": 1.0, "pmol/L": 9.43},
+        "faixa": (1, 5000),
+        "loinc": ["2731-8"],
+    },
+    "vitamina_d": {
+        "nome": "Vitamina D",
+        "rotulos": [
+            "25-hidroxivitamina d", "25 hidroxivitamina d", "25-hidroxi vitamina d",
+            "25 hidroxi vitamina d", "25-oh vitamina d", "25(oh) vitamina d",
+        ],
+        "unidade": "ng/mL",
+        "unidades": {"ng/mL": 1.0, "nmol/L": 0.4006},
+        "faixa": (1, 200),
+        "loinc": ["1989-3", "62292-8"],
+    },
+    "albumina": {
+        "nome": "Albumina",
+        "rotulos": ["albumina"],
+        "unidade": "g/dL",
+        "unidades": {"g/dL": 1.0, "g/L": 0.1},
+        "faixa": (0.5, 7),
+        "loinc": ["1751-7", "61151-7"],
+    },
+    "potassio": {
+        "nome": "Potássio",
+        "rotulos": ["potassio"],
+        "unidade": "mEq/L",
+        "unidades": {"mEq/L": 1.0, "mmol/L": 1.0},
+        "faixa": (1, 10),
+        "loinc": ["2823-3", "6298-4"],
+    },
+    "bicarbonato": {
+        "nome": "Bicarbonato",
+        "rotulos": ["bicarbonato"],
+        "unidade": "mEq/L",
+        "unidades": {"mEq/L": 1.0, "mmol/L": 1.0},
+        "faixa": (5, 50),
+        "loinc": ["1963-8", "1959-6"],
+    },
+    "kt_v": {
+        "nome": "Kt/V",
+        "rotulos": ["kt/v", "kt / v", "ktv"],
+        "unidade": "",
+        "unidades": {"": 1.0},
+        "faixa": (0.2, 4),
+        "loinc": [],
+    },
+}
+
+
+def registrar_analito(chave, nome, rotulos, unidade, unidades, faixa=None, loinc=()):
+    """Inclui (ou substitui) um analito no registro e invalida o extrator compilado."""
+    ANALITOS[chave] = {
+        "nome": nome, "rotulos": rotulos, "unidade": unidade, "unidades": unidades,
+        "faixa": faixa, "loinc": list(loinc),
+    }
+    compilar_registro.cache_clear()
+    compilar_loinc.cache_clear()
+
+
+def unidade_normalizada(unidade):
+    return normalizar(unidade)[0]
+
+
+def _padrao_unidades(unidades):
+    # Unidades mais longas primeiro, logo após o número (no máximo um espaço, e
+    # opcionalmente entre parênteses ou colchetes: "9.5 (g/dl)"): "10 mg/dL" não
+    # é lida como "g/dL" e a busca nunca avança sobre o texto seguinte
+    alternativas = sorted({unidade_normalizada(u) for u in unidades if u}, key=len, reverse=True)
+    if not alternativas:
+        return ""
+    return r" ?+[(\[]?+ ?+(" + "|".join(re.escape(u) for u in alternativas) + ")"
+
+
+# Marcadores de data de coleta que abrem cada bloco de um laudo cumulativo
+MARCADORES_COLETA = ["data da coleta", "data de coleta", "coletado em", "coletada em", "coleta"]
+COLETA = "__coleta"
+# Rótulos que começam com o de um analito mas medem outra coisa: o índice fica
+# com a ocorrência mais longa, então "calcio ionico" nunca chega a "calcio"
+# (o cálcio iônico, em mmol/L, seria convertido como se fosse o total)
+ROTULOS_IGNORADOS = ["calcio ionico", "calcio ionizado", "calcio livre"]
+IGNORADO = "__ignorado"
+_DATA_COLETA = re.compile(r"[ :]*+(\d{2}/\d{2}/\d{4})")
+# Caracteres após o rótulo em que o valor e a unidade são procurados
+JANELA_VALOR = 80
+
+
+@functools.lru_cache(maxsize=1)
+def compilar_registro():
+    """
+    Compila o registro num índice de rótulos (sinônimo normalizado -> analito, mais
+    os marcadores de coleta) e num padrão de valor/unidade por analito, aplicado só
+    na janela após cada rótulo.
+    """
+    rotulos = {marcador: COLETA for marcador in MARCADORES_COLETA}
+    rotulos.update((rotulo, IGNORADO) for rotulo in ROTULOS_IGNORADOS)
+    for chave, spec in ANALITOS.items():
+        rotulos.update((normalizar(rotulo)[0], chave) for rotulo in spec["rotulos"])
+    # Quantificadores possessivos: o texto normalizado tem ponto decimal e espaços
+    # simples, então o padrão nunca precisa voltar atrás. O primeiro padrão lê o
+    # primeiro número da janela; o segundo, só para analitos com unidade, procura
+    # qualquer número seguido de unidade quando o primeiro não é o resultado
+    # ("PTH (VR 15-65): 700 pg/mL")
+    valores = {}
+    for chave, spec in ANALITOS.items():
+        unidade = _padrao_unidades(spec["unidades"])
+        valores[chave] = (
+            re.compile(r"[^\d]*+(\d++(?:\.\d++)?+)" + unidade),
+            re.compile(r"(?<![\d.])(\d++(?:\.\d++)?+)" + unidade) if unidade else None,
+        )
+    # Unidade normalizada -> grafia do registro: "mg/dl", "MG/DL" -> "mg/dL"
+    unidades = {
+        chave: {unidade_normalizada(u): u for u in spec["unidades"]}
+        for chave, spec in ANALITOS.items()
+    }
+    return IndiceRotulos(rotulos), valores, unidades
+
+
+def _valor_apos(valores, texto, fim_rotulo):
+    """
+    Match do valor na janela após o rótulo, ou None. Se o primeiro número não vier
+    seguido de unidade, fica o primeiro número com unidade que não seja ponta de
+    uma faixa (ou, faltando este, o primeiro com unidade); motivos_ambiguidade
+    aponta a faixa ou a data que ficou entre o rótulo e o valor.
+    """
+    primeiro, busca = valores
+    fim_janela = fim_rotulo + JANELA_VALOR
+    match = primeiro.match(texto, fim_rotulo, fim_janela)
+    if match or busca is None:
+        return match
+    candidatos = list(busca.finditer(texto, fim_rotulo, fim_janela))
+    for candidato in candidatos:
+        if not _ponta_de_faixa(texto, candidato):
+            return candidato
+    return candidatos[0] if candidatos else None
+
+
+def _ponta_de_faixa(texto, match):
+    return bool(
+        _FAIXA_DEPOIS.match(texto, match.end(1))
+        or _FAIXA_ANTES.search(texto, max(0, match.start(1) - 8), match.start(1))
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def compilar_loinc():
+    """Mapa código LOINC -> analito do registro."""
+    return {codigo: chave for chave, spec in ANALITOS.items() for codigo in spec.get("loinc", ())}
+
+
+def fator_conversao(analito, unidade):
+    """Fator que leva `unidade` para a unidade canônica do analito (None se não aceita)."""
+    original = compilar_registro()[2][analito].get(unidade_normalizada(unidade))
+    return None if original is None else ANALITOS[analito]["unidades"][original]
+
+
+def converter_para_canonica(analitos, valores, unidades):
+    """
+    Converte listas paralelas (analito, valor, unidade) para as unidades canônicas
+    numa única passada. Valores já na unidade canônica são mantidos sem arredondamento.
+    """
+    convertidos = []
+    for analito, valor, unidade in zip(analitos, valores, unidades):
+        fator = fator_conversao(analito, unidade)
+        if fator is None:
+            convertidos.append(None)
+        elif fator == 1.0:
+            convertidos.append(valor)
+        else:
+            convertidos.append(round(valor * fator, 2))
+    return convertidos
+
+
+# Pontuação de confiança: cada indício de ambiguidade desconta da confiança 1.0
+LIMIAR_CONFIANCA = 0.7
+DISTANCIA_ROTULO = 20  # caracteres entre o rótulo e o valor
+PENALIDADES = {
+    "distante do rótulo": 0.2,
+    "referência antes do valor": 0.4,
+    "faixa de referência": 0.4,
+    "parece data": 0.5,
+    "fora da faixa fisiológica": 0.5,
+    "valor não encontrado": 1.0,
+}
+_REFERENCIA_ANTES = re.compile(r"referencia|\bv\.?r\b|\bref\b|intervalo")
+_FAIXA_DEPOIS = re.compile(r" ?(?:-|–|a|ate) ?\d")
+_FAIXA_ANTES = re.compile(r"\d ?(?:-|–|a|ate) ?$")
+_FAIXA = re.compile(r"\d ?(?:-|–|a|ate) ?\d")
+_DATA = re.compile(r"\d{1,2}[/.]\d{1,2}[/.]\d{2,4}")
+
+
+def motivos_ambiguidade(text, fim_rotulo, match, analito, valor):
+    """Indícios, tirados do próprio match (no texto normalizado), de que o número lido pode não ser o resultado."""
+    motivos = []
+    entre = text[fim_rotulo:match.start(1)]
+    if len(entre) > DISTANCIA_ROTULO:
+        motivos.append("distante do rótulo")
+    if _REFERENCIA_ANTES.search(entre):
+        motivos.append("referência antes do valor")
+    if _FAIXA_DEPOIS.match(text, match.end(1)) or _FAIXA.search(entre):
+        motivos.append("faixa de referência")
+    if _DATA.match(text, match.start(1)) or _DATA.search(entre):
+        motivos.append("parece data")
+    faixa = ANALITOS[analito].get("faixa")
+    if valor is not None and faixa and not faixa[0] <= valor <= faixa[1]:
+        motivos.append("fora da faixa fisiológica")
+    return motivos
+
+
+def confianca(motivos):
+    return round(max(0.0, 1.0 - sum(PENALIDADES[m] for m in motivos)), 2)
+
+
+def extrair_valores_detalhados(text):
+    """
+    Como extrair_valores, mas com a origem e a confiança de cada valor encontrado.
+
+    Returns:
+        dict: {analito: Extracao(valor, unidade, confianca, motivos, trecho,
+        trecho_valor)} só para os analitos encontrados, na ordem do texto.
+        "trecho" vai do rótulo à unidade e "trecho_valor" cobre o número,
+        ambos como (início, fim) em `text` (o original, não o normalizado).
+        Analitos cujo rótulo aparece sem valor legível vêm por último, com valor
+        e trecho_valor None e confiança 0.
+    """
+    indice, valores, unidades_registro = compilar_registro()
+    normalizado, mapa = normalizar(text)
+    encontrados = {}
+    sem_valor = {}
+    for inicio, fim, analito in indice.buscar(normalizado):
+        if analito in (COLETA, IGNORADO) or analito in encontrados:
+            continue
+        match = _valor_apos(valores[analito], normalizado, fim)
+        if match:
+            encontrados[analito] = ((inicio, fim), match)
+        else:
+            sem_valor.setdefault(analito, (inicio, fim))
+
+    chaves = list(encontrados)
+    unidades = [
+        unidades_registro[analito][m.group(2)] if m.lastindex == 2 else ""
+        for analito, (_, m) in encontrados.items()
+    ]
+    convertidos = converter_para_canonica(
+        chaves, [float(m.group(1)) for _, m in encontrados.values()], unidades
+    )
+
+    detalhes = {}
+    for analito, unidade, valor in zip(chaves, unidades, convertidos):
+        (inicio, fim), match = encontrados[analito]
+        motivos = motivos_ambiguidade(normalizado, fim, match, analito, valor)
+        detalhes[analito] = Extracao(
+            valor=valor,
+            unidade=unidade,
+            confianca=confianca(motivos),
+            motivos=motivos,
+            trecho=trecho_original(mapa, inicio, match.end()),
+            trecho_valor=trecho_original(mapa, *match.span(1)),
+        )
+    # Rótulo sem valor legível na janela: entra sem valor e com confiança zero,
+    # para ir à revisão em vez de sumir do relatório
+    for analito, (inicio, fim) in sem_valor.items():
+        if analito not in detalhes:
+            motivos = ["valor não encontrado"]
+            detalhes[analito] = Extracao(
+                valor=None,
+                unidade="",
+                confianca=confianca(motivos),
+                motivos=motivos,
+                trecho=trecho_original(mapa, inicio, fim),
+                trecho_valor=None,
+            )
+    return detalhes
+
+
+def valores_de(detalhes):
+    """{analito: valor ou None} na ordem do registro, a partir de extrair_valores_detalhados."""
+    resultado = dict.fromkeys(ANALITOS)
+    resultado.update((analito, d.valor) for analito, d in detalhes.items())
+    return resultado
+
+
+def extrair_valores(text):
+    """
+    Extrai o primeiro valor de cada analito do registro numa única varredura de rótulos.
+
+    Returns:
+        dict: {analito: valor na unidade canônica ou None}, na ordem do registro.
+    """
+    return valores_de(extrair_valores_detalhados(text))
+
+
+def valores_ambiguos(detalhes, limiar=LIMIAR_CONFIANCA):
+    """Analitos cuja confiança ficou abaixo de `limiar` e que merecem revisão manual."""
+    return [analito for analito, d in detalhes.items() if d.confianca < limiar]
+
+
+def _data_iso(data):
+    try:
+        return datetime.datetime.strptime(data, "%d/%m/%Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+def extrair_serie(text):
+    """
+    Extrai todos os trios (data de coleta, analito, valor) de um laudo numa única varredura.
+
+    Cada valor é atribuído à última "Data da Coleta" que o precede; valores antes
+    de qualquer data ficam com data None. Só o primeiro valor de cada analito por
+    data é mantido.
+
+    Returns:
+        dict: Colunas paralelas {"data": [...], "analito": [...], "valor": [...]},
+        com datas ISO e valores na unidade canônica.
+    """
+    indice, valores, unidades_registro = compilar_registro()
+    text, _ = normalizar(text)
+    data_atual = None
+    vistos = set()
+    datas, analitos, brutos, unidades = [], [], [], []
+
+    for _, fim, analito in indice.buscar(text):
+        if analito == COLETA:
+            data = _DATA_COLETA.match(text, fim)
+            if data:
+                data_atual = _data_iso(data.group(1))
+            continue
+        if analito == IGNORADO or (data_atual, analito) in vistos:
+            continue
+        match = _valor_apos(valores[analito], text, fim)
+        if not match:
+            continue
+        vistos.add((data_atual, analito))
+        datas.append(data_atual)
+        analitos.append(analito)
+        brutos.append(float(match.group(1)))
+        unidades.append(unidades_registro[analito][match.group(2)] if match.lastindex == 2 else "")
+
+    return {
+        "data": datas,
+        "analito": analitos,
+        "valor": converter_para_canonica(analitos, brutos, unidades),
+    }
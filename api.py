@@ -0,0 +1,291 @@
+# Serviço HTTP (ASGI) do pipeline de análise, para integração com o sistema do laboratório.
+#
+# Uso: PCDT_API_TOKEN=... uvicorn api:app --host 127.0.0.1 --port 8000
+#
+# O serviço processa dados de pacientes: escute só em localhost, atrás de um
+# proxy reverso com TLS, e exija o token compartilhado em todas as rotas
+# (cabeçalho "Authorization: Bearer <token>" ou "X-API-Key: <token>"). Sem
+# PCDT_API_TOKEN configurado toda requisição é recusada com 503.
+#
+# Extração, análise e exportação rodam num pool de processos (PCDT_API_WORKERS,
+# padrão: número de CPUs); o loop do servidor só recebe, despacha e responde,
+# então requisições concorrentes não se bloqueiam. Os relatórios ficam em memória
+# (os MAX_RELATORIOS mais recentes) para GET /report/{id}; com ?salvar=1 também
+# são gravados no Supabase.
+#
+#   POST /analyze       corpo application/pdf, text/plain ou JSON {"texto"} / {"pdf_base64"}
+#   POST /batch         JSON {"exames": [{"texto"} | {"pdf_base64"}, ...]}
+#   GET  /report/{id}   ?formato=json (padrão), txt, pdf ou docx
+#
+# Corpos acima de MAX_CORPO (o limite de PDF do pdf_parser, com folga para base64)
+# são recusados com 413 sem serem lidos por inteiro.
+import asyncio
+import base64
+import binascii
+import contextlib
+import datetime
+import hmac
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from analitos import extrair_serie
+from auditoria import registrar_analise
+from diagnosis_engine import analyze_exam_text, build_report, serializar_trilha
+from identidade import hash_exame
+from pdf_parser import MAX_BYTES_PDF, ArquivoGrandeDemais, extract_text_from_pdf
+from servico_exportacao import FORMATOS
+from templates_relatorio import renderizar_texto
+
+MAX_WORKERS = int(os.getenv("PCDT_API_WORKERS", "0")) or None
+MAX_RELATORIOS = 1000
+MAX_LOTE = 100
+MAX_CORPO = MAX_BYTES_PDF * 4 // 3 + 64 * 1024
+TIPOS_MIDIA = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "msgpack": "application/msgpack",
+}
+
+_executor = None
+_lock = threading.Lock()
+_relatorios = OrderedDict()
+
+
+class RequisicaoInvalida(ValueError):
+    """Corpo ou parâmetro inválido: vira resposta 400."""
+
+
+class ExigirToken:
+    """Middleware ASGI: só deixa passar requisições com o token de PCDT_API_TOKEN."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # Lido a cada requisição: trocar o token não exige reiniciar o serviço
+        esperado = os.getenv("PCDT_API_TOKEN", "")
+        if not esperado:
+            resposta = _erro(503, "PCDT_API_TOKEN não configurado")
+        elif not hmac.compare_digest(_token(scope).encode("utf-8"), esperado.encode("utf-8")):
+            resposta = _erro(401, "token ausente ou inválido")
+        else:
+            return await self.app(scope, receive, send)
+        await resposta(scope, receive, send)
+
+
+def _token(scope):
+    cabecalhos = {nome.lower(): valor.decode("latin-1") for nome, valor in scope["headers"]}
+    autorizacao = cabecalhos.get(b"authorization", "")
+    if autorizacao[:7].lower() == "bearer ":
+        return autorizacao[7:].strip()
+    return cabecalhos.get(b"x-api-key", "")
+
+
+# --- Trabalho pesado: executado nos processos do pool ---
+
+def analisar_exame(conteudo, pdf=False):
+    """Extrai (se PDF) e analisa um exame; retorna o texto, o relatório estruturado e as extrações."""
+    if pdf:
+        # OCR sem pool próprio: o paralelismo já vem do pool da API
+        texto = extract_text_from_pdf(io.BytesIO(conteudo), ocr_workers=1, somente_laboratorio=True)
+    else:
+        texto = conteudo
+    parsed = analyze_exam_text(texto)
+    parsed.serie = extrair_serie(texto)
+    return texto, build_report(parsed), parsed.extracoes
+
+
+def exportar_relatorio(relatorio, formato):
+    return FORMATOS[formato](relatorio).getvalue()
+
+
+# --- Loop do servidor ---
+
+def _obter_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+        return _executor
+
+
+async def _no_pool(funcao, *args):
+    return await asyncio.get_running_loop().run_in_executor(_obter_executor(), funcao, *args)
+
+
+def _guardar(texto, relatorio):
+    identificador = hash_exame(texto)
+    with _lock:
+        _relatorios[identificador] = relatorio
+        _relatorios.move_to_end(identificador)
+        while len(_relatorios) > MAX_RELATORIOS:
+            _relatorios.popitem(last=False)
+    return identificador
+
+
+def _salvar(texto, relatorio, extracoes):
+    # Importado aqui: o cliente do Supabase exige credenciais só quando se pede para salvar
+    import supabase_client
+
+    # Como em monitor_pasta: trechos para a fila de revisão e a data de hoje para resultados sem data de coleta
+    supabase_client.salvar_analise(relatorio, texto, extracoes, data_padrao=datetime.date.today().isoformat())
+
+
+def _exame_json(item):
+    if isinstance(item.get("texto"), str):
+        return item["texto"], False
+    if isinstance(item.get("pdf_base64"), str):
+        try:
+            return base64.b64decode(item["pdf_base64"], validate=True), True
+        except binascii.Error:
+            raise RequisicaoInvalida("pdf_base64 inválido")
+    raise RequisicaoInvalida('cada exame precisa de "texto" ou "pdf_base64"')
+
+
+async def _ler_corpo(request, limite=None):
+    """Lê o corpo em blocos, parando assim que passar de `limite` bytes."""
+    limite = MAX_CORPO if limite is None else limite
+    declarado = request.headers.get("content-length", "")
+    if declarado.isdigit() and int(declarado) > limite:
+        raise ArquivoGrandeDemais(f"corpo maior que o limite de {limite} bytes")
+    partes, total = [], 0
+    async for bloco in request.stream():
+        total += len(bloco)
+        if total > limite:
+            raise ArquivoGrandeDemais(f"corpo maior que o limite de {limite} bytes")
+        partes.append(bloco)
+    return b"".join(partes)
+
+
+def _json(corpo):
+    try:
+        return json.loads(corpo)
+    except (ValueError, UnicodeDecodeError):
+        raise RequisicaoInvalida("JSON inválido")
+
+
+async def _ler_exame(request):
+    tipo = request.headers.get("content-type", "").split(";")[0].strip()
+    corpo = await _ler_corpo(request)
+    if not corpo:
+        raise RequisicaoInvalida("corpo vazio")
+    if tipo == "application/pdf":
+        return corpo, True
+    if tipo == "text/plain":
+        try:
+            return corpo.decode("utf-8"), False
+        except UnicodeDecodeError:
+            raise RequisicaoInvalida("texto deve estar em UTF-8")
+    if tipo == "application/json":
+        try:
+            return _exame_json(_json(corpo))
+        except AttributeError:
+            raise RequisicaoInvalida("JSON inválido")
+    raise RequisicaoInvalida(f"tipo de conteúdo não suportado: {tipo or 'ausente'}")
+
+
+async def _processar(conteudo, pdf, salvar):
+    texto, relatorio, extracoes = await _no_pool(analisar_exame, conteudo, pdf)
+    registrar_analise(texto, relatorio)
+    if salvar:
+        await run_in_threadpool(_salvar, texto, relatorio, extracoes)
+    return {"id": _guardar(texto, relatorio), "relatorio": relatorio}
+
+
+def _erro(status, mensagem):
+    return JSONResponse({"erro": mensagem}, status_code=status)
+
+
+async def analisar(request):
+    try:
+        conteudo, pdf = await _ler_exame(request)
+        return JSONResponse(await _processar(conteudo, pdf, request.query_params.get("salvar") == "1"))
+    except RequisicaoInvalida as e:
+        return _erro(400, str(e))
+    except ArquivoGrandeDemais as e:
+        return _erro(413, str(e))
+    except ValueError as e:
+        # PDF ilegível (extract_text_from_pdf)
+        return _erro(422, str(e))
+
+
+async def lote(request):
+    try:
+        exames = _json(await _ler_corpo(request))["exames"]
+        if not isinstance(exames, list) or not exames:
+            raise RequisicaoInvalida('"exames" deve ser uma lista não vazia')
+        if len(exames) > MAX_LOTE:
+            raise RequisicaoInvalida(f"no máximo {MAX_LOTE} exames por lote")
+        entradas = [_exame_json(item) for item in exames]
+    except RequisicaoInvalida as e:
+        return _erro(400, str(e))
+    except ArquivoGrandeDemais as e:
+        return _erro(413, str(e))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return _erro(400, 'esperado JSON {"exames": [...]}')
+
+    salvar = request.query_params.get("salvar") == "1"
+    # Todos os exames vão para o pool de uma vez; a falha de um não derruba os outros
+    resultados = await asyncio.gather(
+        *(_processar(conteudo, pdf, salvar) for conteudo, pdf in entradas), return_exceptions=True
+    )
+    return JSONResponse({"resultados": [
+        {"erro": str(r)} if isinstance(r, Exception) else r for r in resultados
+    ]})
+
+
+async def relatorio(request):
+    with _lock:
+        encontrado = _relatorios.get(request.path_params["id"])
+    if encontrado is None:
+        return _erro(404, "relatório não encontrado")
+
+    formato = request.query_params.get("formato", "json")
+    if formato == "json":
+        return JSONResponse(encontrado)
+    if formato == "txt":
+        return PlainTextResponse(renderizar_texto(encontrado))
+    if formato == "trilha":
+        # Só a trilha de decisões; msgpack se o cliente pedir e o pacote estiver instalado
+        codificacao = "msgpack" if TIPOS_MIDIA["msgpack"] in request.headers.get("accept", "") else "json"
+        try:
+            conteudo = serializar_trilha(encontrado.get("trilha", []), codificacao)
+        except ValueError as e:
+            return _erro(406, str(e))
+        return Response(conteudo, media_type=TIPOS_MIDIA.get(codificacao, "application/json"))
+    if formato in FORMATOS:
+        conteudo = await _no_pool(exportar_relatorio, encontrado, formato)
+        return Response(conteudo, media_type=TIPOS_MIDIA[formato])
+    return _erro(400, f"formato desconhecido: {formato}")
+
+
+@contextlib.asynccontextmanager
+async def _ciclo_de_vida(app):
+    yield
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+app = Starlette(
+    routes=[
+        Route("/analyze", analisar, methods=["POST"]),
+        Route("/batch", lote, methods=["POST"]),
+        Route("/report/{id}", relatorio, methods=["GET"]),
+    ],
+    middleware=[Middleware(ExigirToken)],
+    lifespan=_ciclo_de_vida,
+)
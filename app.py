@@ -1,9 +1,51 @@
+import datetime
+import hashlib
 import streamlit as st
 from pdf_parser import extract_text_from_pdf
-from diagnosis_engine import analyze_exam_text, generate_report
-from exporter import gerar_pdf_relatorio
-from docx_exporter import gerar_docx_relatorio
-from supabase_client import registrar_relatorio
+from analitos import ANALITOS, extrair_serie
+from auditoria import registrar_analise
+from diagnosis_engine import analyze_exam_text, build_report
+from templates_relatorio import renderizar_texto
+from servico_exportacao import exportar
+from supabase_client import enfileirar_revisao, registrar_relatorio_estruturado, registrar_serie_resultados
+
+MAX_ANALISES_SESSAO = 3
+# O texto completo de um pacote grande travaria o navegador; a análise usa o texto inteiro
+PREVIA_MAX_CARACTERES = 20000
+
+
+def hash_do_upload(arquivo):
+    """
+    SHA-256 do PDF enviado, calculado uma vez por upload (file_id do Streamlit).
+
+    As reexecuções do mesmo upload só consultam a sessão, sem reler o arquivo.
+    """
+    hashes = st.session_state.setdefault("hashes_upload", {})
+    if arquivo.file_id not in hashes:
+        hashes.clear()  # o uploader guarda um arquivo por vez
+        with arquivo.getbuffer() as conteudo:
+            hashes[arquivo.file_id] = hashlib.sha256(conteudo).hexdigest()
+    return hashes[arquivo.file_id]
+
+
+def analise_do_arquivo(arquivo):
+    """
+    Estado da análise do arquivo enviado em st.session_state, indexado pelo hash do PDF.
+
+    O Streamlit reexecuta o script a cada interação; guardando texto, relatório e
+    exportações na sessão, as reexecuções não refazem extração nem análise.
+    """
+    chave = hash_do_upload(arquivo)
+    analises = st.session_state.setdefault("analises", {})
+    if chave not in analises:
+        with st.spinner("Extraindo texto do PDF..."):
+            texto = extract_text_from_pdf(arquivo, somente_laboratorio=True)
+        # Mantém só os últimos arquivos da sessão
+        while len(analises) >= MAX_ANALISES_SESSAO:
+            analises.pop(next(iter(analises)))
+        analises[chave] = {"texto": texto}
+    return analises[chave]
+
 
 st.title("PCDT Diálise Assistente")
 st.markdown("### Sistema de Análise de Exames para Pacientes em Diálise")
@@ -11,18 +53,38 @@ st.markdown("### Sistema de Análise de Exames para Pacientes em Diálise")
 uploaded_file = st.file_uploader("Envie o PDF do exame", type="pdf")
 
 if uploaded_file:
-    with st.spinner("Extraindo texto do PDF..."):
-        texto = extract_text_from_pdf(uploaded_file)
+    try:
+        estado = analise_do_arquivo(uploaded_file)
+    except ValueError as e:
+        # PDF ilegível ou acima dos limites de tamanho/páginas (pdf_parser)
+        st.error(f"❌ {e}")
+        st.stop()
+    texto = estado["texto"]
 
     st.success("✅ Texto extraído com sucesso!")
 
     with st.expander("📄 Texto extraído do PDF"):
-        st.text_area("Conteúdo:", texto, height=300)
+        st.text_area("Conteúdo:", texto[:PREVIA_MAX_CARACTERES], height=300)
+        if len(texto) > PREVIA_MAX_CARACTERES:
+            st.caption(f"Prévia: {PREVIA_MAX_CARACTERES} de {len(texto)} caracteres.")
 
-    if st.button("🔍 Analisar Exames"):
+    if st.button("🔍 Analisar Exames") and "relatorio" not in estado:
         with st.spinner("Analisando valores laboratoriais..."):
             resultado = analyze_exam_text(texto)
-            relatorio = generate_report(resultado)
+            resultado.serie = extrair_serie(texto)
+            relatorio_estruturado = build_report(resultado)
+            estado["resultado"] = resultado
+            estado["relatorio_estruturado"] = relatorio_estruturado
+            estado["relatorio"] = renderizar_texto(relatorio_estruturado)
+            registrar_analise(texto, relatorio_estruturado)
+            # PDF e DOCX começam a ser gerados em paralelo enquanto a página é montada
+            estado["exportacoes"] = exportar(relatorio_estruturado)
+
+    if "relatorio" in estado:
+        resultado = estado["resultado"]
+        relatorio_estruturado = estado["relatorio_estruturado"]
+        relatorio = estado["relatorio"]
+        exportacoes = estado["exportacoes"]
 
         st.success("✅ Análise concluída!")
 
@@ -30,34 +92,25 @@ if uploaded_file:
         st.subheader("👤 Dados do Paciente")
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Nome", resultado["meta"]["nome"])
+            st.metric("Nome", resultado.meta.nome)
         with col2:
-            st.metric("Idade", resultado["meta"]["idade"])
+            st.metric("Idade", resultado.meta.idade)
         with col3:
-            st.metric("Modalidade", resultado["meta"]["modalidade"])
+            st.metric("Modalidade", resultado.meta.modalidade)
 
         # Mostrar valores laboratoriais
         st.subheader("🧪 Valores Laboratoriais")
-        dados = resultado["dados"]
+        dados = resultado.dados
 
-        col1, col2 = st.columns(2)
-        with col1:
-            if dados["hemoglobina"]:
-                st.metric("Hemoglobina", f"{dados['hemoglobina']} g/dL")
-            if dados["ferritina"]:
-                st.metric("Ferritina", f"{dados['ferritina']} ng/mL")
-            if dados["calcio"]:
-                st.metric("Cálcio", f"{dados['calcio']} mg/dL")
-            if dados["fosforo"]:
-                st.metric("Fósforo", f"{dados['fosforo']} mg/dL")
+        colunas = st.columns(2)
+        presentes = [chave for chave in ANALITOS if dados.get(chave)]
+        for i, chave in enumerate(presentes):
+            with colunas[i % 2]:
+                st.metric(ANALITOS[chave]["nome"], f"{dados[chave]} {ANALITOS[chave]['unidade']}".strip())
 
-        with col2:
-            if dados["pth"]:
-                st.metric("PTH", f"{dados['pth']} pg/mL")
-            if dados["vitamina_d"]:
-                st.metric("Vitamina D", f"{dados['vitamina_d']} ng/mL")
-            if dados["transferrina"]:
-                st.metric("Saturação Transferrina", f"{dados['transferrina']} %")
+        if relatorio_estruturado.get("revisar"):
+            nomes = ", ".join(ANALITOS[chave]["nome"] for chave in relatorio_estruturado["revisar"])
+            st.warning(f"⚠️ Conferir no laudo, extração ambígua: {nomes}")
 
         # Mostrar relatório completo
         st.subheader("📋 Relatório Clínico")
@@ -68,31 +121,34 @@ if uploaded_file:
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            pdf_buffer = gerar_pdf_relatorio(relatorio)
             st.download_button(
                 label="📥 Download PDF",
-                data=pdf_buffer,
+                data=exportacoes["pdf"].result(),
                 file_name="relatorio_pcdt.pdf",
                 mime="application/pdf"
             )
 
         with col2:
-            docx_buffer = gerar_docx_relatorio(relatorio)
             st.download_button(
                 label="📥 Download DOCX",
-                data=docx_buffer,
+                data=exportacoes["docx"].result(),
                 file_name="relatorio_pcdt.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             )
 
         with col3:
-            if st.button("☁️ Salvar no Supabase"):
+            if estado.get("salvo"):
+                st.success("✅ Relatório salvo no banco de dados!")
+            elif st.button("☁️ Salvar no Supabase"):
                 try:
-                    # Criar resumo dos diagnósticos
-                    linhas_diagnostico = [linha for linha in relatorio.split('\n') if 'Diagnósticos prováveis:' in linha or linha.strip().startswith('-')]
-                    resumo = linhas_diagnostico[1] if len(linhas_diagnostico) > 1 else "Relatório gerado"
-
-                    registrar_relatorio(resultado["meta"], resumo.strip('- '), relatorio)
+                    hoje = datetime.date.today().isoformat()
+                    paciente_id = registrar_relatorio_estruturado(
+                        relatorio_estruturado, texto_exame=texto, data_padrao=hoje
+                    )
+                    registrar_serie_resultados(paciente_id, resultado.serie, data_padrao=hoje)
+                    estado["salvo"] = True
                     st.success("✅ Relatório salvo no banco de dados!")
+                    if enfileirar_revisao(relatorio_estruturado, texto, resultado.extracoes):
+                        st.info("📝 Exame enviado para a fila de revisão.")
                 except Exception as e:
-                    st.error(f"❌ Erro ao salvar: {str(e)}")
\ No newline at end of file
+                    st.error(f"❌ Erro ao salvar: {str(e)}")
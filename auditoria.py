@@ -0,0 +1,193 @@
+# Log de auditoria das análises: qual exame (hash), versão das regras e valores
+# extraídos produziram cada relatório.
+#
+# Só acrescenta, nunca reescreve. Cada processo grava seus próprios segmentos
+# (AAAAMMDD-<pid>-<n>.seg), trocados a cada dia (UTC) ou ao atingir
+# TAMANHO_SEGMENTO. Um registro é [tamanho >I][momento >d][hash do exame 32B]
+# [chave do paciente 32B][JSON compacto com versão, valores e diagnósticos].
+# Ao lado de cada segmento, o .idx guarda (chave do paciente 32B, posição >Q)
+# em tamanho fixo: a busca por paciente lê só os índices dos dias pedidos.
+import atexit
+import datetime
+import json
+import os
+import struct
+import threading
+from pathlib import Path
+
+from identidade import chave_paciente, hash_exame
+
+TAMANHO_SEGMENTO = 8 * 1024 * 1024
+_TAMANHO = struct.Struct(">I")
+_CABECALHO = struct.Struct(">d32s32s")
+_ENTRADA_INDICE = struct.Struct(">32sQ")
+_SEM_CHAVE = bytes(32)
+
+_lock = threading.Lock()
+_ativo = None  # {"dia", "numero", "caminho", "segmento", "indice"}
+
+
+def diretorio_auditoria():
+    """Diretório dos segmentos, sob PCDT_AUDIT_DIR (padrão ~/.local/share/pcdt-dialise/auditoria)."""
+    base = os.getenv("PCDT_AUDIT_DIR") or os.path.join(
+        os.path.expanduser("~"), ".local", "share", "pcdt-dialise", "auditoria"
+    )
+    caminho = Path(base)
+    caminho.mkdir(parents=True, exist_ok=True)
+    return caminho
+
+
+def fechar():
+    """Fecha o segmento ativo; o próximo registro abre um novo."""
+    global _ativo
+    with _lock:
+        if _ativo is not None:
+            _ativo["segmento"].close()
+            _ativo["indice"].close()
+            _ativo = None
+
+
+atexit.register(fechar)
+
+
+def _abrir(dia, numero):
+    caminho = diretorio_auditoria() / f"{dia:%Y%m%d}-{os.getpid()}-{numero:03d}.seg"
+    return {
+        "dia": dia,
+        "numero": numero,
+        "caminho": caminho,
+        "segmento": open(caminho, "ab"),
+        "indice": open(caminho.with_suffix(".idx"), "ab"),
+    }
+
+
+def _segmento_ativo(dia):
+    global _ativo
+    if _ativo is None or _ativo["dia"] != dia:
+        if _ativo is not None:
+            _ativo["segmento"].close()
+            _ativo["indice"].close()
+        _ativo = _abrir(dia, 0)
+    elif _ativo["segmento"].tell() >= TAMANHO_SEGMENTO:
+        _ativo["segmento"].close()
+        _ativo["indice"].close()
+        _ativo = _abrir(dia, _ativo["numero"] + 1)
+    return _ativo
+
+
+def _codificar(momento, texto_exame, relatorio):
+    chave = chave_paciente(relatorio["meta"])
+    corpo = json.dumps({
+        "v": relatorio.get("versao_regras"),
+        "d": {analito: valor for analito, valor in relatorio["dados"].items() if valor is not None},
+        "dx": relatorio.get("diagnosticos", []),
+    }, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    cabecalho = _CABECALHO.pack(
+        momento.timestamp(),
+        bytes.fromhex(hash_exame(texto_exame)),
+        bytes.fromhex(chave) if chave else _SEM_CHAVE,
+    )
+    registro = cabecalho + corpo
+    return _TAMANHO.pack(len(registro)) + registro, chave
+
+
+def registrar_analise(texto_exame, relatorio, momento=None):
+    """
+    Acrescenta ao log a análise de `texto_exame` que gerou `relatorio` (build_report).
+
+    O custo no caminho da análise é uma escrita curta no arquivo já aberto (sem
+    fsync): o registro vai para o sistema operacional, não necessariamente ao disco.
+    """
+    momento = momento or datetime.datetime.now(datetime.timezone.utc)
+    dados, chave = _codificar(momento, texto_exame, relatorio)
+    with _lock:
+        ativo = _segmento_ativo(momento.astimezone(datetime.timezone.utc).date())
+        posicao = ativo["segmento"].tell()
+        ativo["segmento"].write(dados)
+        ativo["segmento"].flush()
+        # O índice só aponta para registros já gravados por inteiro
+        if chave:
+            ativo["indice"].write(_ENTRADA_INDICE.pack(bytes.fromhex(chave), posicao))
+            ativo["indice"].flush()
+
+
+def _decodificar(registro):
+    momento, exame, chave = _CABECALHO.unpack_from(registro)
+    corpo = json.loads(registro[_CABECALHO.size:].decode("utf-8"))
+    return {
+        "momento": datetime.datetime.fromtimestamp(momento, datetime.timezone.utc).isoformat(),
+        "hash_exame": exame.hex(),
+        "chave_paciente": None if chave == _SEM_CHAVE else chave.hex(),
+        "versao_regras": corpo["v"],
+        "dados": corpo["d"],
+        "diagnosticos": corpo["dx"],
+    }
+
+
+def _ler_registro(arquivo):
+    tamanho = arquivo.read(_TAMANHO.size)
+    if len(tamanho) < _TAMANHO.size:
+        return None
+    esperado = _TAMANHO.unpack(tamanho)[0]
+    registro = arquivo.read(esperado)
+    if len(registro) < esperado:
+        return None  # registro incompleto no fim (processo interrompido durante a escrita)
+    return _decodificar(registro)
+
+
+def ler_segmento(caminho):
+    """Todos os registros completos de um segmento, na ordem de gravação."""
+    with open(caminho, "rb") as arquivo:
+        while True:
+            registro = _ler_registro(arquivo)
+            if registro is None:
+                return
+            yield registro
+
+
+def _posicoes(caminho_indice, chave):
+    try:
+        conteudo = Path(caminho_indice).read_bytes()
+    except FileNotFoundError:
+        return []
+    completo = len(conteudo) - len(conteudo) % _ENTRADA_INDICE.size
+    return [posicao for entrada, posicao in _ENTRADA_INDICE.iter_unpack(conteudo[:completo]) if entrada == chave]
+
+
+def segmentos(desde=None, ate=None):
+    """Segmentos cujo dia está entre `desde` e `ate` (datetime.date, inclusivos), em ordem."""
+    encontrados = []
+    for caminho in diretorio_auditoria().glob("*.seg"):
+        dia = datetime.datetime.strptime(caminho.name[:8], "%Y%m%d").date()
+        if (desde is None or dia >= desde) and (ate is None or dia <= ate):
+            encontrados.append((dia, caminho.name, caminho))
+    return [caminho for _, _, caminho in sorted(encontrados)]
+
+
+def consultar(meta=None, desde=None, ate=None):
+    """
+    Registros de auditoria, opcionalmente de um paciente (meta com nome e nascimento)
+    e de um intervalo de dias UTC.
+
+    Com `meta`, só os índices são varridos e o segmento é lido nas posições do paciente.
+    """
+    if meta is None:
+        return [registro for caminho in segmentos(desde, ate) for registro in ler_segmento(caminho)]
+
+    chave = chave_paciente(meta)
+    if chave is None:
+        return []
+    chave = bytes.fromhex(chave)
+
+    registros = []
+    for caminho in segmentos(desde, ate):
+        posicoes = _posicoes(caminho.with_suffix(".idx"), chave)
+        if not posicoes:
+            continue
+        with open(caminho, "rb") as arquivo:
+            for posicao in posicoes:
+                arquivo.seek(posicao)
+                registro = _ler_registro(arquivo)
+                if registro is not None:
+                    registros.append(registro)
+    return registros
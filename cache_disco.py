@@ -0,0 +1,33 @@
+# Cache em disco para resultados caros (OCR de páginas, gráficos renderizados)
+import os
+import tempfile
+from pathlib import Path
+
+
+def diretorio_cache(namespace):
+    """Diretório do cache para `namespace`, sob PCDT_CACHE_DIR (padrão ~/.cache/pcdt-dialise)."""
+    base = os.getenv("PCDT_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "pcdt-dialise")
+    caminho = Path(base) / namespace
+    caminho.mkdir(parents=True, exist_ok=True)
+    return caminho
+
+
+def ler_cache(namespace, chave):
+    """Retorna o conteúdo gravado para `chave`, ou None se ausente."""
+    try:
+        return (diretorio_cache(namespace) / chave).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def gravar_cache(namespace, chave, conteudo):
+    """Grava `conteudo` (bytes) de forma atômica, seguro entre processos concorrentes."""
+    destino = diretorio_cache(namespace) / chave
+    fd, temporario = tempfile.mkstemp(dir=destino.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, destino)
+    except BaseException:
+        os.unlink(temporario)
+        raise
@@ -1,3 +1,77 @@
-# dashboard
+# Painel da coorte: pacientes por diagnóstico e modalidade.
+#
+# Uso: streamlit run dashboard.py
+#
+# Lê só resumo_pacientes (uma linha por paciente, mantida pelo banco a cada
+# relatório gravado) e a view contagem_diagnosticos; o tempo de abertura não
+# depende do tamanho do histórico de relatórios.
+import math
+
 import streamlit as st
-st.title('Dashboard')
\ No newline at end of file
+
+from analitos import ANALITOS
+from supabase_client import TAMANHO_PAGINA_RESUMO, contar_diagnosticos, listar_resumo_pacientes
+
+TODAS = "Todas"
+TODOS = "Todos"
+
+st.title('Dashboard')
+
+contagens = contar_diagnosticos()
+modalidades = sorted({linha["modalidade"] for linha in contagens if linha["modalidade"]})
+
+coluna_modalidade, coluna_diagnostico = st.columns(2)
+modalidade = coluna_modalidade.selectbox(
+    "Modalidade", [TODAS] + modalidades,
+    on_change=lambda: st.session_state.update(pagina_dashboard=0),
+)
+
+por_diagnostico = {}
+for linha in contagens:
+    if modalidade in (TODAS, linha["modalidade"]):
+        por_diagnostico[linha["diagnostico"]] = por_diagnostico.get(linha["diagnostico"], 0) + linha["pacientes"]
+diagnostico = coluna_diagnostico.selectbox(
+    "Diagnóstico", [TODOS] + sorted(por_diagnostico),
+    on_change=lambda: st.session_state.update(pagina_dashboard=0),
+)
+
+if por_diagnostico:
+    st.subheader("Pacientes por diagnóstico")
+    st.bar_chart(por_diagnostico)
+
+pagina = st.session_state.get("pagina_dashboard", 0)
+pacientes, total = listar_resumo_pacientes(
+    pagina, TAMANHO_PAGINA_RESUMO,
+    modalidade=None if modalidade == TODAS else modalidade,
+    diagnostico=None if diagnostico == TODOS else diagnostico,
+)
+paginas = max(1, math.ceil(total / TAMANHO_PAGINA_RESUMO))
+st.caption(f"{total} paciente(s) · página {pagina + 1} de {paginas}")
+
+
+def _linha(paciente):
+    no_alvo = paciente.get("no_alvo") or {}
+    linha = {
+        "Paciente": paciente["nome"],
+        "Modalidade": paciente["modalidade"],
+        "Último exame": (paciente["ultimo_exame"] or "")[:10],
+        "Diagnósticos": ", ".join(paciente["diagnosticos"]),
+        "Na meta": f"{sum(no_alvo.values())}/{len(no_alvo)}" if no_alvo else "-",
+    }
+    dados = paciente.get("dados") or {}
+    for chave, spec in ANALITOS.items():
+        if dados.get(chave) is not None:
+            linha[spec["nome"]] = dados[chave]
+    return linha
+
+
+if pacientes:
+    st.dataframe([_linha(p) for p in pacientes], use_container_width=True, hide_index=True)
+
+anterior, _, proxima = st.columns([1, 3, 1])
+if anterior.button("◀ Anterior", disabled=pagina == 0):
+    st.session_state["pagina_dashboard"] = pagina - 1
+    st.rerun()
+if proxima.button("Próxima ▶", disabled=pagina + 1 >= paginas):
+    st.session_state["pagina_dashboard"] = pagina + 1
+    st.rerun()
@@ -1,63 +1,204 @@
+import hashlib
+import json
+import operator
 import re
+from typing import NamedTuple, Optional
+
+from analitos import extrair_valores_detalhados, valores_ambiguos, valores_de
+from registros import Metadados, ResultadoExame
+from templates_relatorio import renderizar_evolucao, renderizar_texto
+
+# Regras do PCDT avaliadas por generate_report, na ordem em que aparecem no relatório.
+# Alterar um limiar ou texto muda a versão das regras e marca o analito para reavaliação.
+REGRAS = [
+    {
+        "id": "anemia_drc",
+        "analito": "hemoglobina",
+        "operador": "<",
+        "limiar": 10,
+        "diagnostico": "Anemia da DRC",
+        "conduta": "Iniciar alfaepoetina e avaliar ferro sérico.",
+    },
+    {
+        "id": "reposicao_ferro",
+        "analito": "ferritina",
+        "operador": "<",
+        "limiar": 100,
+        "diagnostico": None,
+        "conduta": "Reposição de ferro (ex: sacarato férrico).",
+    },
+    {
+        "id": "hiperparatireoidismo",
+        "analito": "pth",
+        "operador": ">",
+        "limiar": 600,
+        "diagnostico": "Hiperparatireoidismo secundário",
+        "conduta": "Avaliar uso de paricalcitol e/ou cinacalcete.",
+    },
+    {
+        "id": "quelante_fosforo",
+        "analito": "fosforo",
+        "operador": ">",
+        "limiar": 5.5,
+        "diagnostico": None,
+        "conduta": "Iniciar quelante de fósforo (ex: sevelamer).",
+    },
+    {
+        "id": "reposicao_vitamina_d",
+        "analito": "vitamina_d",
+        "operador": "<",
+        "limiar": 20,
+        "diagnostico": None,
+        "conduta": "Suplementar vitamina D (calcitriol ou colecalciferol).",
+    },
+]
+
+OPERADORES = {"<": operator.lt, ">": operator.gt, "<=": operator.le, ">=": operator.ge}
+
+
+class Decisao(NamedTuple):
+    """Uma regra avaliada: qual valor foi comparado com qual limiar e se a regra disparou."""
+
+    regra: str
+    analito: str
+    valor: Optional[float]
+    operador: str
+    limiar: float
+    disparou: bool
+
+
+def _msgpack():
+    # Dependência opcional: só quem pede o formato msgpack precisa dela
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError("formato msgpack requer o pacote msgpack")
+    return msgpack
+
+
+def serializar_trilha(trilha, formato="json"):
+    """
+    Trilha de decisões em bytes, como listas [regra, analito, valor, operador, limiar, disparou].
+
+    As tuplas vão direto para o codificador (JSON ou msgpack), sem percorrer as
+    regras de novo nem montar dicionários intermediários.
+    """
+    if formato == "json":
+        return json.dumps(trilha, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if formato == "msgpack":
+        return _msgpack().packb(trilha)
+    raise ValueError(f"formato desconhecido: {formato}")
+
+
+def desserializar_trilha(dados, formato="json"):
+    """Lista de Decisao a partir dos bytes de serializar_trilha no mesmo `formato`."""
+    if formato == "json":
+        itens = json.loads(dados)
+    elif formato == "msgpack":
+        itens = _msgpack().unpackb(dados)
+    else:
+        raise ValueError(f"formato desconhecido: {formato}")
+    return [Decisao(*item) for item in itens]
+
+
+def assinaturas_regras(regras=REGRAS):
+    """Hash curto das regras de cada analito, usado para saber quais analitos mudaram."""
+    por_analito = {}
+    for regra in regras:
+        por_analito.setdefault(regra["analito"], []).append(regra)
+    return {
+        analito: hashlib.sha256(json.dumps(lista, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        for analito, lista in por_analito.items()
+    }
+
+
+def versao_regras(regras=REGRAS):
+    assinaturas = json.dumps(assinaturas_regras(regras), sort_keys=True)
+    return hashlib.sha256(assinaturas.encode("utf-8")).hexdigest()[:12]
+
+
+def analitos_alterados(assinaturas_anteriores, assinaturas_atuais=None):
+    """Analitos cujas regras foram criadas, removidas ou modificadas entre duas versões."""
+    if assinaturas_atuais is None:
+        assinaturas_atuais = assinaturas_regras()
+    analitos = set(assinaturas_anteriores) | set(assinaturas_atuais)
+    return {a for a in analitos if assinaturas_anteriores.get(a) != assinaturas_atuais.get(a)}
+
+
+VERSAO_REGRAS = versao_regras()
+
 
 def extract_metadata(text):
     name_match = re.search(r"(?:Paciente|Nome)[\s:]*([A-ZÀ-Ú][a-zà-ú]+(?: [A-ZÀ-Ú][a-zà-ú]+)+)", text)
     age_match = re.search(r"(?:Idade)[\s:]*([0-9]{1,3})", text)
+    birth_match = re.search(r"(?:Data de Nascimento|Nascimento|D\.?N\.?)[\s:]*([0-9]{2}/[0-9]{2}/[0-9]{4})", text, re.IGNORECASE)
     modality_match = re.search(r"(hemodi[aá]lise|di[aá]lise peritoneal|di[aá]lise)", text, re.IGNORECASE)
 
-    return {
-        "nome": name_match.group(1).strip() if name_match else "Não identificado",
-        "idade": age_match.group(1) if age_match else "Não informada",
-        "modalidade": modality_match.group(1).capitalize() if modality_match else "Não informada"
-    }
+    return Metadados(
+        nome=name_match.group(1).strip() if name_match else "Não identificado",
+        idade=age_match.group(1) if age_match else "Não informada",
+        data_nascimento=birth_match.group(1) if birth_match else "Não informada",
+        modalidade=modality_match.group(1).capitalize() if modality_match else "Não informada",
+    )
 
 def analyze_exam_text(text):
-    def extract_value(label, unit):
-        pattern = rf"{label}[^\d]*(\d+[\.,]?\d*)[^\d]*{unit}"
-        match = re.search(pattern, text, re.IGNORECASE)
-        return float(match.group(1).replace(",", ".")) if match else None
-
-    results = {
-        "hemoglobina": extract_value("hemoglobina", "g/dL"),
-        "ferritina": extract_value("ferritina", "ng/mL"),
-        "transferrina": extract_value("transferrina", "%"),
-        "calcio": extract_value("c[aá]lcio", "mg/dL"),
-        "fosforo": extract_value("f[oó]sforo", "mg/dL"),
-        "pth": extract_value("pth", "pg/mL"),
-        "vitamina_d": extract_value("25.?\s*hidroxi.?vitamina\s*d", "ng/mL"),
-    }
+    # Valores já convertidos para a unidade canônica de cada analito (ver analitos.py),
+    # com a confiança e o trecho de origem de cada um em "extracoes"
+    extracoes = extrair_valores_detalhados(text)
 
     metadata = extract_metadata(text)
-    return {"dados": results, "meta": metadata}
+    return ResultadoExame(dados=valores_de(extracoes), meta=metadata, extracoes=extracoes)
 
-def generate_report(parsed):
-    values = parsed["dados"]
-    meta = parsed["meta"]
+def evaluate_rules(values, regras=REGRAS, trilha=None):
+    """
+    Diagnósticos e condutas das regras que disparam para `values`.
+
+    Se `trilha` (lista) for passada, recebe uma Decisao por regra avaliada, na ordem das regras.
+    """
     dx = []
     condutas = []
 
-    if values["hemoglobina"] and values["hemoglobina"] < 10:
-        dx.append("Anemia da DRC")
-        condutas.append("Iniciar alfaepoetina e avaliar ferro sérico.")
-
-    if values["ferritina"] and values["ferritina"] < 100:
-        condutas.append("Reposição de ferro (ex: sacarato férrico).")
-
-    if values["pth"] and values["pth"] > 600:
-        dx.append("Hiperparatireoidismo secundário")
-        condutas.append("Avaliar uso de paricalcitol e/ou cinacalcete.")
-
-    if values["fosforo"] and values["fosforo"] > 5.5:
-        condutas.append("Iniciar quelante de fósforo (ex: sevelamer).")
-
-    if values["vitamina_d"] and values["vitamina_d"] < 20:
-        condutas.append("Suplementar vitamina D (calcitriol ou colecalciferol).")
+    for regra in regras:
+        valor = values.get(regra["analito"])
+        disparou = bool(valor) and OPERADORES[regra["operador"]](valor, regra["limiar"])
+        if trilha is not None:
+            trilha.append(Decisao(regra["id"], regra["analito"], valor, regra["operador"], regra["limiar"], disparou))
+        if not disparou:
+            continue
+        if regra["diagnostico"]:
+            dx.append(regra["diagnostico"])
+        if regra["conduta"]:
+            condutas.append(regra["conduta"])
 
     if not dx:
         dx.append("Sem alterações críticas detectadas.")
+    return dx, condutas
 
-    texto = f"Paciente: {meta['nome']}\nIdade: {meta['idade']}\nModalidade: {meta['modalidade']}\n"
-    texto += "\nDiagnósticos prováveis:\n- " + "\n- ".join(dx)
-    texto += "\n\nCondutas sugeridas:\n- " + "\n- ".join(condutas)
-    texto += "\n\nEvolução clínica automática:\nPaciente em diálise com alterações laboratoriais compatíveis com " + ", ".join(dx) + ". Seguir PCDT vigente."
-    return texto
\ No newline at end of file
+def build_report(parsed):
+    """
+    Relatório estruturado: metadados, valores, diagnósticos, condutas e evolução.
+
+    Se `parsed` trouxer "serie" (analitos.extrair_serie), ela é repassada para
+    os gráficos de tendência dos exportadores. Se trouxer "extracoes", "revisar"
+    lista os analitos de baixa confiança; os demais dispensam revisão manual.
+    "trilha" tem a Decisao de cada regra (ver serializar_trilha).
+    """
+    trilha = []
+    dx, condutas = evaluate_rules(parsed["dados"], trilha=trilha)
+    relatorio = {
+        "meta": dict(parsed["meta"]),
+        "dados": dict(parsed["dados"]),
+        "diagnosticos": dx,
+        "condutas": condutas,
+        "evolucao": renderizar_evolucao(dx),
+        "versao_regras": VERSAO_REGRAS,
+        "trilha": trilha,
+    }
+    if parsed.get("serie"):
+        relatorio["serie"] = parsed["serie"]
+    if "extracoes" in parsed:
+        relatorio["revisar"] = valores_ambiguos(parsed["extracoes"])
+    return relatorio
+
+def generate_report(parsed):
+    return renderizar_texto(build_report(parsed))
@@ -1,14 +1,166 @@
+# Exportação do relatório em DOCX (python-docx), individual ou em lote.
+#
+# No lote, o template com o papel timbrado é carregado uma única vez e cada
+# relatório parte de uma cópia do corpo original. Estilos que faltam no
+# template (comum em modelos feitos no Word) são trocados por negrito ou texto simples.
 from docx import Document
+from docx.shared import Cm
+import copy
 import io
 
-def gerar_docx_relatorio(texto, nome_arquivo="relatorio_pcdt.docx"):
-    doc = Document()
-    doc.add_heading("Relatório PCDT - Análise de Exames", level=1)
+from analitos import ANALITOS
+from graficos import graficos_relatorio
+from templates_relatorio import SECOES
+
+
+def _tem_estilo(doc, nome):
+    # Templates do Word costumam trazer Heading/List Bullet só como estilos latentes
+    try:
+        doc.styles[nome]
+    except KeyError:
+        return False
+    return True
+
+
+def _adicionar_titulo(doc, texto, nivel):
+    if _tem_estilo(doc, f"Heading {nivel}"):
+        return doc.add_heading(texto, level=nivel)
+    # Template sem o estilo: título em negrito
+    paragrafo = doc.add_paragraph()
+    paragrafo.add_run(texto).bold = True
+    return paragrafo
+
+
+def _adicionar_item(doc, texto):
+    if _tem_estilo(doc, "List Bullet"):
+        return doc.add_paragraph(texto, style="List Bullet")
+    return doc.add_paragraph(f"• {texto}")
+
+
+def _adicionar_tabela_valores(doc, dados):
+    presentes = [(chave, valor) for chave, valor in dados.items() if valor is not None and chave in ANALITOS]
+    if not presentes:
+        return
+
+    _adicionar_titulo(doc, "Valores laboratoriais", 2)
+    tabela = doc.add_table(rows=1, cols=3)
+    try:
+        tabela.style = "Table Grid"
+    except KeyError:
+        pass  # template sem o estilo: mantém a tabela sem bordas
+    cabecalho = tabela.rows[0].cells
+    cabecalho[0].text, cabecalho[1].text, cabecalho[2].text = "Exame", "Resultado", "Unidade"
+    for chave, valor in presentes:
+        celulas = tabela.add_row().cells
+        celulas[0].text = ANALITOS[chave]["nome"]
+        celulas[1].text = f"{valor:g}"
+        celulas[2].text = ANALITOS[chave]["unidade"]
+
+
+def _adicionar_graficos(doc, relatorio):
+    graficos = graficos_relatorio(relatorio)
+    if not graficos:
+        return
+
+    _adicionar_titulo(doc, "Tendências", 2)
+    for _, png in graficos:
+        doc.add_picture(io.BytesIO(png), width=Cm(14))
+
+
+def _adicionar_relatorio_estruturado(doc, relatorio):
+    meta = relatorio["meta"]
+    doc.add_paragraph(f"Paciente: {meta['nome']}")
+    doc.add_paragraph(f"Idade: {meta['idade']}")
+    doc.add_paragraph(f"Modalidade: {meta['modalidade']}")
+
+    _adicionar_tabela_valores(doc, relatorio.get("dados", {}))
+    _adicionar_graficos(doc, relatorio)
+
+    for titulo, campo in SECOES:
+        _adicionar_titulo(doc, titulo, 2)
+        conteudo = relatorio[campo]
+        if isinstance(conteudo, list):
+            for item in conteudo:
+                _adicionar_item(doc, item)
+        else:
+            doc.add_paragraph(conteudo)
 
-    for linha in texto.split("\n"):
-        doc.add_paragraph(linha)
 
+def _adicionar_relatorio(doc, relatorio):
+    _adicionar_titulo(doc, "Relatório PCDT - Análise de Exames", 1)
+
+    if isinstance(relatorio, dict):
+        _adicionar_relatorio_estruturado(doc, relatorio)
+    else:
+        for linha in relatorio.split("\n"):
+            doc.add_paragraph(linha)
+
+
+def _salvar(doc):
     buffer = io.BytesIO()
     doc.save(buffer)
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
+
+
+def gerar_docx_relatorio(texto, nome_arquivo="relatorio_pcdt.docx"):
+    """Gera o DOCX a partir do texto do relatório ou do relatório estruturado (dict)."""
+    doc = Document()
+    _adicionar_relatorio(doc, texto)
+    return _salvar(doc)
+
+
+def gerar_docx_lote(relatorios, caminho_template=None, combinado=False):
+    """
+    Gera DOCX para vários relatórios carregando o template (papel timbrado) uma única vez.
+
+    Cada relatório parte de uma cópia do corpo original do template; cabeçalho,
+    rodapé, estilos e imagens do timbrado são reaproveitados do mesmo pacote.
+
+    Args:
+        relatorios: Textos ou relatórios estruturados.
+        caminho_template: Caminho ou arquivo .docx do timbrado (padrão do python-docx se None).
+        combinado: Se True, gera um único documento com quebra de página entre pacientes.
+
+    Returns:
+        BytesIO se combinado, senão lista de BytesIO na ordem de `relatorios`.
+    """
+    doc = Document(caminho_template)
+
+    if combinado:
+        for i, relatorio in enumerate(relatorios):
+            if i:
+                doc.add_page_break()
+            _adicionar_relatorio(doc, relatorio)
+        return _salvar(doc)
+
+    corpo = doc.element.body
+    modelo = copy.deepcopy(corpo)
+    relacoes_template = set(doc.part.rels)
+    buffers = []
+    for relatorio in relatorios:
+        for filho in list(corpo):
+            corpo.remove(filho)
+        for filho in modelo:
+            corpo.append(copy.deepcopy(filho))
+        _descartar_imagens(doc, relacoes_template)
+        _adicionar_relatorio(doc, relatorio)
+        buffers.append(_salvar(doc))
+    return buffers
+
+
+def _descartar_imagens(doc, relacoes_template):
+    """
+    Remove do pacote as imagens (gráficos) do relatório anterior do lote.
+
+    Zerar o corpo não basta: cada add_picture deixa uma relação e uma parte de
+    imagem no pacote, e o documento do paciente seguinte levaria os gráficos
+    dos anteriores.
+    """
+    imagens = doc.part.package.image_parts
+    for rId in [rId for rId in doc.part.rels if rId not in relacoes_template]:
+        parte = doc.part.rels[rId].target_part
+        doc.part.drop_rel(rId)
+        if parte in imagens:
+            # ImageParts não tem remoção pública; sem isso o lote acumula os PNGs em memória
+            imagens._image_parts.remove(parte)
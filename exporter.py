@@ -1,20 +1,138 @@
 from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 import io
+import os
 
-def gerar_pdf_relatorio(texto, nome_arquivo="relatorio_pcdt.pdf"):
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
+from graficos import ALTURA, LARGURA, graficos_relatorio
+from templates_relatorio import SECOES
+
+ALTURA_LOGOTIPO = 40
+ESCALA_GRAFICO = 0.75  # 480x200 px -> 360x150 pt
+
+
+def linhas_relatorio(relatorio):
+    """Linhas do relatório estruturado: (texto, é_título) na ordem das SECOES."""
+    meta = relatorio["meta"]
+    linhas = [
+        (f"Paciente: {meta['nome']}", False),
+        (f"Idade: {meta['idade']}", False),
+        (f"Modalidade: {meta['modalidade']}", False),
+    ]
+    for titulo, campo in SECOES:
+        linhas.append(("", False))
+        linhas.append((f"{titulo}:", True))
+        conteudo = relatorio[campo]
+        if isinstance(conteudo, list):
+            linhas.extend((f"- {item}", False) for item in conteudo)
+        else:
+            linhas.append((conteudo, False))
+    return linhas
+
+
+def _linhas(texto):
+    if isinstance(texto, dict):
+        return linhas_relatorio(texto)
+    return [(linha, False) for linha in texto.split("\n")]
+
+
+def _graficos(texto):
+    if isinstance(texto, dict):
+        return graficos_relatorio(texto)
+    return []
+
+
+def _titulo(texto, numero):
+    if isinstance(texto, dict):
+        return str(texto["meta"].get("nome"))
+    return texto.split("\n", 1)[0] or f"Relatório {numero}"
+
+
+def _registrar_fonte(caminho_ttf):
+    """Registra a fonte TTF uma única vez por processo e retorna seu nome."""
+    nome = "PCDT-" + os.path.splitext(os.path.basename(caminho_ttf))[0]
+    if nome not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(nome, caminho_ttf))
+    return nome
+
+
+def _desenhar_linhas(c, linhas, fonte="Helvetica", fonte_negrito="Helvetica-Bold", logotipo=None, graficos=()):
+    """Desenha as linhas (e depois os gráficos) a partir do topo da página atual, quebrando página quando necessário."""
     width, height = A4
-    x, y = 40, height - 50
+    x = 40
 
-    for linha in texto.split("\n"):
+    def iniciar_pagina():
+        if logotipo is None:
+            return height - 50
+        # Mesmo ImageReader em todas as páginas: o reportlab embute a imagem uma única vez
+        c.drawImage(logotipo, x, height - 20 - ALTURA_LOGOTIPO, height=ALTURA_LOGOTIPO,
+                    width=ALTURA_LOGOTIPO, preserveAspectRatio=True, mask="auto")
+        return height - 50 - ALTURA_LOGOTIPO
+
+    y = iniciar_pagina()
+    for linha, titulo in linhas:
         if y < 50:
             c.showPage()
-            y = height - 50
+            y = iniciar_pagina()
+        c.setFont(fonte_negrito if titulo else fonte, 12)
         c.drawString(x, y, linha)
         y -= 15
 
+    largura, altura = LARGURA * ESCALA_GRAFICO, ALTURA * ESCALA_GRAFICO
+    for _, png in graficos:
+        if y - altura < 50:
+            c.showPage()
+            y = iniciar_pagina()
+        c.drawImage(ImageReader(io.BytesIO(png)), x, y - altura, width=largura, height=altura)
+        y -= altura + 10
+
+
+def gerar_pdf_relatorio(texto, nome_arquivo="relatorio_pcdt.pdf"):
+    """Gera o PDF a partir do texto do relatório ou do relatório estruturado (dict)."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    _desenhar_linhas(c, _linhas(texto), graficos=_graficos(texto))
     c.save()
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
+
+
+def gerar_pdf_consolidado(relatorios, destino=None, logotipo=None, fonte_ttf=None):
+    """
+    Renderiza vários relatórios em um único PDF, com um marcador (outline) por paciente.
+
+    Fonte e logotipo são recursos compartilhados: embutidos uma vez e referenciados
+    por todas as páginas. As páginas são comprimidas e gravadas direto em `destino`.
+
+    Args:
+        relatorios: Textos ou relatórios estruturados, um por paciente.
+        destino: Caminho ou arquivo binário de saída (padrão: novo BytesIO).
+        logotipo: Caminho ou arquivo da imagem do timbrado, desenhada em cada página.
+        fonte_ttf: Caminho de uma fonte TrueType (padrão: Helvetica, não embutida).
+
+    Returns:
+        O `destino` (BytesIO posicionado no início quando criado aqui).
+    """
+    buffer = destino if destino is not None else io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    c.setTitle("Relatórios PCDT - Análise de Exames")
+    c.showOutline()
+
+    fonte, fonte_negrito = "Helvetica", "Helvetica-Bold"
+    if fonte_ttf:
+        fonte = fonte_negrito = _registrar_fonte(fonte_ttf)
+    imagem = ImageReader(logotipo) if logotipo is not None else None
+
+    for numero, relatorio in enumerate(relatorios, start=1):
+        chave = f"paciente-{numero}"
+        c.bookmarkPage(chave)
+        c.addOutlineEntry(_titulo(relatorio, numero), chave, level=0)
+        _desenhar_linhas(c, _linhas(relatorio), fonte, fonte_negrito, imagem, _graficos(relatorio))
+        c.showPage()
+
+    c.save()
+    if destino is None:
+        buffer.seek(0)
+    return buffer
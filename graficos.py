@@ -0,0 +1,109 @@
+# Gráficos de tendência laboratorial embutidos nos relatórios exportados.
+#
+# Os PNGs são desenhados com Pillow (já exigido pelo reportlab) e guardados no
+# cache em disco por (paciente, analito, hash dos pontos): a geração em lote
+# não redesenha gráficos idênticos. A renderização acontece dentro da exportação,
+# que roda no pool de servico_exportacao, fora da thread do Streamlit.
+import hashlib
+import io
+import json
+
+from PIL import Image, ImageDraw, ImageFont
+
+from analitos import ANALITOS
+from cache_disco import gravar_cache, ler_cache
+
+ANALITOS_TENDENCIA = ("hemoglobina", "pth", "fosforo")
+LARGURA, ALTURA = 480, 200
+MARGEM_X, MARGEM_Y = 50, 30
+COR_LINHA = (31, 119, 180)
+COR_EIXO = (90, 90, 90)
+
+
+def pontos_tendencia(serie, analito):
+    """Pares (data ISO, valor) de `analito` na série, em ordem cronológica; ignora valores sem data."""
+    pontos = {}
+    for data, nome, valor in zip(serie["data"], serie["analito"], serie["valor"]):
+        if nome == analito and data is not None and valor is not None:
+            pontos.setdefault(data, valor)
+    return sorted(pontos.items())
+
+
+def chave_grafico(paciente, analito, pontos):
+    conteudo = json.dumps([paciente, analito, pontos], ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest() + ".png"
+
+
+def _data_curta(data_iso):
+    ano, mes, dia = data_iso.split("-")
+    return f"{dia}/{mes}/{ano[2:]}"
+
+
+def desenhar_grafico(analito, pontos):
+    """Desenha a linha de tendência de `analito` e retorna o PNG em bytes."""
+    imagem = Image.new("RGB", (LARGURA, ALTURA), "white")
+    desenho = ImageDraw.Draw(imagem)
+    fonte = ImageFont.load_default()
+
+    unidade = ANALITOS[analito]["unidade"]
+    titulo = ANALITOS[analito]["nome"] + (f" ({unidade})" if unidade else "")
+    desenho.text((MARGEM_X, 8), titulo, fill="black", font=fonte)
+
+    x0, y0 = MARGEM_X, ALTURA - MARGEM_Y
+    x1, y1 = LARGURA - 20, MARGEM_Y
+    desenho.line([(x0, y1), (x0, y0), (x1, y0)], fill=COR_EIXO)
+
+    valores = [valor for _, valor in pontos]
+    minimo, maximo = min(valores), max(valores)
+    amplitude = (maximo - minimo) or 1
+    passo = (x1 - x0) / max(len(pontos) - 1, 1)
+    coordenadas = [
+        (x0 + i * passo, y0 - (valor - minimo) / amplitude * (y0 - y1))
+        for i, valor in enumerate(valores)
+    ]
+
+    desenho.text((4, y1 - 6), f"{maximo:g}", fill=COR_EIXO, font=fonte)
+    desenho.text((4, y0 - 6), f"{minimo:g}", fill=COR_EIXO, font=fonte)
+    desenho.text((x0, y0 + 6), _data_curta(pontos[0][0]), fill=COR_EIXO, font=fonte)
+    desenho.text((x1 - 45, y0 + 6), _data_curta(pontos[-1][0]), fill=COR_EIXO, font=fonte)
+
+    if len(coordenadas) > 1:
+        desenho.line(coordenadas, fill=COR_LINHA, width=2)
+    for x, y in coordenadas:
+        desenho.ellipse([x - 3, y - 3, x + 3, y + 3], fill=COR_LINHA)
+
+    buffer = io.BytesIO()
+    imagem.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def grafico_tendencia(paciente, analito, pontos):
+    """PNG do gráfico de `analito`, lido do cache em disco quando já renderizado."""
+    chave = chave_grafico(paciente, analito, pontos)
+    png = ler_cache("graficos", chave)
+    if png is None:
+        png = desenhar_grafico(analito, pontos)
+        gravar_cache("graficos", chave, png)
+    return png
+
+
+def graficos_relatorio(relatorio):
+    """
+    Gráficos de tendência de um relatório estruturado com "serie" (ver analitos.extrair_serie).
+
+    Returns:
+        list: Pares (analito, PNG em bytes) para os ANALITOS_TENDENCIA com pelo
+        menos duas coletas; vazia se o relatório não tiver série.
+    """
+    serie = relatorio.get("serie")
+    if not serie:
+        return []
+
+    meta = relatorio["meta"]
+    paciente = f"{meta.get('nome')}|{meta.get('data_nascimento')}"
+    graficos = []
+    for analito in ANALITOS_TENDENCIA:
+        pontos = pontos_tendencia(serie, analito)
+        if len(pontos) >= 2:
+            graficos.append((analito, grafico_tendencia(paciente, analito, pontos)))
+    return graficos
@@ -0,0 +1,45 @@
+# Identidade do paciente e do exame, sem depender do banco: usada pelo
+# supabase_client (chaves das tabelas) e pelo log de auditoria.
+import datetime
+import hashlib
+import re
+import unicodedata
+
+# Partículas ignoradas na chave de identidade ("Maria da Silva" == "Maria Silva")
+PARTICULAS_NOME = {"da", "das", "de", "do", "dos", "e"}
+
+VALORES_AUSENTES = {"", "Não identificado", "Não informada"}
+
+
+def normalizar_nome(nome):
+    """Remove acentos, caixa, partículas e espaços extras de um nome de paciente."""
+    if not nome or nome in VALORES_AUSENTES:
+        return ""
+    sem_acentos = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
+    palavras = re.findall(r"[a-z]+", sem_acentos.lower())
+    return " ".join(p for p in palavras if p not in PARTICULAS_NOME)
+
+
+def normalizar_data_nascimento(data):
+    """Converte 'dd/mm/aaaa' para ISO 'aaaa-mm-dd'; retorna None se ausente ou inválida."""
+    if not data or data in VALORES_AUSENTES:
+        return None
+    try:
+        return datetime.datetime.strptime(data.strip(), "%d/%m/%Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+def chave_paciente(meta):
+    """Chave de identidade estável (SHA-256 de nome normalizado + data de nascimento)."""
+    nome = normalizar_nome(meta.get("nome"))
+    if not nome:
+        return None
+    nascimento = normalizar_data_nascimento(meta.get("data_nascimento")) or ""
+    return hashlib.sha256(f"{nome}|{nascimento}".encode("utf-8")).hexdigest()
+
+
+def hash_exame(texto_exame):
+    """Hash do conteúdo do exame, insensível a diferenças de espaçamento."""
+    normalizado = " ".join(texto_exame.split())
+    return hashlib.sha256(normalizado.encode("utf-8")).hexdigest()
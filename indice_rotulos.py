@@ -0,0 +1,85 @@
+# Índice de rótulos (autômato de Aho–Corasick) para achar, numa única passada
+# pelo texto normalizado, todas as ocorrências de todos os rótulos e sinônimos
+# do registro de analitos.
+#
+# O custo da busca é linear no tamanho do texto, independentemente de quantos
+# rótulos existam: cada caractere avança o autômato uma vez (mais as quedas
+# pelos links de falha, amortizadas). O valor e a unidade são lidos depois,
+# só numa janela curta após cada rótulo (analitos.py).
+
+
+class IndiceRotulos:
+    """
+    Autômato sobre rótulos literais, cada um associado a um valor (a chave do analito).
+
+    As ocorrências devolvidas por buscar() não se sobrepõem: vale a que começa
+    primeiro e, entre as que começam no mesmo ponto, a mais longa ("data da
+    coleta" e não "coleta"). Um rótulo só conta como palavra inteira: "pth" não
+    é encontrado dentro de "depth".
+    """
+
+    __slots__ = ("_transicoes", "_falha", "_saidas")
+
+    def __init__(self, rotulos):
+        """`rotulos`: {texto do rótulo: valor}; os textos já devem estar normalizados."""
+        self._transicoes = [{}]
+        self._saidas = [()]
+        for rotulo, valor in rotulos.items():
+            if not rotulo:
+                continue
+            estado = 0
+            for caractere in rotulo:
+                proximo = self._transicoes[estado].get(caractere)
+                if proximo is None:
+                    proximo = len(self._transicoes)
+                    self._transicoes[estado][caractere] = proximo
+                    self._transicoes.append({})
+                    self._saidas.append(())
+                estado = proximo
+            self._saidas[estado] = ((len(rotulo), valor),)
+        self._falha = [0] * len(self._transicoes)
+        self._ligar_falhas()
+
+    def _ligar_falhas(self):
+        # Busca em largura: a falha de um estado é o maior sufixo próprio que também
+        # é prefixo de algum rótulo; as saídas do sufixo são herdadas
+        fila = list(self._transicoes[0].values())
+        for estado in fila:
+            for caractere, proximo in self._transicoes[estado].items():
+                falha = self._falha[estado]
+                while falha and caractere not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+                self._falha[proximo] = self._transicoes[falha].get(caractere, 0)
+                self._saidas[proximo] += self._saidas[self._falha[proximo]]
+                fila.append(proximo)
+
+    def ocorrencias(self, texto):
+        """Todas as ocorrências (início, fim, valor), inclusive sobrepostas, na ordem do fim."""
+        transicoes, falha, saidas = self._transicoes, self._falha, self._saidas
+        estado = 0
+        encontradas = []
+        for fim, caractere in enumerate(texto, 1):
+            while estado and caractere not in transicoes[estado]:
+                estado = falha[estado]
+            estado = transicoes[estado].get(caractere, 0)
+            if saidas[estado]:
+                encontradas.extend((fim - tamanho, fim, valor) for tamanho, valor in saidas[estado])
+        return encontradas
+
+    def buscar(self, texto):
+        """Ocorrências de palavra inteira, sem sobreposição, na ordem do texto."""
+        selecionadas = []
+        limite = 0
+        for inicio, fim, valor in sorted(self.ocorrencias(texto), key=lambda o: (o[0], -o[1])):
+            if inicio < limite or not _palavra_inteira(texto, inicio, fim):
+                continue
+            selecionadas.append((inicio, fim, valor))
+            limite = fim
+        return selecionadas
+
+
+def _palavra_inteira(texto, inicio, fim):
+    return not (
+        (inicio > 0 and texto[inicio - 1].isalnum() and texto[inicio].isalnum())
+        or (fim < len(texto) and texto[fim].isalnum() and texto[fim - 1].isalnum())
+    )
@@ -0,0 +1,242 @@
+# Ingestão de resultados já estruturados (FHIR Observation e HL7 v2 ORU), sem PDF.
+#
+# Uso: python ingestao_estruturada.py arquivo.json|arquivo.ndjson|arquivo.hl7 ...
+#
+# Os códigos LOINC do registro (analitos.py) levam cada resultado ao seu analito
+# e a unidade informada é convertida para a canônica: o resultado é o mesmo
+# ResultadoExame de analyze_exam_text (dados, meta, serie) e vai direto para
+# build_report / generate_report. Arquivos NDJSON e HL7 são lidos linha a linha.
+import datetime
+import json
+import sys
+from pathlib import Path
+
+from analitos import ANALITOS, compilar_loinc, fator_conversao
+from registros import Metadados, ResultadoExame
+
+SISTEMA_LOINC = "http://loinc.org"
+# Status de resultados que não devem ser usados
+STATUS_FHIR_INVALIDOS = {"entered-in-error", "cancelled", "registered"}
+STATUS_HL7_INVALIDOS = {"X", "W", "D", "I"}
+EXTENSOES_FHIR = {".json", ".ndjson"}
+EXTENSOES_HL7 = {".hl7", ".oru"}
+
+
+def valor_canonico(analito, valor, unidade):
+    """Valor na unidade canônica do analito, ou None se a unidade não for aceita."""
+    fator = fator_conversao(analito, unidade or "")
+    if fator is None:
+        return None
+    return valor if fator == 1.0 else round(valor * fator, 2)
+
+
+def _idade(nascimento, referencia):
+    if not nascimento:
+        return "Não informada"
+    anos = referencia.year - nascimento.year - ((referencia.month, referencia.day) < (nascimento.month, nascimento.day))
+    return str(anos)
+
+
+def montar_exame(paciente, pontos):
+    """
+    Junta os resultados de um paciente no formato de analyze_exam_text.
+
+    Args:
+        paciente: {"nome", "nascimento" (datetime.date ou None)}.
+        pontos: Trios (data ISO ou None, analito, valor canônico).
+
+    Returns:
+        ResultadoExame: "dados" tem o resultado mais recente de cada analito.
+    """
+    serie = {"data": [], "analito": [], "valor": []}
+    vistos = set()
+    recentes = {}
+    for data, analito, valor in pontos:
+        if (data, analito) in vistos:
+            continue
+        vistos.add((data, analito))
+        serie["data"].append(data)
+        serie["analito"].append(analito)
+        serie["valor"].append(valor)
+        atual = recentes.get(analito)
+        if atual is None or (data or "") > (atual[0] or ""):
+            recentes[analito] = (data, valor)
+
+    dados = dict.fromkeys(ANALITOS)
+    dados.update((analito, valor) for analito, (_, valor) in recentes.items())
+
+    nascimento = paciente.get("nascimento")
+    datas = [data for data in serie["data"] if data]
+    referencia = datetime.date.fromisoformat(max(datas)) if datas else datetime.date.today()
+    meta = Metadados(
+        nome=paciente.get("nome") or "Não identificado",
+        idade=_idade(nascimento, referencia),
+        data_nascimento=nascimento.strftime("%d/%m/%Y") if nascimento else "Não informada",
+        modalidade="Não informada",
+    )
+    return ResultadoExame(dados=dados, meta=meta, serie=serie)
+
+
+# --- FHIR ---
+
+def _data_fhir(texto):
+    if not texto:
+        return None
+    try:
+        return datetime.date.fromisoformat(texto[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+def _paciente_fhir(recurso):
+    nomes = recurso.get("name") or [{}]
+    nome = nomes[0].get("text") or " ".join(nomes[0].get("given", []) + [nomes[0].get("family", "")]).strip()
+    nascimento = _data_fhir(recurso.get("birthDate"))
+    return {"nome": nome, "nascimento": datetime.date.fromisoformat(nascimento) if nascimento else None}
+
+
+def ponto_observacao(recurso):
+    """(data, analito, valor canônico) de uma Observation, ou None se não mapeada/utilizável."""
+    if recurso.get("status") in STATUS_FHIR_INVALIDOS:
+        return None
+    quantidade = recurso.get("valueQuantity") or {}
+    if not isinstance(quantidade.get("value"), (int, float)):
+        return None
+
+    loinc = compilar_loinc()
+    for codigo in recurso.get("code", {}).get("coding", []):
+        analito = loinc.get(codigo.get("code")) if codigo.get("system") == SISTEMA_LOINC else None
+        if analito:
+            break
+    else:
+        return None
+
+    valor = valor_canonico(analito, float(quantidade["value"]), quantidade.get("code") or quantidade.get("unit"))
+    if valor is None:
+        return None
+    data = _data_fhir(
+        recurso.get("effectiveDateTime") or (recurso.get("effectivePeriod") or {}).get("start") or recurso.get("issued")
+    )
+    return data, analito, valor
+
+
+def _recursos_fhir(caminho):
+    with open(caminho, encoding="utf-8") as arquivo:
+        if Path(caminho).suffix == ".ndjson":
+            for linha in arquivo:
+                if linha.strip():
+                    yield None, json.loads(linha)
+            return
+        documento = json.load(arquivo)
+    if documento.get("resourceType") == "Bundle":
+        for entrada in documento.get("entry", []):
+            yield entrada.get("fullUrl"), entrada.get("resource", {})
+    else:
+        yield None, documento
+
+
+def ler_fhir(caminho):
+    """Exames (um por paciente) de um Bundle FHIR em JSON ou de recursos em NDJSON."""
+    pacientes = {}
+    pontos = {}
+    for url, recurso in _recursos_fhir(caminho):
+        tipo = recurso.get("resourceType")
+        if tipo == "Patient":
+            paciente = _paciente_fhir(recurso)
+            pacientes[f"Patient/{recurso.get('id')}"] = paciente
+            if url:
+                pacientes[url] = paciente
+        elif tipo == "Observation":
+            ponto = ponto_observacao(recurso)
+            if ponto is not None:
+                referencia = (recurso.get("subject") or {}).get("reference")
+                pontos.setdefault(referencia, []).append(ponto)
+
+    for referencia, lista in pontos.items():
+        yield montar_exame(pacientes.get(referencia, {}), lista)
+
+
+# --- HL7 v2 ---
+
+def _data_hl7(texto):
+    try:
+        return datetime.datetime.strptime(texto[:8], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def _ponto_obx(campos, componente, data_padrao):
+    status = campos[11] if len(campos) > 11 else ""
+    if len(campos) < 6 or status in STATUS_HL7_INVALIDOS:
+        return None
+    identificador = campos[3].split(componente)
+    sistema = identificador[2] if len(identificador) > 2 else ""
+    analito = compilar_loinc().get(identificador[0]) if sistema == "LN" else None
+    if analito is None:
+        return None
+    try:
+        bruto = float(campos[5].replace(",", "."))
+    except ValueError:
+        return None  # resultado textual ou com comparador ("<10")
+    unidade = campos[6].split(componente)[0] if len(campos) > 6 else ""
+    valor = valor_canonico(analito, bruto, unidade)
+    if valor is None:
+        return None
+    data = _data_hl7(campos[14]) if len(campos) > 14 and campos[14] else None
+    data = data or data_padrao
+    return (data.isoformat() if data else None), analito, valor
+
+
+def ler_hl7(caminho):
+    """Exames de um arquivo com uma ou mais mensagens HL7 v2 ORU^R01 (uma por paciente)."""
+    paciente, pontos = None, []
+    separador, componente = "|", "^"
+    data_pedido = None
+
+    # newline=None: aceita segmentos terminados por \r (padrão HL7), \n ou \r\n
+    with open(caminho, encoding="utf-8", newline=None) as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if not linha:
+                continue
+            if linha.startswith("MSH"):
+                if paciente is not None and pontos:
+                    yield montar_exame(paciente, pontos)
+                separador, componente = linha[3], linha[4]
+                paciente, pontos, data_pedido = {}, [], None
+                continue
+            campos = linha.split(separador)
+            if campos[0] == "PID" and len(campos) > 5:
+                nome = campos[5].split(componente)
+                paciente = {
+                    "nome": " ".join(parte for parte in nome[1:3] + nome[:1] if parte),
+                    "nascimento": _data_hl7(campos[7]) if len(campos) > 7 else None,
+                }
+            elif campos[0] == "OBR" and len(campos) > 7:
+                data_pedido = _data_hl7(campos[7])
+            elif campos[0] == "OBX":
+                ponto = _ponto_obx(campos, componente, data_pedido)
+                if ponto is not None:
+                    pontos.append(ponto)
+
+    if paciente is not None and pontos:
+        yield montar_exame(paciente, pontos)
+
+
+def ingerir_arquivo(caminho):
+    """Exames estruturados de `caminho`, escolhendo o leitor pela extensão."""
+    extensao = Path(caminho).suffix.lower()
+    if extensao in EXTENSOES_FHIR:
+        return ler_fhir(caminho)
+    if extensao in EXTENSOES_HL7:
+        return ler_hl7(caminho)
+    raise ValueError(f"Formato não suportado para ingestão estruturada: {extensao}")
+
+
+if __name__ == "__main__":
+    from diagnosis_engine import generate_report
+
+    for caminho in sys.argv[1:]:
+        for exame in ingerir_arquivo(caminho):
+            print(generate_report(exame))
+            print()
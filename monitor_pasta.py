@@ -0,0 +1,260 @@
+# Monitor de pasta: processa automaticamente os exames deixados pelo sistema do laboratório.
+#
+# Uso: python monitor_pasta.py /caminho/da/pasta [--workers N] [--intervalo S]
+#
+# Novos arquivos (PDF, FHIR .json/.ndjson, HL7 .hl7/.oru) são detectados pelo
+# watchdog (inotify) quando instalado, com varredura periódica como reserva.
+# Um arquivo só entra no pool depois de ficar ESTABILIDADE segundos sem mudar
+# de tamanho nem de data (ainda está sendo copiado). Depois de gravado no
+# Supabase ele vai para processados/ ou falhas/, e o resultado fica em
+# .progresso.json: ao reiniciar, um arquivo já gravado não é reprocessado.
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from analitos import extrair_serie
+from auditoria import registrar_analise
+from diagnosis_engine import analyze_exam_text, build_report
+from ingestao_estruturada import EXTENSOES_FHIR, EXTENSOES_HL7, ingerir_arquivo
+from pdf_parser import extract_text_from_pdf
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # sem watchdog: só varredura periódica
+    FileSystemEventHandler, Observer = object, None
+
+EXTENSOES = {".pdf"} | EXTENSOES_FHIR | EXTENSOES_HL7
+PASTA_PROCESSADOS = "processados"
+PASTA_FALHAS = "falhas"
+ARQUIVO_PROGRESSO = ".progresso.json"
+ESTABILIDADE = 2.0
+INTERVALO = 1.0
+
+
+def hash_arquivo(caminho):
+    digest = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+# --- Trabalho pesado: executado nos processos do pool ---
+
+def processar_arquivo(caminho):
+    """Exames de um arquivo como pares (texto do exame, relatório, extrações)."""
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == ".pdf":
+        with open(caminho, "rb") as arquivo:
+            # OCR sem pool próprio: o paralelismo já vem do pool do monitor.
+            # O arquivo aberto é lido do disco por janelas de páginas, sem cópia em memória.
+            texto = extract_text_from_pdf(arquivo, ocr_workers=1, somente_laboratorio=True)
+        parsed = analyze_exam_text(texto)
+        parsed.serie = extrair_serie(texto)
+        return [(texto, build_report(parsed), parsed.extracoes)]
+
+    exames = []
+    for exame in ingerir_arquivo(caminho):
+        # Sem texto de laudo: o conteúdo estruturado identifica o exame (deduplicação)
+        texto = json.dumps(exame.para_dict(), sort_keys=True, ensure_ascii=False)
+        exames.append((texto, build_report(exame), None))
+    return exames
+
+
+# --- Progresso ---
+
+def carregar_progresso(pasta):
+    try:
+        return json.loads((Path(pasta) / ARQUIVO_PROGRESSO).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def gravar_progresso(pasta, progresso):
+    """Grava o progresso de forma atômica (arquivo temporário + os.replace)."""
+    destino = Path(pasta) / ARQUIVO_PROGRESSO
+    fd, temporario = tempfile.mkstemp(dir=pasta, prefix=".tmp-progresso-")
+    with os.fdopen(fd, "w", encoding="utf-8") as arquivo:
+        json.dump(progresso, arquivo, ensure_ascii=False, indent=1)
+    os.replace(temporario, destino)
+
+
+def mover(caminho, destino):
+    """Move para a pasta `destino` sem sobrescrever um arquivo de mesmo nome."""
+    destino.mkdir(exist_ok=True)
+    alvo = destino / caminho.name
+    if alvo.exists():
+        alvo = destino / f"{caminho.stem}-{datetime.datetime.now():%Y%m%d%H%M%S%f}{caminho.suffix}"
+    os.replace(caminho, alvo)
+    return alvo
+
+
+def armazenar(exames):
+    """Grava as análises de um arquivo; retorna os ids de paciente."""
+    # Importado aqui, como em api._salvar: o cliente do Supabase exige
+    # credenciais só quando há o que gravar
+    import supabase_client
+
+    ids = []
+    hoje = datetime.date.today().isoformat()
+    for texto, relatorio, extracoes in exames:
+        registrar_analise(texto, relatorio)
+        ids.append(supabase_client.salvar_analise(relatorio, texto, extracoes, data_padrao=hoje))
+    return ids
+
+
+# --- Detecção ---
+
+class _Eventos(FileSystemEventHandler):
+    """Anota os caminhos criados/modificados/movidos para a pasta; o laço decide quando processar."""
+
+    def __init__(self, vistos, lock):
+        self.vistos, self.lock = vistos, lock
+
+    def _anotar(self, caminho):
+        with self.lock:
+            self.vistos.add(Path(caminho))
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._anotar(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._anotar(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._anotar(event.dest_path)
+
+
+def candidatos(pasta):
+    """Arquivos aceitos na raiz da pasta (sem subpastas nem arquivos ocultos)."""
+    return {
+        caminho for caminho in Path(pasta).iterdir()
+        if caminho.is_file() and not caminho.name.startswith(".") and caminho.suffix.lower() in EXTENSOES
+    }
+
+
+def executar(pasta, workers=None, intervalo=INTERVALO, estabilidade=ESTABILIDADE,
+             parar=None, executor=None, usar_watchdog=True):
+    """
+    Laço principal do monitor; roda até `parar` (threading.Event) ser sinalizado.
+
+    Args:
+        pasta: Pasta de entrada; processados/ e falhas/ são criadas dentro dela.
+        workers: Processos do pool (padrão: número de CPUs).
+        intervalo: Segundos entre verificações (e entre varreduras sem watchdog).
+        estabilidade: Segundos sem mudança antes de considerar o arquivo completo.
+        parar: Event que encerra o laço (main() o liga a SIGINT/SIGTERM).
+        executor: Pool já criado (testes); por padrão um ProcessPoolExecutor.
+        usar_watchdog: Usa notificações do sistema de arquivos se o watchdog existir.
+    """
+    pasta = Path(pasta)
+    parar = parar or threading.Event()
+    progresso = carregar_progresso(pasta)
+    proprio = executor is None
+    executor = executor or ProcessPoolExecutor(max_workers=workers)
+
+    lock = threading.Lock()
+    vistos = set(candidatos(pasta))
+    observador = None
+    if usar_watchdog and Observer is not None:
+        observador = Observer()
+        observador.schedule(_Eventos(vistos, lock), str(pasta), recursive=False)
+        observador.start()
+
+    estados = {}  # caminho -> (tamanho, mtime, desde quando está assim)
+    em_andamento = {}  # futuro -> (caminho, hash)
+    ultima_varredura = time.monotonic()
+
+    def concluir(futuro):
+        caminho, digest = em_andamento.pop(futuro)
+        registro = {"arquivo": caminho.name, "momento": datetime.datetime.now().isoformat()}
+        try:
+            registro["pacientes"] = armazenar(futuro.result())
+            registro["status"] = "processado"
+            mover(caminho, pasta / PASTA_PROCESSADOS)
+        except Exception as e:
+            registro["status"], registro["erro"] = "falha", str(e)
+            mover(caminho, pasta / PASTA_FALHAS)
+        progresso[digest] = registro
+        gravar_progresso(pasta, progresso)
+
+    try:
+        while not parar.is_set():
+            agora = time.monotonic()
+            if observador is None or agora - ultima_varredura >= 30 * intervalo:
+                # Varredura de reserva: sem watchdog, ou eventos perdidos
+                with lock:
+                    vistos.update(candidatos(pasta))
+                ultima_varredura = agora
+
+            with lock:
+                pendentes = set(vistos)
+                vistos.clear()
+            ocupados = {caminho for caminho, _ in em_andamento.values()}
+            for caminho in pendentes | set(estados):
+                if caminho in ocupados or caminho.suffix.lower() not in EXTENSOES or caminho.parent != pasta:
+                    continue
+                try:
+                    info = caminho.stat()
+                except FileNotFoundError:
+                    estados.pop(caminho, None)
+                    continue
+                assinatura = (info.st_size, info.st_mtime_ns)
+                anterior = estados.get(caminho)
+                if anterior is None or anterior[:2] != assinatura:
+                    estados[caminho] = (*assinatura, agora)
+                    continue
+                if agora - anterior[2] < estabilidade:
+                    continue
+
+                # Arquivo completo: já gravado antes de uma interrupção? Só move.
+                del estados[caminho]
+                digest = hash_arquivo(caminho)
+                if progresso.get(digest, {}).get("status") == "processado":
+                    mover(caminho, pasta / PASTA_PROCESSADOS)
+                    continue
+                em_andamento[executor.submit(processar_arquivo, str(caminho))] = (caminho, digest)
+
+            for futuro in [f for f in em_andamento if f.done()]:
+                concluir(futuro)
+            parar.wait(intervalo)
+
+        # Encerramento: espera os arquivos já enviados ao pool
+        for futuro in list(em_andamento):
+            concluir(futuro)
+    finally:
+        if observador is not None:
+            observador.stop()
+            observador.join()
+        if proprio:
+            executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Processa automaticamente os exames de uma pasta.")
+    parser.add_argument("pasta")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--intervalo", type=float, default=INTERVALO)
+    args = parser.parse_args()
+
+    parar = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    print(f"Monitorando {args.pasta} ({'watchdog' if Observer else 'varredura'}); Ctrl+C para sair.")
+    executar(args.pasta, workers=args.workers, intervalo=args.intervalo, parar=parar)
+
+
+if __name__ == "__main__":
+    main()
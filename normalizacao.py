@@ -0,0 +1,93 @@
+# Normalização do texto extraído do PDF antes da busca de rótulos e valores.
+#
+# O texto de page.get_text() traz ligaduras (ﬁ), espaços não separáveis,
+# hifenização no fim da linha, acentos e vírgula ou ponto como separador
+# decimal. Uma única passada produz um texto canônico: compatibilidade
+# Unicode (NFKC), sem acentos, em minúsculas (casefold), com cada sequência
+# de espaços reduzida a um espaço, palavras hifenizadas religadas e vírgula
+# decimal trocada por ponto. Assim os padrões de analitos.py são curtos,
+# ancorados e sem IGNORECASE.
+#
+# Junto com o texto vem o mapa de posições para o texto original. Só as trocas
+# que mudam o tamanho (espaços repetidos, hifenização, ligaduras, acentos
+# soltos) criam um ponto no mapa; entre dois pontos a correspondência é direta.
+# Texto ASCII com espaços simples, o caso comum, passa quase todo por
+# operações em C (lower, re.sub) e gera um mapa de um único ponto.
+import bisect
+import functools
+import re
+import unicodedata
+from array import array
+
+# Trechos que exigem tratamento em Python: hifenização no fim da linha,
+# espaços repetidos e qualquer caractere não ASCII
+_ESPECIAIS = re.compile(r"(?<=[^\W\d_])-[ \t]*\n\s*(?=[^\W\d_])|\s{2,}|[^\x00-\x7f]")
+_ESPACO = re.compile(r"\s")
+_VIRGULA_DECIMAL = re.compile(r"(?<=\d),(?=\d)")
+
+
+@functools.lru_cache(maxsize=None)
+def dobrar_caractere(caractere):
+    """Forma canônica de um caractere não ASCII (pode ter zero ou vários caracteres)."""
+    if caractere.isspace():
+        return " "
+    decomposto = unicodedata.normalize("NFKD", caractere)
+    # Sem acentos (Mn) nem caracteres invisíveis como o hífen condicional (Cf)
+    base = "".join(c for c in decomposto if unicodedata.category(c) not in ("Mn", "Cf"))
+    return unicodedata.normalize("NFKC", base).casefold()
+
+
+def normalizar(texto):
+    """
+    Texto canônico para extração e o mapa de posições para o texto original.
+
+    Returns:
+        tuple: (texto normalizado, mapa para posicao_original/trecho_original).
+    """
+    partes = []
+    inicios_normalizado, inicios_original = array("l", [0]), array("l", [0])
+    tamanho = 0
+    anterior = 0
+    for match in _ESPECIAIS.finditer(texto):
+        inicio, fim = match.span()
+        if inicio > anterior:
+            partes.append(texto[anterior:inicio].lower())
+            tamanho += inicio - anterior
+        trecho = match.group()
+        if trecho[0] == "-" and fim - inicio > 1:
+            troca = ""
+        elif fim - inicio > 1:
+            troca = " "
+        else:
+            troca = dobrar_caractere(trecho)
+        if len(troca) != fim - inicio:
+            # Cada caractere gerado aponta para o início do trecho trocado
+            for deslocamento in range(len(troca)):
+                inicios_normalizado.append(tamanho + deslocamento)
+                inicios_original.append(inicio)
+            inicios_normalizado.append(tamanho + len(troca))
+            inicios_original.append(fim)
+        partes.append(troca)
+        tamanho += len(troca)
+        anterior = fim
+    partes.append(texto[anterior:].lower())
+
+    # Trocas do mesmo tamanho: o mapa não muda
+    normalizado = _ESPACO.sub(" ", "".join(partes))
+    normalizado = _VIRGULA_DECIMAL.sub(".", normalizado)
+    return normalizado, (inicios_normalizado, inicios_original)
+
+
+def posicao_original(mapa, posicao):
+    """Posição no texto original do caractere `posicao` do texto normalizado."""
+    inicios_normalizado, inicios_original = mapa
+    ponto = bisect.bisect_right(inicios_normalizado, posicao) - 1
+    return inicios_original[ponto] + posicao - inicios_normalizado[ponto]
+
+
+def trecho_original(mapa, inicio, fim):
+    """Converte o trecho [inicio, fim) do texto normalizado para o texto original."""
+    if fim <= inicio:
+        posicao = posicao_original(mapa, inicio)
+        return posicao, posicao
+    return posicao_original(mapa, inicio), posicao_original(mapa, fim - 1) + 1
@@ -1,23 +1,302 @@
-import fitz  # PyMuPDF
-from typing import BinaryIO
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Optional
 
-def extract_text_from_pdf(file: BinaryIO) -> str:
+from cache_disco import gravar_cache, ler_cache
+
+# Parâmetros do OCR (entram na chave do cache: mudar um deles invalida o cache)
+OCR_DPI = 300
+OCR_IDIOMA = "por"
+
+# Termos típicos de laudo laboratorial, buscados numa única passada por página
+_TERMOS_LABORATORIO = re.compile(
+    r"hemoglobina|hemat[oó]crito|ferritina|transferrina|c[aá]lcio|f[oó]sforo|\bpth\b|vitamina\s*d"
+    r"|albumina|pot[aá]ssio|ur[eé]ia|creatinina"
+    r"|g/dl|mg/dl|ng/ml|pg/ml|mmol/l|meq/l"
+    r"|valor(?:es)? de refer[eê]ncia|data da coleta|material:",
+    re.IGNORECASE,
+)
+LIMIAR_TRIAGEM = 3
+
+# Identificação do paciente (nome, nascimento): a página é mantida na triagem
+# para que extract_metadata ainda encontre esses campos
+_IDENTIFICACAO = re.compile(r"\b(?:paciente|nome)\s*:|nascimento|\bd\.\s?n\.", re.IGNORECASE)
+
+# Limites de entrada (configuráveis por ambiente) e processamento em janelas de páginas
+MAX_BYTES_PDF = int(os.getenv("PCDT_MAX_PDF_MB", "100")) * 1024 * 1024
+MAX_PAGINAS = int(os.getenv("PCDT_MAX_PAGINAS", "500"))
+JANELA_PAGINAS = 16
+LIMITE_MEMORIA_UPLOAD = 8 * 1024 * 1024  # acima disso o upload vai para um arquivo temporário
+_BLOCO = 1024 * 1024
+
+
+def pontuar_pagina(texto: str) -> int:
+    """Cheap lab-report likelihood score: number of lab keywords and units on the page."""
+    return sum(1 for _ in _TERMOS_LABORATORIO.finditer(texto))
+
+
+def triar_paginas(textos, limiar: int = LIMIAR_TRIAGEM):
+    """
+    Selects the pages likely to contain lab results.
+
+    Args:
+        textos: Text of each page, in order.
+        limiar (int): Minimum score for a page to be kept.
+
+    Returns:
+        list[int]: Indices of candidate pages; all pages if none reaches the threshold.
+    """
+    return _paginas_laboratorio(textos, limiar) or list(range(len(textos)))
+
+
+def _paginas_laboratorio(textos, limiar: int = LIMIAR_TRIAGEM):
+    """Lab pages plus the pages identifying the patient; empty if no page looks like a lab report."""
+    laboratorio = [numero for numero, texto in enumerate(textos) if pontuar_pagina(texto) >= limiar]
+    if not laboratorio:
+        return []
+    identificacao = [numero for numero, texto in enumerate(textos) if _IDENTIFICACAO.search(texto)]
+    return sorted(set(laboratorio) | set(identificacao))
+
+
+def _pagina_precisa_ocr(page, texto: str) -> bool:
+    """Only scanned pages (no text layer, at least one image) go through OCR."""
+    return not texto.strip() and bool(page.get_images())
+
+
+def _hash_pagina(pdf_doc, page) -> str:
+    """
+    Hashes the raw page content and image streams, without rendering the page.
+
+    Args:
+        pdf_doc: The open PyMuPDF document.
+        page: The page to hash.
+
+    Returns:
+        str: Hex digest identifying the page content and OCR settings.
+    """
+    h = hashlib.sha256(f"{OCR_DPI}|{OCR_IDIOMA}|".encode("ascii"))
+    h.update(page.read_contents())
+    for imagem in page.get_images():
+        h.update(pdf_doc.xref_stream_raw(imagem[0]) or b"")
+    return h.hexdigest()
+
+
+def _ocr_png(png: bytes) -> Optional[str]:
+    """
+    Runs OCR on a rendered page. Executed inside the process pool.
+
+    Uses PyMuPDF's Tesseract integration and falls back to pytesseract when
+    installed. Returns None when no OCR engine is available.
+    """
+    import fitz  # PyMuPDF
+
+    try:
+        pixmap = fitz.Pixmap(png)
+        with fitz.open("pdf", pixmap.pdfocr_tobytes(language=OCR_IDIOMA)) as ocr_doc:
+            return "".join(page.get_text() for page in ocr_doc)
+    except RuntimeError:
+        pass
+
+    try:
+        import io
+        import pytesseract
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        return pytesseract.image_to_string(Image.open(io.BytesIO(png)), lang=OCR_IDIOMA)
+    except pytesseract.TesseractNotFoundError:
+        return None
+
+
+def _executar_ocr(pngs, max_workers):
+    if len(pngs) == 1 or max_workers == 1:
+        return [_ocr_png(png) for png in pngs]
+    workers = min(len(pngs), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_ocr_png, pngs))
+
+
+def _aplicar_ocr(pdf_doc, textos, max_workers, paginas=None):
+    """Fills in the text of scanned pages, reusing cached OCR output per page hash."""
+    pendentes = []
+    for numero in paginas if paginas is not None else range(len(pdf_doc)):
+        page = pdf_doc[numero]
+        if not _pagina_precisa_ocr(page, textos[numero]):
+            continue
+        chave = _hash_pagina(pdf_doc, page)
+        em_cache = ler_cache("ocr", chave)
+        if em_cache is not None:
+            textos[numero] = em_cache.decode("utf-8")
+        else:
+            pendentes.append((numero, chave, page.get_pixmap(dpi=OCR_DPI).tobytes("png")))
+
+    if not pendentes:
+        return
+
+    resultados = _executar_ocr([png for _, _, png in pendentes], max_workers)
+    for (numero, chave, _), texto in zip(pendentes, resultados):
+        if texto is None:
+            continue  # sem mecanismo de OCR: não grava no cache para tentar de novo depois
+        gravar_cache("ocr", chave, texto.encode("utf-8"))
+        textos[numero] = texto
+
+
+class ArquivoGrandeDemais(ValueError):
+    """The PDF exceeds MAX_BYTES_PDF or MAX_PAGINAS."""
+
+
+def _caminho_local(file) -> Optional[str]:
+    """Path of a file object backed by a regular file on disk (opened directly, no copy)."""
+    nome = getattr(file, "name", None)
+    if not isinstance(nome, str):
+        return None
+    try:
+        # Só o próprio arquivo aberto: um nome de upload pode coincidir com outro arquivo
+        return nome if os.path.samestat(os.fstat(file.fileno()), os.stat(nome)) else None
+    except (OSError, AttributeError, ValueError):
+        return None
+
+
+def _spool(file, max_bytes: int):
+    """
+    Copies the upload in blocks, failing as soon as it exceeds `max_bytes`.
+
+    Small uploads stay in memory; larger ones are written to a named temporary
+    file so PyMuPDF reads pages from disk instead of a full in-memory copy.
+
+    Returns:
+        tuple: (bytes or None, temporary file path or None).
+    """
+    buffer = bytearray()
+    temporario = None
+    total = 0
+    try:
+        while True:
+            bloco = file.read(_BLOCO)
+            if not bloco:
+                break
+            total += len(bloco)
+            if total > max_bytes:
+                raise ArquivoGrandeDemais(f"PDF maior que o limite de {max_bytes // (1024 * 1024)} MB")
+            if temporario is None and len(buffer) + len(bloco) > LIMITE_MEMORIA_UPLOAD:
+                temporario = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+                temporario.write(buffer)
+                buffer = None
+            if temporario is not None:
+                temporario.write(bloco)
+            else:
+                buffer.extend(bloco)
+    except BaseException:
+        if temporario is not None:
+            temporario.close()
+            os.unlink(temporario.name)
+        raise
+    if temporario is None:
+        return bytes(buffer), None
+    temporario.close()
+    return None, temporario.name
+
+
+def _abrir_pdf(file, max_bytes: int):
+    """Opens the PDF within the size limit; returns (document, temporary path to delete or None)."""
+    import fitz
+
+    caminho = _caminho_local(file)
+    if caminho is not None:
+        if os.path.getsize(caminho) > max_bytes:
+            raise ArquivoGrandeDemais(f"PDF maior que o limite de {max_bytes // (1024 * 1024)} MB")
+        return fitz.open(caminho, filetype="pdf"), None
+    conteudo, temporario = _spool(file, max_bytes)
+    if temporario is not None:
+        return fitz.open(temporario, filetype="pdf"), temporario
+    return fitz.open(stream=conteudo, filetype="pdf"), None
+
+
+def extract_text_from_pdf(
+    file: BinaryIO,
+    ocr: bool = True,
+    ocr_workers: Optional[int] = None,
+    somente_laboratorio: bool = False,
+    max_bytes: Optional[int] = None,
+    max_paginas: Optional[int] = None,
+) -> str:
     """
     Extracts all text from a PDF file.
 
+    Pages without a text layer that contain images (scanned exams) are sent
+    to OCR in a process pool; OCR output is cached on disk per page hash.
+    Pages are processed in windows of JANELA_PAGINAS and large uploads are
+    spooled to disk, so peak memory does not grow with the size of the input.
+
+    With somente_laboratorio, triage runs on the text layer before OCR:
+    text pages that are neither lab pages nor identify the patient are
+    dropped without further work. Image-only pages have no text to score, so
+    they stay candidates, are OCR'd and then triaged on their OCR text like
+    the others. If no page in the text layer looks like a lab report (a fully
+    scanned exam), every page is OCR'd and the triage runs on the OCR output.
+
     Args:
         file (BinaryIO): A binary file-like object representing the PDF file.
+        ocr (bool): Whether to run OCR on scanned pages.
+        ocr_workers (Optional[int]): Process pool size for OCR (default: CPU count).
+        somente_laboratorio (bool): Keep only pages that look like lab results
+            (prescriptions, imaging reports and consent forms are dropped).
+        max_bytes (Optional[int]): Size limit (default: MAX_BYTES_PDF).
+        max_paginas (Optional[int]): Page limit (default: MAX_PAGINAS).
 
     Returns:
         str: The extracted text from the PDF.
+
+    Raises:
+        ArquivoGrandeDemais: The file exceeds the size or page limit.
+        ValueError: The file is not a readable PDF.
     """
+    # PyMuPDF is imported on first use, so importing this module stays cheap
+    # for entry points that may never open a PDF
+    import fitz
+
+    max_bytes = MAX_BYTES_PDF if max_bytes is None else max_bytes
+    max_paginas = MAX_PAGINAS if max_paginas is None else max_paginas
+    temporario = None
     try:
+        pdf_doc, temporario = _abrir_pdf(file, max_bytes)
         # Use a context manager to ensure the PDF is properly closed
-        with fitz.open(stream=file.read(), filetype="pdf") as pdf_doc:
-            # Use a list to collect text for better performance
-            text = [page.get_text() for page in pdf_doc]
+        with pdf_doc:
+            if pdf_doc.page_count > max_paginas:
+                raise ArquivoGrandeDemais(f"PDF com {pdf_doc.page_count} páginas (limite: {max_paginas})")
+            # Camada de texto de todas as páginas (barata); o OCR vem depois, só nas candidatas
+            text = []
+            for inicio in range(0, pdf_doc.page_count, JANELA_PAGINAS):
+                janela = range(inicio, min(inicio + JANELA_PAGINAS, pdf_doc.page_count))
+                text.extend(pdf_doc[numero].get_text() for numero in janela)
+                # Libera o cache interno do MuPDF (páginas, imagens) antes da próxima janela
+                fitz.TOOLS.store_shrink(100)
+
+            paginas = list(range(pdf_doc.page_count))
+            if somente_laboratorio:
+                candidatas = _paginas_laboratorio(text)
+                if candidatas:
+                    # Páginas sem camada de texto não têm o que pontuar ainda: passam
+                    # pelo OCR e são triadas depois, pelo texto reconhecido
+                    paginas = sorted(set(candidatas) | {numero for numero, texto in enumerate(text) if not texto.strip()})
+            if ocr:
+                for inicio in range(0, len(paginas), JANELA_PAGINAS):
+                    _aplicar_ocr(pdf_doc, text, ocr_workers, paginas[inicio:inicio + JANELA_PAGINAS])
+                    fitz.TOOLS.store_shrink(100)
+        if somente_laboratorio:
+            text = [text[numero] for numero in paginas]
+            text = [text[indice] for indice in triar_paginas(text)]
         # Join the list into a single string and return
         return "".join(text)
+    except ArquivoGrandeDemais:
+        raise
     except Exception as e:
         # Handle errors (e.g., invalid PDF format)
         raise ValueError(f"Failed to extract text from PDF: {e}")
+    finally:
+        if temporario is not None:
+            os.unlink(temporario)
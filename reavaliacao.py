@@ -0,0 +1,97 @@
+# Reavaliação incremental dos relatórios armazenados quando as regras do PCDT mudam.
+#
+# Uso: python reavaliacao.py
+#
+# Para cada versão antiga das regras, só os relatórios que têm valor em algum
+# analito cuja regra mudou são recalculados; os demais apenas avançam de versão.
+import supabase_client
+from diagnosis_engine import VERSAO_REGRAS, analitos_alterados, build_report
+from templates_relatorio import renderizar_texto
+
+TAMANHO_LOTE = 200
+COLUNAS = "id, nome, idade, modalidade, dados"
+
+
+def _filtro_analitos(analitos):
+    """Filtro PostgREST: linhas com valor em pelo menos um dos analitos."""
+    return ",".join(f"dados->>{analito}.not.is.null" for analito in sorted(analitos))
+
+
+def reavaliar_relatorio(linha):
+    """Recalcula resumo e conteúdo de uma linha a partir dos dados armazenados."""
+    parsed = {
+        "dados": linha["dados"],
+        "meta": {
+            "nome": linha.get("nome"),
+            "idade": linha.get("idade"),
+            "modalidade": linha.get("modalidade"),
+        },
+    }
+    relatorio = build_report(parsed)
+    return {
+        "id": linha["id"],
+        "resumo": ", ".join(relatorio["diagnosticos"]),
+        "conteudo": renderizar_texto(relatorio),
+        "diagnosticos": relatorio["diagnosticos"],
+        "trilha": [list(decisao) for decisao in relatorio["trilha"]],
+        "versao_regras": VERSAO_REGRAS,
+    }
+
+
+def reavaliar_versao(versao, assinaturas, tamanho_lote=TAMANHO_LOTE):
+    """Reavalia os relatórios gerados com `versao`; retorna quantos foram recalculados."""
+    tabela = supabase_client.supabase.table
+    analitos = analitos_alterados(assinaturas)
+    total = 0
+
+    if analitos:
+        ultimo_id = 0
+        while True:
+            lote = (
+                tabela("relatorios_pcdt")
+                .select(COLUNAS)
+                .eq("versao_regras", versao)
+                .or_(_filtro_analitos(analitos))
+                .gt("id", ultimo_id)
+                .order("id")
+                .limit(tamanho_lote)
+                .execute()
+            ).data
+            if not lote:
+                break
+
+            # Escrita em lote: um único upsert por página de resultados
+            tabela("relatorios_pcdt").upsert(
+                [reavaliar_relatorio(linha) for linha in lote], on_conflict="id"
+            ).execute()
+            total += len(lote)
+            ultimo_id = lote[-1]["id"]
+            if len(lote) < tamanho_lote:
+                break
+
+    # Relatórios sem analitos afetados continuam válidos: só a versão avança
+    tabela("relatorios_pcdt").update({"versao_regras": VERSAO_REGRAS}).eq("versao_regras", versao).execute()
+    return total
+
+
+def reavaliar_relatorios(tamanho_lote=TAMANHO_LOTE):
+    """Leva todos os relatórios armazenados para a versão atual das regras."""
+    supabase_client.registrar_versao_regras()
+    versoes = (
+        supabase_client.supabase.table("versoes_regras")
+        .select("versao, assinaturas")
+        .neq("versao", VERSAO_REGRAS)
+        .execute()
+    ).data
+    return {
+        v["versao"]: reavaliar_versao(v["versao"], v["assinaturas"], tamanho_lote)
+        for v in versoes
+    }
+
+
+if __name__ == "__main__":
+    resultado = reavaliar_relatorios()
+    if not resultado:
+        print(f"Nenhuma versão anterior das regras; versão atual {VERSAO_REGRAS}.")
+    for versao, total in resultado.items():
+        print(f"Versão {versao} -> {VERSAO_REGRAS}: {total} relatório(s) recalculado(s).")
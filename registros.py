@@ -0,0 +1,88 @@
+# Registros compactos dos resultados de análise (dataclasses com __slots__).
+#
+# Um lote de coorte mantém centenas de milhares de resultados em memória: sem
+# o __dict__ por instância cada registro ocupa bem menos, e o acesso por
+# atributo (resultado.meta.nome) é mais rápido que por chave de dicionário.
+#
+# Para não quebrar quem ainda usa o formato antigo, os registros aceitam
+# leitura por chave (resultado["meta"]["nome"], .get, `in`, dict(registro)) e
+# para_dict() devolve os dicionários de antes, prontos para JSON.
+from dataclasses import dataclass
+
+
+class _Registro:
+    __slots__ = ()
+    # Campos que, quando None, se comportam como chave ausente
+    _OPCIONAIS = ()
+
+    def __contains__(self, chave):
+        return chave in self.__dataclass_fields__ and (
+            chave not in self._OPCIONAIS or getattr(self, chave) is not None
+        )
+
+    def keys(self):
+        return [chave for chave in self.__dataclass_fields__ if chave in self]
+
+    def __getitem__(self, chave):
+        if chave not in self:
+            raise KeyError(chave)
+        return getattr(self, chave)
+
+    def __setitem__(self, chave, valor):
+        if chave not in self.__dataclass_fields__:
+            raise KeyError(chave)
+        setattr(self, chave, valor)
+
+    def get(self, chave, padrao=None):
+        return getattr(self, chave) if chave in self else padrao
+
+    def para_dict(self):
+        """Dicionário equivalente (o formato anterior), com os registros internos convertidos."""
+        return {chave: _para_dict(getattr(self, chave)) for chave in self.keys()}
+
+
+def _para_dict(valor):
+    if isinstance(valor, _Registro):
+        return valor.para_dict()
+    if isinstance(valor, dict):
+        return {chave: _para_dict(item) for chave, item in valor.items()}
+    return valor
+
+
+@dataclass(slots=True)
+class Extracao(_Registro):
+    """Valor de um analito lido do laudo, com confiança e trechos de origem (início, fim)."""
+
+    valor: float
+    unidade: str
+    confianca: float
+    motivos: list
+    trecho: tuple
+    trecho_valor: tuple
+
+
+@dataclass(slots=True)
+class Metadados(_Registro):
+    """Identificação do paciente extraída do laudo."""
+
+    nome: str
+    idade: str
+    data_nascimento: str
+    modalidade: str
+
+
+@dataclass(slots=True)
+class ResultadoExame(_Registro):
+    """
+    Resultado de analyze_exam_text (ou da ingestão estruturada).
+
+    "dados" é {analito: valor ou None} na ordem do registro; "extracoes" e
+    "serie" ficam None quando não se aplicam e aí não aparecem como chaves.
+    """
+
+    _OPCIONAIS = ("extracoes", "serie")
+
+    dados: dict
+    meta: Metadados
+    extracoes: dict = None
+    serie: dict = None
@@ -0,0 +1,85 @@
+# Fila de revisão manual das extrações.
+#
+# Uso: streamlit run revisao.py
+#
+# Cada página carrega só os itens exibidos. Um item precisa ser assumido antes
+# de ser editado; a reserva impede que dois revisores trabalhem no mesmo exame.
+import math
+
+import streamlit as st
+
+from analitos import ANALITOS
+from supabase_client import (
+    TAMANHO_PAGINA_REVISAO,
+    concluir_revisao,
+    liberar_revisao,
+    listar_fila_revisao,
+    reivindicar_revisao,
+)
+
+STATUS = {"pendente": "Pendentes", "em_revisao": "Em revisão", "concluido": "Concluídos"}
+
+st.title("Fila de Revisão")
+
+revisor = st.text_input("Revisor", key="revisor").strip()
+status = st.selectbox(
+    "Situação", list(STATUS), format_func=STATUS.get,
+    on_change=lambda: st.session_state.update(pagina_revisao=0),
+)
+
+pagina = st.session_state.get("pagina_revisao", 0)
+itens, total = listar_fila_revisao(pagina, TAMANHO_PAGINA_REVISAO, status)
+paginas = max(1, math.ceil(total / TAMANHO_PAGINA_REVISAO))
+st.caption(f"{total} exame(s) · página {pagina + 1} de {paginas}")
+
+
+def _formulario(item):
+    dados = item.get("dados") or {}
+    revisados = {}
+    with st.form(f"revisao-{item['id']}"):
+        for chave, spec in ANALITOS.items():
+            if chave in dados:
+                revisados[chave] = st.number_input(
+                    f"{spec['nome']} ({spec['unidade']})" if spec["unidade"] else spec["nome"],
+                    value=float(dados[chave]) if dados[chave] is not None else None,
+                    key=f"{item['id']}-{chave}",
+                )
+        observacao = st.text_area("Observação", key=f"{item['id']}-obs")
+        concluir = st.form_submit_button("✅ Concluir")
+    if concluir:
+        if concluir_revisao(item["id"], revisor, revisados, observacao or None):
+            st.success("Revisão concluída.")
+            st.rerun()
+        st.error("A reserva expirou ou foi assumida por outro revisor.")
+    if st.button("↩️ Devolver à fila", key=f"liberar-{item['id']}"):
+        liberar_revisao(item["id"], revisor)
+        st.rerun()
+
+
+for item in itens:
+    with st.expander(f"#{item['id']} · {item['nome']} · prioridade {item['prioridade']}"):
+        st.write(", ".join(item["motivos"]))
+        for analito, trecho in (item.get("trechos") or {}).items():
+            st.caption(ANALITOS[analito]["nome"] if analito in ANALITOS else analito)
+            st.code(trecho, language=None)
+
+        if item["status"] == "concluido":
+            continue
+        if item["status"] == "em_revisao" and item["revisor"] == revisor and revisor:
+            _formulario(item)
+            continue
+        if item["status"] == "em_revisao":
+            # Reservas expiradas podem ser assumidas; reivindicar_revisao decide
+            st.info(f"Em revisão por {item['revisor']}.")
+        if st.button("📝 Assumir", key=f"assumir-{item['id']}", disabled=not revisor):
+            if reivindicar_revisao(item["id"], revisor):
+                st.rerun()
+            st.warning("Outro revisor assumiu este exame.")
+
+anterior, _, proxima = st.columns([1, 3, 1])
+if anterior.button("◀ Anterior", disabled=pagina == 0):
+    st.session_state["pagina_revisao"] = pagina - 1
+    st.rerun()
+if proxima.button("Próxima ▶", disabled=pagina + 1 >= paginas):
+    st.session_state["pagina_revisao"] = pagina + 1
+    st.rerun()
@@ -0,0 +1,85 @@
+# Serviço de exportação: renderiza PDF e DOCX em paralelo num pool compartilhado.
+#
+# O pool é único por processo (todas as sessões do Streamlit o compartilham) e
+# limitado por PCDT_EXPORT_WORKERS. Pedidos iguais em andamento (mesmo formato e
+# mesmo conteúdo de relatório) recebem o mesmo Future em vez de renderizar de novo.
+#
+# reportlab e python-docx só são importados na primeira renderização de cada
+# formato, não ao importar este módulo.
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = int(os.getenv("PCDT_EXPORT_WORKERS", "4"))
+
+
+def gerar_pdf(relatorio):
+    from exporter import gerar_pdf_relatorio
+
+    return gerar_pdf_relatorio(relatorio)
+
+
+def gerar_docx(relatorio):
+    from docx_exporter import gerar_docx_relatorio
+
+    return gerar_docx_relatorio(relatorio)
+
+
+FORMATOS = {
+    "pdf": gerar_pdf,
+    "docx": gerar_docx,
+}
+
+_executor = None
+_lock = threading.Lock()
+_em_andamento = {}
+
+
+def hash_relatorio(relatorio):
+    """Hash estável do conteúdo do relatório (texto ou estruturado)."""
+    if isinstance(relatorio, dict):
+        conteudo = json.dumps(relatorio, sort_keys=True, ensure_ascii=False, default=str)
+    else:
+        conteudo = relatorio
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def _obter_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pcdt-exportacao")
+    return _executor
+
+
+def _renderizar(formato, relatorio):
+    # bytes em vez de BytesIO: o resultado pode ser lido por vários chamadores
+    return FORMATOS[formato](relatorio).getvalue()
+
+
+def _concluir(chave, futuro):
+    with _lock:
+        if _em_andamento.get(chave) is futuro:
+            del _em_andamento[chave]
+
+
+def submeter(relatorio, formato):
+    """Agenda a renderização de `relatorio` em `formato`; retorna um Future com os bytes."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+    chave = (formato, hash_relatorio(relatorio))
+    with _lock:
+        futuro = _em_andamento.get(chave)
+        if futuro is not None:
+            return futuro
+        futuro = _obter_executor().submit(_renderizar, formato, relatorio)
+        _em_andamento[chave] = futuro
+    futuro.add_done_callback(lambda f: _concluir(chave, f))
+    return futuro
+
+
+def exportar(relatorio, formatos=("pdf", "docx")):
+    """Renderiza os formatos pedidos concorrentemente: {formato: Future[bytes]}."""
+    return {formato: submeter(relatorio, formato) for formato in formatos}
@@ -1,7 +1,15 @@
-from supabase import create_client
 import datetime
 import os
 from dotenv import load_dotenv
+from diagnosis_engine import VERSAO_REGRAS, assinaturas_regras
+from identidade import (
+    VALORES_AUSENTES,
+    chave_paciente,
+    hash_exame,
+    normalizar_data_nascimento,
+    normalizar_nome,
+)
+from templates_relatorio import renderizar_texto
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,9 +24,65 @@ if not SUPABASE_URL or not SUPABASE_KEY:
         "Copy .env.example to .env and fill in your credentials."
     )
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# O pacote supabase (e o cliente HTTP por trás dele) só é carregado no primeiro
+# acesso ao banco: importar este módulo não custa o tempo de inicialização dele
+_cliente_criado = None
+
+
+def _cliente():
+    """Cliente do Supabase, criado no primeiro uso (ou o substituto em supabase_client.supabase)."""
+    global _cliente_criado
+    substituto = globals().get("supabase")
+    if substituto is not None:
+        return substituto
+    if _cliente_criado is None:
+        from supabase import create_client
+
+        _cliente_criado = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _cliente_criado
+
+
+def __getattr__(nome):
+    # supabase_client.supabase continua disponível para quem já o usa (reavaliacao, testes)
+    if nome == "supabase":
+        return _cliente()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+# Versões de regras já gravadas em versoes_regras neste processo
+_versoes_registradas = set()
+
+
+def registrar_paciente(meta):
+    """Insere ou atualiza o paciente pela chave de identidade e retorna seu id."""
+    chave = chave_paciente(meta)
+    if chave is None:
+        return None
 
-def registrar_relatorio(meta, resumo, texto):
+    data = {
+        "chave_identidade": chave,
+        "nome": meta.get("nome"),
+        "nome_normalizado": normalizar_nome(meta.get("nome")),
+        "data_nascimento": normalizar_data_nascimento(meta.get("data_nascimento")),
+        "modalidade": meta.get("modalidade"),
+    }
+    resposta = _cliente().table("pacientes").upsert(data, on_conflict="chave_identidade").execute()
+    return resposta.data[0]["id"] if resposta.data else None
+
+
+def registrar_versao_regras():
+    """Grava as assinaturas da versão atual das regras (uma vez por processo)."""
+    if VERSAO_REGRAS in _versoes_registradas:
+        return
+    _cliente().table("versoes_regras").upsert(
+        {"versao": VERSAO_REGRAS, "assinaturas": assinaturas_regras()},
+        on_conflict="versao", ignore_duplicates=True
+    ).execute()
+    _versoes_registradas.add(VERSAO_REGRAS)
+
+
+def registrar_relatorio(meta, resumo, texto, texto_exame=None, dados=None, diagnosticos=None, trilha=None,
+                        data_coleta=None):
     data = {
         "nome": meta.get("nome"),
         "idade": meta.get("idade"),
@@ -27,4 +91,274 @@ def registrar_relatorio(meta, resumo, texto):
         "conteudo": texto,
         "data_registro": datetime.datetime.now().isoformat()
     }
-    supabase.table("relatorios_pcdt").insert(data).execute()
\ No newline at end of file
+
+    if dados is not None:
+        # Guarda os valores extraídos para permitir reavaliação sem reenviar o PDF
+        registrar_versao_regras()
+        data["dados"] = dados
+        data["versao_regras"] = VERSAO_REGRAS
+
+    if diagnosticos is not None:
+        data["diagnosticos"] = diagnosticos
+    if trilha is not None:
+        # Listas [regra, analito, valor, operador, limiar, disparou] (diagnosis_engine.Decisao)
+        data["trilha"] = [list(decisao) for decisao in trilha]
+    if data_coleta is not None:
+        # Data do exame (não do envio): ordena o resumo por paciente (resumo_pacientes)
+        data["data_coleta"] = data_coleta
+
+    if texto_exame is None:
+        _cliente().table("relatorios_pcdt").insert(data).execute()
+        return None
+
+    # Caminho deduplicado: o mesmo exame enviado de novo não gera outra linha
+    data["paciente_id"] = registrar_paciente(meta)
+    data["hash_exame"] = hash_exame(texto_exame)
+    _cliente().table("relatorios_pcdt").upsert(
+        data, on_conflict="hash_exame", ignore_duplicates=True
+    ).execute()
+    return data["paciente_id"]
+
+
+def data_coleta_relatorio(relatorio, data_padrao=None):
+    """Data de coleta mais recente da série do relatório (ISO), ou `data_padrao` se não houver."""
+    datas = [data for data in (relatorio.get("serie") or {}).get("data", []) if data]
+    return max(datas) if datas else data_padrao
+
+
+def registrar_relatorio_estruturado(relatorio, texto_exame=None, data_padrao=None):
+    """
+    Registra o relatório de build_report usando seus campos, sem reprocessar o texto.
+
+    A data de coleta vem da série do relatório; sem ela, usa `data_padrao`.
+    """
+    return registrar_relatorio(
+        relatorio["meta"],
+        ", ".join(relatorio["diagnosticos"]),
+        renderizar_texto(relatorio),
+        texto_exame=texto_exame,
+        dados=relatorio["dados"],
+        diagnosticos=relatorio["diagnosticos"],
+        trilha=relatorio.get("trilha"),
+        data_coleta=data_coleta_relatorio(relatorio, data_padrao),
+    )
+
+
+def registrar_serie_resultados(paciente_id, serie, data_padrao=None):
+    """
+    Grava todos os resultados de uma série (ver analitos.extrair_serie) em uma única escrita.
+
+    Resultados sem data de coleta usam `data_padrao`; se ela também faltar, são ignorados.
+    Retorna o número de linhas enviadas.
+    """
+    if paciente_id is None:
+        return 0
+
+    linhas = {}
+    for data, analito, valor in zip(serie["data"], serie["analito"], serie["valor"]):
+        data = data or data_padrao
+        if data is None or valor is None:
+            continue
+        # Uma linha por (data, analito): o upsert em lote não aceita chaves repetidas
+        linhas.setdefault((data, analito), {
+            "paciente_id": paciente_id,
+            "data_coleta": data,
+            "analito": analito,
+            "valor": valor,
+        })
+
+    if linhas:
+        _cliente().table("resultados_laboratoriais").upsert(
+            list(linhas.values()), on_conflict="paciente_id,data_coleta,analito"
+        ).execute()
+    return len(linhas)
+
+
+def buscar_historico_paciente(meta, limite=50):
+    """Relatórios do paciente, do mais recente para o mais antigo, via chave indexada."""
+    chave = chave_paciente(meta)
+    if chave is None:
+        return []
+
+    paciente = _cliente().table("pacientes").select("id").eq("chave_identidade", chave).limit(1).execute()
+    if not paciente.data:
+        return []
+
+    resposta = (
+        _cliente().table("relatorios_pcdt")
+        .select("*")
+        .eq("paciente_id", paciente.data[0]["id"])
+        .order("data_registro", desc=True)
+        .limit(limite)
+        .execute()
+    )
+    return resposta.data
+
+
+# Resumo por paciente (tabela resumo_pacientes, mantida por gatilho no banco a
+# cada relatório gravado): o painel consulta só essa tabela, indexada por
+# modalidade e diagnóstico, sem percorrer relatorios_pcdt.
+TAMANHO_PAGINA_RESUMO = 50
+COLUNAS_RESUMO = (
+    "paciente_id, nome, modalidade, ultimo_exame, ultimo_registro, dados, diagnosticos, no_alvo, total_relatorios"
+)
+
+
+def listar_resumo_pacientes(pagina=0, tamanho=TAMANHO_PAGINA_RESUMO, modalidade=None, diagnostico=None):
+    """Uma página de pacientes (data de coleta mais recente primeiro) e o total com os filtros aplicados."""
+    inicio = pagina * tamanho
+    consulta = _cliente().table("resumo_pacientes").select(COLUNAS_RESUMO, count="exact")
+    if modalidade:
+        consulta = consulta.eq("modalidade", modalidade)
+    if diagnostico:
+        # diagnosticos @> {diagnostico}: usa o índice GIN
+        consulta = consulta.contains("diagnosticos", [diagnostico])
+    resposta = (
+        consulta
+        .order("ultimo_exame", desc=True)
+        .order("paciente_id")
+        .range(inicio, inicio + tamanho - 1)
+        .execute()
+    )
+    return resposta.data, resposta.count or 0
+
+
+def contar_diagnosticos():
+    """Linhas {diagnostico, modalidade, pacientes} da view contagem_diagnosticos."""
+    return _cliente().table("contagem_diagnosticos").select("diagnostico, modalidade, pacientes").execute().data
+
+
+# Fila de revisão manual: exames cuja extração falhou ou ficou ambígua.
+# Cada item é reservado por um revisor por até BLOQUEIO_REVISAO_MINUTOS; depois
+# disso volta a poder ser assumido por outro (revisor que fechou a aba, etc.).
+BLOQUEIO_REVISAO_MINUTOS = 30
+TAMANHO_PAGINA_REVISAO = 20
+# Sem nome ou sem nenhum valor o relatório não serve para nada: vai para o topo
+PRIORIDADE_REVISAO = {"nome não identificado": 10, "nenhum analito encontrado": 10}
+CONTEXTO_TRECHO = 40
+
+
+def motivos_revisao(relatorio):
+    """Motivos para um relatório de build_report precisar de revisão manual (lista vazia se não precisa)."""
+    motivos = []
+    if relatorio["meta"].get("nome") in VALORES_AUSENTES:
+        motivos.append("nome não identificado")
+    if all(valor is None for valor in relatorio["dados"].values()):
+        motivos.append("nenhum analito encontrado")
+    motivos.extend(f"extração ambígua: {analito}" for analito in relatorio.get("revisar", []))
+    return motivos
+
+
+def prioridade_revisao(motivos):
+    return sum(PRIORIDADE_REVISAO.get(motivo, 1) for motivo in motivos)
+
+
+def _agora():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def enfileirar_revisao(relatorio, texto_exame, extracoes=None):
+    """
+    Coloca o exame na fila de revisão se houver motivo; o mesmo exame entra uma única vez.
+
+    `extracoes` (de analyze_exam_text) permite guardar o trecho do laudo de cada
+    valor ambíguo, para o revisor não precisar abrir o PDF.
+    Retorna os motivos (vazio quando o exame não precisa de revisão).
+    """
+    motivos = motivos_revisao(relatorio)
+    if not motivos:
+        return motivos
+
+    trechos = {}
+    for analito in relatorio.get("revisar", []):
+        if extracoes and analito in extracoes:
+            inicio, fim = extracoes[analito]["trecho"]
+            trechos[analito] = texto_exame[max(0, inicio - CONTEXTO_TRECHO):fim + CONTEXTO_TRECHO]
+
+    _cliente().table("fila_revisao").upsert({
+        "hash_exame": hash_exame(texto_exame),
+        "nome": relatorio["meta"].get("nome"),
+        "motivos": motivos,
+        "prioridade": prioridade_revisao(motivos),
+        "dados": relatorio["dados"],
+        "trechos": trechos,
+    }, on_conflict="hash_exame", ignore_duplicates=True).execute()
+    return motivos
+
+
+def listar_fila_revisao(pagina=0, tamanho=TAMANHO_PAGINA_REVISAO, status="pendente"):
+    """Uma página da fila (maior prioridade primeiro) e o total de itens com esse status."""
+    inicio = pagina * tamanho
+    resposta = (
+        _cliente().table("fila_revisao")
+        .select("id, nome, motivos, prioridade, status, revisor, bloqueado_em, dados, trechos", count="exact")
+        .eq("status", status)
+        .order("prioridade", desc=True)
+        .order("id")
+        .range(inicio, inicio + tamanho - 1)
+        .execute()
+    )
+    return resposta.data, resposta.count or 0
+
+
+def reivindicar_revisao(item_id, revisor, bloqueio_minutos=BLOQUEIO_REVISAO_MINUTOS):
+    """
+    Reserva o item para `revisor`; retorna False se outro revisor já o assumiu.
+
+    A condição vai no próprio UPDATE: entre dois revisores concorrentes só um
+    encontra a linha ainda livre, sem precisar de leitura prévia.
+    """
+    agora = _agora()
+    expirado = (agora - datetime.timedelta(minutes=bloqueio_minutos)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    resposta = (
+        _cliente().table("fila_revisao")
+        .update({"status": "em_revisao", "revisor": revisor, "bloqueado_em": agora.isoformat()})
+        .eq("id", item_id)
+        .or_(f"status.eq.pendente,and(status.eq.em_revisao,bloqueado_em.lt.{expirado})")
+        .execute()
+    )
+    return bool(resposta.data)
+
+
+def liberar_revisao(item_id, revisor):
+    """Devolve à fila um item reservado por `revisor`."""
+    resposta = (
+        _cliente().table("fila_revisao")
+        .update({"status": "pendente", "revisor": None, "bloqueado_em": None})
+        .eq("id", item_id)
+        .eq("revisor", revisor)
+        .eq("status", "em_revisao")
+        .execute()
+    )
+    return bool(resposta.data)
+
+
+def concluir_revisao(item_id, revisor, dados_revisados=None, observacao=None):
+    """Marca como concluído um item reservado por `revisor`, com os valores corrigidos."""
+    resposta = (
+        _cliente().table("fila_revisao")
+        .update({
+            "status": "concluido",
+            "dados_revisados": dados_revisados,
+            "observacao": observacao,
+            "concluido_em": _agora().isoformat(),
+        })
+        .eq("id", item_id)
+        .eq("revisor", revisor)
+        .eq("status", "em_revisao")
+        .execute()
+    )
+    return bool(resposta.data)
+
+
+def salvar_analise(relatorio, texto_exame, extracoes=None, data_padrao=None):
+    """
+    Grava uma análise completa: relatório, série de resultados e, se preciso, item na fila de revisão.
+
+    Usado pelos caminhos automáticos (api.py, monitor_pasta.py). Retorna o id do paciente.
+    """
+    paciente_id = registrar_relatorio_estruturado(relatorio, texto_exame=texto_exame, data_padrao=data_padrao)
+    if relatorio.get("serie"):
+        registrar_serie_resultados(paciente_id, relatorio["serie"], data_padrao=data_padrao)
+    enfileirar_revisao(relatorio, texto_exame, extracoes)
+    return paciente_id
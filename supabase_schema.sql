@@ -1,6 +1,17 @@
 -- Tabela para armazenar relatórios de pacientes em diálise
 -- Execute este SQL no Supabase SQL Editor
 
+-- Cadastro normalizado de pacientes (uma linha por pessoa)
+CREATE TABLE IF NOT EXISTS pacientes (
+    id BIGSERIAL PRIMARY KEY,
+    chave_identidade TEXT NOT NULL UNIQUE,
+    nome TEXT,
+    nome_normalizado TEXT,
+    data_nascimento DATE,
+    modalidade TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 CREATE TABLE IF NOT EXISTS relatorios_pcdt (
     id BIGSERIAL PRIMARY KEY,
     nome TEXT,
@@ -12,12 +23,49 @@ CREATE TABLE IF NOT EXISTS relatorios_pcdt (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Vínculo com o paciente e deduplicação por conteúdo do exame
+ALTER TABLE relatorios_pcdt ADD COLUMN IF NOT EXISTS paciente_id BIGINT REFERENCES pacientes(id);
+ALTER TABLE relatorios_pcdt ADD COLUMN IF NOT EXISTS hash_exame TEXT;
+
+-- Valores extraídos e versão das regras usadas, para reavaliação incremental
+ALTER TABLE relatorios_pcdt ADD COLUMN IF NOT EXISTS dados JSONB;
+ALTER TABLE relatorios_pcdt ADD COLUMN IF NOT EXISTS versao_regras TEXT;
+ALTER TABLE relatorios_pcdt ADD COLUMN IF NOT EXISTS diagnosticos TEXT[];
+ALTER TABLE relatorios_pcdt ADD COLUMN IF NOT EXISTS trilha JSONB;
+ALTER TABLE relatorios_pcdt ADD COLUMN IF NOT EXISTS data_coleta DATE;
+
+-- Assinatura por analito de cada versão das regras (ver reavaliacao.py)
+CREATE TABLE IF NOT EXISTS versoes_regras (
+    versao TEXT PRIMARY KEY,
+    assinaturas JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Série histórica de resultados: uma linha por (paciente, data de coleta, analito)
+CREATE TABLE IF NOT EXISTS resultados_laboratoriais (
+    id BIGSERIAL PRIMARY KEY,
+    paciente_id BIGINT NOT NULL REFERENCES pacientes(id),
+    data_coleta DATE NOT NULL,
+    analito TEXT NOT NULL,
+    valor NUMERIC NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (paciente_id, data_coleta, analito)
+);
+
 -- Adicionar índices para melhorar performance de consultas
 CREATE INDEX IF NOT EXISTS idx_relatorios_pcdt_nome ON relatorios_pcdt(nome);
 CREATE INDEX IF NOT EXISTS idx_relatorios_pcdt_data_registro ON relatorios_pcdt(data_registro DESC);
 CREATE INDEX IF NOT EXISTS idx_relatorios_pcdt_created_at ON relatorios_pcdt(created_at DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_relatorios_pcdt_hash_exame ON relatorios_pcdt(hash_exame);
+CREATE INDEX IF NOT EXISTS idx_relatorios_pcdt_paciente_data ON relatorios_pcdt(paciente_id, data_registro DESC);
+CREATE INDEX IF NOT EXISTS idx_relatorios_pcdt_versao_regras ON relatorios_pcdt(versao_regras, id);
+CREATE INDEX IF NOT EXISTS idx_resultados_paciente_analito_data ON resultados_laboratoriais(paciente_id, analito, data_coleta DESC);
+CREATE INDEX IF NOT EXISTS idx_pacientes_nome_normalizado ON pacientes(nome_normalizado);
 
 -- Adicionar comentários para documentação
+COMMENT ON TABLE pacientes IS 'Identidade normalizada dos pacientes, usada para agrupar relatórios';
+COMMENT ON COLUMN pacientes.chave_identidade IS 'SHA-256 do nome normalizado + data de nascimento';
+COMMENT ON COLUMN pacientes.nome_normalizado IS 'Nome sem acentos, partículas e variações de caixa';
 COMMENT ON TABLE relatorios_pcdt IS 'Armazena relatórios clínicos gerados pelo sistema PCDT Diálise Assistente';
 COMMENT ON COLUMN relatorios_pcdt.nome IS 'Nome do paciente extraído do exame';
 COMMENT ON COLUMN relatorios_pcdt.idade IS 'Idade do paciente';
@@ -26,3 +74,160 @@ COMMENT ON COLUMN relatorios_pcdt.resumo IS 'Resumo dos diagnósticos principais
 COMMENT ON COLUMN relatorios_pcdt.conteudo IS 'Relatório completo com diagnósticos e condutas';
 COMMENT ON COLUMN relatorios_pcdt.data_registro IS 'Data/hora em que o relatório foi gerado pelo sistema';
 COMMENT ON COLUMN relatorios_pcdt.created_at IS 'Data/hora em que o registro foi criado no banco de dados';
+COMMENT ON COLUMN relatorios_pcdt.paciente_id IS 'Paciente ao qual o relatório pertence';
+COMMENT ON COLUMN relatorios_pcdt.hash_exame IS 'SHA-256 do texto do exame; impede registros duplicados do mesmo exame';
+COMMENT ON COLUMN relatorios_pcdt.dados IS 'Valores laboratoriais extraídos (saída de analyze_exam_text)';
+COMMENT ON COLUMN relatorios_pcdt.versao_regras IS 'Versão das regras do PCDT usada para gerar o relatório';
+COMMENT ON TABLE versoes_regras IS 'Hash das regras por analito em cada versão, para reavaliar só o que mudou';
+COMMENT ON TABLE resultados_laboratoriais IS 'Resultados laboratoriais por data de coleta, extraídos inclusive de laudos cumulativos';
+COMMENT ON COLUMN resultados_laboratoriais.valor IS 'Valor na unidade canônica do analito (ver analitos.py)';
+COMMENT ON COLUMN relatorios_pcdt.diagnosticos IS 'Diagnósticos do relatório estruturado, sem precisar interpretar o conteudo';
+COMMENT ON COLUMN relatorios_pcdt.data_coleta IS 'Data de coleta mais recente do exame (não a do envio); ordena resumo_pacientes';
+COMMENT ON COLUMN relatorios_pcdt.trilha IS 'Decisão de cada regra: [regra, analito, valor, operador, limiar, disparou] (ver diagnosis_engine.Decisao)';
+
+-- Quantas vezes cada regra disparou em cada versão das regras, direto da trilha
+CREATE OR REPLACE VIEW disparos_regras AS
+SELECT r.versao_regras,
+       d.item->>0 AS regra,
+       COUNT(*) FILTER (WHERE (d.item->>5)::BOOLEAN) AS disparos,
+       COUNT(*) AS avaliacoes
+FROM relatorios_pcdt r
+CROSS JOIN LATERAL jsonb_array_elements(r.trilha) AS d(item)
+WHERE r.trilha IS NOT NULL
+GROUP BY r.versao_regras, d.item->>0;
+
+COMMENT ON VIEW disparos_regras IS 'Disparos e avaliações de cada regra por versão, calculados a partir de relatorios_pcdt.trilha';
+
+-- Fila de revisão manual (ver revisao.py): exames com nome não identificado,
+-- sem valores ou com extração de baixa confiança
+CREATE TABLE IF NOT EXISTS fila_revisao (
+    id BIGSERIAL PRIMARY KEY,
+    hash_exame TEXT NOT NULL UNIQUE,
+    nome TEXT,
+    motivos TEXT[] NOT NULL,
+    prioridade INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pendente' CHECK (status IN ('pendente', 'em_revisao', 'concluido')),
+    revisor TEXT,
+    bloqueado_em TIMESTAMP WITH TIME ZONE,
+    dados JSONB,
+    trechos JSONB,
+    dados_revisados JSONB,
+    observacao TEXT,
+    concluido_em TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Página da fila: filtro por status, ordenada por prioridade
+CREATE INDEX IF NOT EXISTS idx_fila_revisao_status_prioridade ON fila_revisao(status, prioridade DESC, id);
+
+COMMENT ON TABLE fila_revisao IS 'Exames aguardando revisão manual da extração';
+COMMENT ON COLUMN fila_revisao.status IS 'pendente, em_revisao (reservado por revisor) ou concluido';
+COMMENT ON COLUMN fila_revisao.bloqueado_em IS 'Início da reserva; reservas antigas podem ser assumidas por outro revisor';
+COMMENT ON COLUMN fila_revisao.trechos IS 'Trecho do laudo em torno de cada valor ambíguo';
+
+-- Resumo por paciente para o painel (dashboard.py): valores e diagnósticos do
+-- exame mais recente, data desse exame e analitos dentro da meta.
+-- Mantido a cada escrita em relatorios_pcdt pelo gatilho abaixo, o painel lê
+-- uma linha por paciente em vez de percorrer todo o histórico de relatórios.
+-- "Mais recente" é pela data de coleta (relatorios_pcdt.data_coleta, ou a data
+-- do registro quando o laudo não traz data), não pela ordem de envio: um exame
+-- antigo enviado depois não substitui o resumo.
+CREATE TABLE IF NOT EXISTS resumo_pacientes (
+    paciente_id BIGINT PRIMARY KEY REFERENCES pacientes(id),
+    relatorio_id BIGINT NOT NULL,
+    nome TEXT,
+    modalidade TEXT,
+    ultimo_exame DATE,
+    ultimo_registro TIMESTAMP WITH TIME ZONE,
+    dados JSONB,
+    diagnosticos TEXT[] NOT NULL DEFAULT '{}',
+    no_alvo JSONB,
+    total_relatorios INTEGER NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_resumo_pacientes_modalidade ON resumo_pacientes(modalidade, ultimo_exame DESC);
+CREATE INDEX IF NOT EXISTS idx_resumo_pacientes_diagnosticos ON resumo_pacientes USING GIN (diagnosticos);
+CREATE INDEX IF NOT EXISTS idx_resumo_pacientes_ultimo_exame ON resumo_pacientes(ultimo_exame DESC, paciente_id);
+
+-- {analito: true/false} a partir da trilha: um analito medido está na meta se
+-- nenhuma das suas regras disparou
+CREATE OR REPLACE FUNCTION analitos_no_alvo(trilha JSONB) RETURNS JSONB AS $$
+    SELECT jsonb_object_agg(analito, NOT disparou)
+    FROM (
+        SELECT d.item->>1 AS analito, bool_or((d.item->>5)::BOOLEAN) AS disparou
+        FROM jsonb_array_elements(COALESCE(trilha, '[]'::JSONB)) AS d(item)
+        WHERE jsonb_typeof(d.item->2) = 'number'
+        GROUP BY d.item->>1
+    ) AS por_analito;
+$$ LANGUAGE SQL IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION atualizar_resumo_paciente() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.paciente_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+
+    -- Só um exame coletado na mesma data ou depois do que está no resumo o
+    -- substitui (empate: o registrado por último); reavaliacao.py atualiza
+    -- relatórios antigos sem mexer no resumo
+    INSERT INTO resumo_pacientes AS r
+        (paciente_id, relatorio_id, nome, modalidade, ultimo_exame, ultimo_registro, dados, diagnosticos, no_alvo)
+    VALUES
+        (NEW.paciente_id, NEW.id, NEW.nome, NEW.modalidade,
+         COALESCE(NEW.data_coleta, NEW.data_registro::DATE), NEW.data_registro, NEW.dados,
+         COALESCE(NEW.diagnosticos, '{}'), analitos_no_alvo(NEW.trilha))
+    ON CONFLICT (paciente_id) DO UPDATE SET
+        relatorio_id = EXCLUDED.relatorio_id,
+        nome = EXCLUDED.nome,
+        modalidade = EXCLUDED.modalidade,
+        ultimo_exame = EXCLUDED.ultimo_exame,
+        ultimo_registro = EXCLUDED.ultimo_registro,
+        dados = EXCLUDED.dados,
+        diagnosticos = EXCLUDED.diagnosticos,
+        no_alvo = EXCLUDED.no_alvo,
+        atualizado_em = NOW()
+    WHERE r.relatorio_id = EXCLUDED.relatorio_id
+       OR r.ultimo_exame IS NULL
+       OR (EXCLUDED.ultimo_exame, EXCLUDED.ultimo_registro) >= (r.ultimo_exame, r.ultimo_registro);
+
+    IF TG_OP = 'INSERT' THEN
+        UPDATE resumo_pacientes SET total_relatorios = total_relatorios + 1
+        WHERE paciente_id = NEW.paciente_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_relatorios_pcdt_resumo ON relatorios_pcdt;
+CREATE TRIGGER trg_relatorios_pcdt_resumo
+    AFTER INSERT OR UPDATE OF dados, diagnosticos, trilha ON relatorios_pcdt
+    FOR EACH ROW EXECUTE FUNCTION atualizar_resumo_paciente();
+
+-- Carga inicial a partir dos relatórios já gravados (sem efeito se o resumo já existe)
+INSERT INTO resumo_pacientes
+    (paciente_id, relatorio_id, nome, modalidade, ultimo_exame, ultimo_registro, dados, diagnosticos, no_alvo,
+     total_relatorios)
+SELECT DISTINCT ON (r.paciente_id)
+    r.paciente_id, r.id, r.nome, r.modalidade, COALESCE(r.data_coleta, r.data_registro::DATE), r.data_registro,
+    r.dados, COALESCE(r.diagnosticos, '{}'), analitos_no_alvo(r.trilha),
+    COUNT(*) OVER (PARTITION BY r.paciente_id)
+FROM relatorios_pcdt r
+WHERE r.paciente_id IS NOT NULL
+ORDER BY r.paciente_id, COALESCE(r.data_coleta, r.data_registro::DATE) DESC NULLS LAST,
+         r.data_registro DESC NULLS LAST, r.id DESC
+ON CONFLICT (paciente_id) DO NOTHING;
+
+-- Pacientes por diagnóstico e modalidade, segundo o relatório mais recente de cada um
+CREATE OR REPLACE VIEW contagem_diagnosticos AS
+SELECT d.diagnostico, r.modalidade, COUNT(*) AS pacientes
+FROM resumo_pacientes r
+CROSS JOIN LATERAL unnest(r.diagnosticos) AS d(diagnostico)
+GROUP BY d.diagnostico, r.modalidade;
+
+COMMENT ON TABLE resumo_pacientes IS 'Último relatório de cada paciente, mantido pelo gatilho trg_relatorios_pcdt_resumo';
+COMMENT ON COLUMN resumo_pacientes.ultimo_exame IS 'Data de coleta do exame mais recente (data do registro se o laudo não tiver data)';
+COMMENT ON COLUMN resumo_pacientes.ultimo_registro IS 'Quando esse exame foi gravado (desempate entre exames da mesma data)';
+COMMENT ON COLUMN resumo_pacientes.no_alvo IS 'Analito medido -> true se nenhuma regra do PCDT disparou para ele (ver analitos_no_alvo)';
+COMMENT ON COLUMN resumo_pacientes.total_relatorios IS 'Relatórios gravados para o paciente';
+COMMENT ON VIEW contagem_diagnosticos IS 'Pacientes por diagnóstico e modalidade, a partir de resumo_pacientes';
@@ -0,0 +1,72 @@
+# Templates do relatório clínico.
+#
+# Os templates usam a sintaxe de string.Template ($campo) e são compilados uma
+# única vez em uma sequência de (trecho literal, campo); renderizar é só juntar
+# os trechos. Uma unidade pode ter seu próprio texto chamando compilar_template.
+from string import Template
+
+TEMPLATE_TEXTO = (
+    "Paciente: $nome\nIdade: $idade\nModalidade: $modalidade\n"
+    "\nDiagnósticos prováveis:\n$diagnosticos"
+    "\n\nCondutas sugeridas:\n$condutas"
+    "\n\nEvolução clínica automática:\n$evolucao"
+)
+
+TEMPLATE_EVOLUCAO = (
+    "Paciente em diálise com alterações laboratoriais compatíveis com "
+    "$diagnosticos_texto. Seguir PCDT vigente."
+)
+
+# Seções usadas pelos exportadores PDF/DOCX: (título, campo do relatório)
+SECOES = [
+    ("Diagnósticos prováveis", "diagnosticos"),
+    ("Condutas sugeridas", "condutas"),
+    ("Evolução clínica automática", "evolucao"),
+]
+
+
+def compilar_template(texto):
+    """Compila um template $campo em uma tupla de (literal, campo ou None)."""
+    partes = []
+    inicio = 0
+    for match in Template.pattern.finditer(texto):
+        literal = texto[inicio:match.start()]
+        if match.group("escaped") is not None:
+            partes.append((literal + "$", None))
+        elif match.group("invalid") is not None:
+            raise ValueError(f"Campo inválido no template na posição {match.start()}")
+        else:
+            partes.append((literal, match.group("named") or match.group("braced")))
+        inicio = match.end()
+    partes.append((texto[inicio:], None))
+    return tuple(partes)
+
+
+def renderizar(compilado, campos):
+    return "".join(literal + (campos[campo] if campo else "") for literal, campo in compilado)
+
+
+TEXTO_COMPILADO = compilar_template(TEMPLATE_TEXTO)
+EVOLUCAO_COMPILADA = compilar_template(TEMPLATE_EVOLUCAO)
+
+
+def lista_marcadores(itens):
+    return "- " + "\n- ".join(itens)
+
+
+def renderizar_evolucao(diagnosticos, compilado=EVOLUCAO_COMPILADA):
+    return renderizar(compilado, {"diagnosticos_texto": ", ".join(diagnosticos)})
+
+
+def renderizar_texto(relatorio, compilado=TEXTO_COMPILADO):
+    """Renderiza o relatório estruturado (ver diagnosis_engine.build_report) como texto."""
+    meta = relatorio["meta"]
+    return renderizar(compilado, {
+        "nome": str(meta.get("nome")),
+        "idade": str(meta.get("idade")),
+        "modalidade": str(meta.get("modalidade")),
+        "diagnosticos": lista_marcadores(relatorio["diagnosticos"]),
+        "condutas": lista_marcadores(relatorio["condutas"]),
+        "diagnosticos_texto": ", ".join(relatorio["diagnosticos"]),
+        "evolucao": relatorio["evolucao"],
+    })
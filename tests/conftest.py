@@ -5,6 +5,13 @@ import pytest
 import io
 
 
+@pytest.fixture(autouse=True)
+def credenciais_supabase(monkeypatch):
+    """Dummy Supabase credentials: supabase_client refuses to import without them (tests mock the client)"""
+    monkeypatch.setenv("SUPABASE_URL", "https://test.supabase.co")
+    monkeypatch.setenv("SUPABASE_KEY", "test-key")
+
+
 @pytest.fixture
 def sample_exam_text_normal():
     """Sample exam text with normal values"""
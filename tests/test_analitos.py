@@ -0,0 +1,339 @@
+"""
+Tests for analitos.py
+
+Tests the analyte registry, the combined matcher and unit conversion.
+"""
+import pytest
+from analitos import (
+    ANALITOS,
+    compilar_registro,
+    converter_para_canonica,
+    extrair_valores,
+    extrair_valores_detalhados,
+    fator_conversao,
+    registrar_analito,
+    valores_ambiguos,
+)
+
+
+class TestConversaoUnidades:
+    """Tests for conversion to canonical units"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_calcio_mmol_to_mg_dl(self):
+        """Calcium in mmol/L should be converted to mg/dL"""
+        assert extrair_valores("Cálcio: 2,3 mmol/L")["calcio"] == 9.22
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_pth_pmol_to_pg_ml(self):
+        """PTH in pmol/L should be converted to pg/mL"""
+        assert extrair_valores("PTH: 70 pmol/L")["pth"] == 660.1
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_vitamina_d_nmol_to_ng_ml(self):
+        """25-OH vitamin D in nmol/L should be converted to ng/mL"""
+        assert extrair_valores("25-hidroxivitamina D: 50 nmol/L")["vitamina_d"] == 20.03
+
+    @pytest.mark.unit
+    def test_hemoglobina_g_l(self):
+        """Hemoglobin in g/L should be converted to g/dL"""
+        assert extrair_valores("Hemoglobina: 95 g/L")["hemoglobina"] == 9.5
+
+    @pytest.mark.unit
+    def test_unit_case_insensitive(self):
+        """Units written in upper case should still be recognized"""
+        assert extrair_valores("FOSFORO: 1,8 MMOL/L")["fosforo"] == 5.57
+
+    @pytest.mark.unit
+    def test_canonical_unit_not_rounded(self):
+        """Values already in the canonical unit should be kept as-is"""
+        assert extrair_valores("Ferritina: 120.55 ng/mL")["ferritina"] == 120.55
+
+    @pytest.mark.unit
+    def test_mg_dl_is_not_read_as_g_dl(self):
+        """A value in mg/dL must not be taken as hemoglobin in g/dL"""
+        assert extrair_valores("Hemoglobina: 9 mg/dL")["hemoglobina"] is None
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    @pytest.mark.parametrize("texto", [
+        "Hemoglobina 9.5 (g/dL)",
+        "Hemoglobina: 9,5 [g/dL]",
+        "Hemoglobina 9,5 ( g/dL )",
+        "Hemoglobina.....: 9,5 g/dL",
+    ])
+    def test_common_lab_layouts(self, texto):
+        """Units in parentheses or brackets after the number should still be read"""
+        assert extrair_valores(texto)["hemoglobina"] == 9.5
+
+    @pytest.mark.unit
+    def test_parenthesized_unit_is_converted(self):
+        """A unit in parentheses should still drive the conversion to the canonical unit"""
+        assert extrair_valores("Cálcio 2,3 (mmol/L)")["calcio"] == 9.22
+        assert extrair_valores("Hemoglobina 9 (mg/dL)")["hemoglobina"] is None
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_ionized_calcium_is_not_total_calcium(self):
+        """Ionized calcium (mmol/L) must not be converted into total calcium"""
+        detalhes = extrair_valores_detalhados("Cálcio iônico: 1.2 mmol/L\nCálcio total 9.0 mg/dL")
+        assert detalhes["calcio"].valor == 9.0
+        assert detalhes["calcio"].confianca == 1.0
+        assert extrair_valores("Cálcio ionizado: 1,2 mmol/L")["calcio"] is None
+
+    @pytest.mark.unit
+    def test_converter_para_canonica_batch(self):
+        """Should convert parallel lists in one call"""
+        convertidos = converter_para_canonica(
+            ["calcio", "pth", "hemoglobina"], [2.5, 600.0, 10.0], ["mmol/L", "pg/mL", "mg/dL"]
+        )
+        assert convertidos == [10.02, 600.0, None]
+
+    @pytest.mark.unit
+    def test_fator_conversao_unknown_unit(self):
+        """Unknown units should have no conversion factor"""
+        assert fator_conversao("pth", "mg/dL") is None
+        assert fator_conversao("pth", "PMOL/L") == 9.43
+
+
+class TestRegistro:
+    """Tests for the registry and the combined matcher"""
+
+    @pytest.mark.unit
+    def test_new_analytes_extracted(self):
+        """Albumin, potassium, bicarbonate and Kt/V come from registry data"""
+        texto = "Albumina: 3,8 g/dL\nPotássio: 5,1 mEq/L\nBicarbonato: 22 mmol/L\nKt/V: 1,35"
+        dados = extrair_valores(texto)
+        assert dados["albumina"] == 3.8
+        assert dados["potassio"] == 5.1
+        assert dados["bicarbonato"] == 22.0
+        assert dados["kt_v"] == 1.35
+
+    @pytest.mark.unit
+    def test_result_has_every_registry_key(self):
+        """Missing analytes should be present with None"""
+        dados = extrair_valores("")
+        assert list(dados) == list(ANALITOS)
+        assert all(v is None for v in dados.values())
+
+    @pytest.mark.unit
+    def test_label_without_value_does_not_block_later_occurrence(self):
+        """Should use the first label occurrence that has a value and unit"""
+        texto = "Hemoglobina (ver abaixo)\nHemoglobina: 10,4 g/dL"
+        assert extrair_valores(texto)["hemoglobina"] == 10.4
+
+    @pytest.mark.unit
+    def test_registrar_analito_recompiles(self):
+        """Registering an analyte should make it extractable without code changes"""
+        antes = compilar_registro()
+        try:
+            registrar_analito("ureia", "Ureia", ["uréia"], "mg/dL", {"mg/dL": 1.0, "mmol/L": 6.006})
+            assert compilar_registro() is not antes
+            assert extrair_valores("Uréia: 20 mmol/L")["ureia"] == 120.12
+        finally:
+            del ANALITOS["ureia"]
+            compilar_registro.cache_clear()
+
+
+class TestIndiceRotulos:
+    """Tests for synonym lookup through the label index"""
+
+    @pytest.mark.unit
+    def test_synonyms(self):
+        """Synonyms in the registry map to the same analyte"""
+        valores = extrair_valores("Paratormônio: 700 pg/mL\nFosfato: 6,1 mg/dL\nHGB: 9,9 g/dL")
+        assert valores["pth"] == 700.0
+        assert valores["fosforo"] == 6.1
+        assert valores["hemoglobina"] == 9.9
+
+    @pytest.mark.unit
+    def test_label_inside_word_ignored(self):
+        """'pth' inside another word is not the PTH label"""
+        assert extrair_valores("Depth: 3 pg/mL\nPTH: 420 pg/mL")["pth"] == 420.0
+
+    @pytest.mark.unit
+    def test_value_only_in_window_after_label(self):
+        """A number far past the label is not attributed to it"""
+        texto = "Albumina (ver observação)" + " x" * 100 + " 3,9 g/dL"
+        assert extrair_valores(texto)["albumina"] is None
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    def test_large_catalogue(self):
+        """Extraction stays correct with hundreds of registered analytes"""
+        try:
+            for numero in range(300):
+                registrar_analito(f"teste_{numero}", f"Teste {numero}", [f"marcador {numero}"], "U/L", {"U/L": 1.0})
+            valores = extrair_valores("Marcador 250: 12 U/L\nHemoglobina: 9,5 g/dL\nMarcador 3: 4 U/L")
+            assert valores["teste_250"] == 12.0
+            assert valores["teste_3"] == 4.0
+            assert valores["hemoglobina"] == 9.5
+        finally:
+            for numero in range(300):
+                del ANALITOS[f"teste_{numero}"]
+            compilar_registro.cache_clear()
+
+
+class TestExtrairSerie:
+    """Tests for multi-collection-date extraction"""
+
+    CUMULATIVO = """
+    Paciente: João Silva Santos
+    Data da Coleta: 15/03/2024
+    Hemoglobina: 9,8 g/dL
+    PTH: 700 pg/mL
+    Data da Coleta: 15/02/2024
+    Hemoglobina: 10,2 g/dL
+    PTH: 61 pmol/L
+    Data da Coleta: 15/01/2024
+    Hemoglobina: 10,9 g/dL
+    """
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_every_date_is_extracted(self):
+        """Should return one triple per analyte per collection date"""
+        from analitos import extrair_serie
+        serie = extrair_serie(self.CUMULATIVO)
+
+        assert serie["data"] == ["2024-03-15", "2024-03-15", "2024-02-15", "2024-02-15", "2024-01-15"]
+        assert serie["analito"] == ["hemoglobina", "pth", "hemoglobina", "pth", "hemoglobina"]
+        assert serie["valor"] == [9.8, 700.0, 10.2, 575.23, 10.9]
+
+    @pytest.mark.unit
+    def test_columns_have_equal_length(self):
+        """The columnar structure should keep parallel columns aligned"""
+        from analitos import extrair_serie
+        serie = extrair_serie(self.CUMULATIVO)
+        assert len(serie["data"]) == len(serie["analito"]) == len(serie["valor"])
+
+    @pytest.mark.unit
+    def test_values_without_date_have_none(self, sample_exam_text_normal):
+        """Values before any collection date should have date None"""
+        from analitos import extrair_serie
+        serie = extrair_serie(sample_exam_text_normal)
+        assert set(serie["data"]) == {None}
+        assert len(serie["analito"]) == 7
+
+    @pytest.mark.unit
+    def test_fixture_collection_date(self):
+        """Should pick up the 'Data da Coleta' of the sample exam file"""
+        from analitos import extrair_serie
+        from pathlib import Path
+
+        texto = (Path(__file__).parent / "fixtures" / "sample_exam_text.txt").read_text(encoding="utf-8")
+        serie = extrair_serie(texto)
+        assert set(serie["data"]) == {"2024-03-15"}
+        assert "pth" in serie["analito"]
+
+
+class TestConfianca:
+    """Tests for confidence scoring and source spans of extracted values"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_clean_value_full_confidence(self):
+        """A value right after its label with a unit should be fully trusted"""
+        detalhe = extrair_valores_detalhados("Hemoglobina: 9,5 g/dL")["hemoglobina"]
+        assert detalhe["confianca"] == 1.0
+        assert detalhe["motivos"] == []
+
+    @pytest.mark.unit
+    def test_source_spans(self):
+        """Spans should point back to the label/unit and to the number in the text"""
+        texto = "Exames\nHemoglobina: 9,5 g/dL\n"
+        detalhe = extrair_valores_detalhados(texto)["hemoglobina"]
+
+        inicio, fim = detalhe["trecho"]
+        assert texto[inicio:fim] == "Hemoglobina: 9,5 g/dL"
+        inicio, fim = detalhe["trecho_valor"]
+        assert texto[inicio:fim] == "9,5"
+
+    @pytest.mark.unit
+    def test_source_spans_in_messy_pdf_text(self):
+        """Spans refer to the original text even when normalization changed its length"""
+        texto = "HEMO-\nGLOBINA:\u00a0\u00a0 9,5\u00a0g/dL"
+        detalhe = extrair_valores_detalhados(texto)["hemoglobina"]
+
+        assert detalhe["valor"] == 9.5
+        assert detalhe["unidade"] == "g/dL"
+        inicio, fim = detalhe["trecho"]
+        assert texto[inicio:fim] == texto
+        inicio, fim = detalhe["trecho_valor"]
+        assert texto[inicio:fim] == "9,5"
+
+    @pytest.mark.unit
+    def test_reference_range_flagged(self):
+        """A number followed by a range should be scored as ambiguous"""
+        detalhe = extrair_valores_detalhados("Kt/V: 1,2 - 1,4")["kt_v"]
+        assert "faixa de referência" in detalhe["motivos"]
+        assert detalhe["confianca"] < 0.7
+
+    @pytest.mark.unit
+    def test_reference_label_before_value_flagged(self):
+        """A reference marker between label and value should lower the score"""
+        detalhe = extrair_valores_detalhados("Hemoglobina (VR): 12 g/dL")["hemoglobina"]
+        assert detalhe["motivos"] == ["referência antes do valor"]
+
+    @pytest.mark.unit
+    def test_date_flagged(self):
+        """A date taken as the value should get zero-ish confidence"""
+        detalhe = extrair_valores_detalhados("Kt/V: 10/03/2026")["kt_v"]
+        assert "parece data" in detalhe["motivos"]
+        assert detalhe["confianca"] == 0.0
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    @pytest.mark.parametrize("texto", ["PTH (VR 15-65): 700 pg/mL", "PTH 15 a 65 pg/mL 700 pg/mL"])
+    def test_reference_range_before_unit_bearing_value(self, texto):
+        """A range between the label and a value with unit should be skipped and flagged"""
+        detalhes = extrair_valores_detalhados(texto)
+        assert detalhes["pth"]["valor"] == 700.0
+        assert "faixa de referência" in detalhes["pth"]["motivos"]
+        assert valores_ambiguos(detalhes) == ["pth"]
+
+    @pytest.mark.unit
+    def test_date_before_unit_bearing_value(self):
+        """A date between the label and a value with unit should be flagged"""
+        detalhe = extrair_valores_detalhados("Hemoglobina 12/03/2026 10,5 g/dL")["hemoglobina"]
+        assert detalhe["valor"] == 10.5
+        assert "parece data" in detalhe["motivos"]
+        assert detalhe["confianca"] < 0.7
+
+    @pytest.mark.unit
+    def test_label_without_readable_value_flagged(self):
+        """A label with no value/unit in its window should be kept for review with no value"""
+        detalhes = extrair_valores_detalhados("Hemoglobina: 9 mg/dL\nPTH: 300 pg/mL")
+        assert detalhes["hemoglobina"]["valor"] is None
+        assert detalhes["hemoglobina"]["motivos"] == ["valor não encontrado"]
+        assert detalhes["hemoglobina"]["trecho_valor"] is None
+        assert valores_ambiguos(detalhes) == ["hemoglobina"]
+
+    @pytest.mark.unit
+    def test_out_of_physiological_range_flagged(self):
+        """Values outside the registry plausibility range should be flagged"""
+        detalhe = extrair_valores_detalhados("Hemoglobina: 95 g/dL")["hemoglobina"]
+        assert detalhe["motivos"] == ["fora da faixa fisiológica"]
+
+    @pytest.mark.unit
+    def test_distant_value_alone_not_ambiguous(self):
+        """Dot leaders between label and value lower the score but not below the threshold"""
+        detalhes = extrair_valores_detalhados("Hemoglobina ..............................: 9 g/dL")
+        assert detalhes["hemoglobina"]["motivos"] == ["distante do rótulo"]
+        assert valores_ambiguos(detalhes) == []
+
+    @pytest.mark.unit
+    def test_valores_ambiguos(self):
+        """Only low-confidence analytes should be queued for review"""
+        detalhes = extrair_valores_detalhados("Hemoglobina: 9,5 g/dL\nPTH: 58000 pg/mL\nKt/V: 1,2 - 1,4")
+        assert valores_ambiguos(detalhes) == ["pth", "kt_v"]
+
+    @pytest.mark.unit
+    def test_detailed_values_match_plain_extraction(self, sample_exam_text_multiple_conditions):
+        """Plain extraction should be the values of the detailed extraction"""
+        detalhes = extrair_valores_detalhados(sample_exam_text_multiple_conditions)
+        dados = extrair_valores(sample_exam_text_multiple_conditions)
+        assert {a: d["valor"] for a, d in detalhes.items()} == {a: v for a, v in dados.items() if v is not None}
@@ -0,0 +1,208 @@
+"""
+Tests for api.py
+
+Tests the ASGI endpoints with Starlette's TestClient.
+"""
+import base64
+import datetime
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from starlette.testclient import TestClient
+
+import api
+import auditoria
+
+EXAME = "Paciente: Maria Silva\nHemodiálise\nHemoglobina: 8,5 g/dL\nPTH: 750 pg/mL"
+TOKEN = "token-de-teste"
+AUTORIZACAO = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture(autouse=True)
+def isolamento(tmp_path, monkeypatch):
+    """Threads instead of processes (faster), temporary audit dir and empty store"""
+    monkeypatch.setenv("PCDT_AUDIT_DIR", str(tmp_path / "auditoria"))
+    monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("PCDT_API_TOKEN", TOKEN)
+    monkeypatch.setattr(api, "_executor", ThreadPoolExecutor(max_workers=2))
+    api._relatorios.clear()
+    yield
+    auditoria.fechar()
+
+
+@pytest.fixture
+def cliente():
+    with TestClient(api.app, headers=AUTORIZACAO) as cliente:
+        yield cliente
+
+
+class TestAnalyze:
+    """Tests for POST /analyze"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_plain_text(self, cliente):
+        """Should analyse a plain-text exam and return the structured report"""
+        resposta = cliente.post("/analyze", content=EXAME, headers={"content-type": "text/plain"})
+
+        assert resposta.status_code == 200
+        corpo = resposta.json()
+        assert corpo["relatorio"]["diagnosticos"] == ["Anemia da DRC", "Hiperparatireoidismo secundário"]
+        assert corpo["relatorio"]["dados"]["pth"] == 750.0
+
+    @pytest.mark.unit
+    def test_json_text_same_id(self, cliente):
+        """The report id is the exam hash, so repeated pushes are idempotent"""
+        primeiro = cliente.post("/analyze", content=EXAME, headers={"content-type": "text/plain"}).json()
+        segundo = cliente.post("/analyze", json={"texto": EXAME}).json()
+        assert primeiro["id"] == segundo["id"]
+
+    @pytest.mark.unit
+    def test_pdf_body(self, cliente, tmp_path):
+        """Should extract text from a raw PDF body"""
+        import fitz
+
+        with fitz.open() as pdf:
+            pdf.new_page().insert_text((72, 72), "Hemoglobina: 8.5 g/dL")
+            conteudo = pdf.tobytes()
+
+        resposta = cliente.post("/analyze", content=conteudo, headers={"content-type": "application/pdf"})
+
+        assert resposta.status_code == 200
+        assert resposta.json()["relatorio"]["dados"]["hemoglobina"] == 8.5
+
+    @pytest.mark.unit
+    def test_invalid_requests(self, cliente):
+        """Unsupported or empty bodies should be rejected with 400"""
+        assert cliente.post("/analyze", content=b"", headers={"content-type": "text/plain"}).status_code == 400
+        assert cliente.post("/analyze", content=b"x", headers={"content-type": "image/png"}).status_code == 400
+        assert cliente.post("/analyze", json={"outro": 1}).status_code == 400
+
+    @pytest.mark.unit
+    def test_unreadable_pdf(self, cliente):
+        """A corrupt PDF should be reported as unprocessable"""
+        resposta = cliente.post("/analyze", content=b"not a pdf", headers={"content-type": "application/pdf"})
+        assert resposta.status_code == 422
+
+    @pytest.mark.unit
+    def test_body_over_limit(self, cliente, monkeypatch):
+        """Bodies over MAX_CORPO should be refused with 413"""
+        monkeypatch.setattr(api, "MAX_CORPO", 10)
+        resposta = cliente.post("/analyze", content=b"%PDF" + b"0" * 20, headers={"content-type": "application/pdf"})
+        assert resposta.status_code == 413
+        assert cliente.post("/batch", json={"exames": [{"texto": EXAME}]}).status_code == 413
+
+    @pytest.mark.unit
+    @patch('supabase_client.salvar_analise')
+    def test_save_passes_extractions_and_default_date(self, mock_salvar, cliente):
+        """?salvar=1 should store review excerpts and date undated results, like monitor_pasta"""
+        cliente.post("/analyze?salvar=1", json={"texto": EXAME})
+
+        relatorio, texto, extracoes = mock_salvar.call_args.args
+        assert texto == EXAME
+        assert extracoes["hemoglobina"].valor == 8.5
+        assert mock_salvar.call_args.kwargs == {"data_padrao": datetime.date.today().isoformat()}
+
+    @pytest.mark.unit
+    def test_analysis_is_audited(self, cliente):
+        """Every analysis served by the API should be in the audit log"""
+        cliente.post("/analyze", json={"texto": EXAME})
+        auditoria.fechar()
+        assert len(auditoria.consultar()) == 1
+
+
+class TestBatch:
+    """Tests for POST /batch"""
+
+    @pytest.mark.unit
+    def test_batch_keeps_order_and_isolates_errors(self, cliente):
+        """Results follow input order and a bad PDF does not fail the batch"""
+        ruim = base64.b64encode(b"not a pdf").decode()
+        resposta = cliente.post("/batch", json={"exames": [
+            {"texto": EXAME}, {"pdf_base64": ruim}, {"texto": "Hemoglobina: 12 g/dL"},
+        ]})
+
+        assert resposta.status_code == 200
+        resultados = resposta.json()["resultados"]
+        assert resultados[0]["relatorio"]["dados"]["hemoglobina"] == 8.5
+        assert "erro" in resultados[1]
+        assert resultados[2]["relatorio"]["dados"]["hemoglobina"] == 12.0
+
+    @pytest.mark.unit
+    def test_batch_validation(self, cliente):
+        """Should reject empty, oversized or malformed batches"""
+        assert cliente.post("/batch", json={"exames": []}).status_code == 400
+        assert cliente.post("/batch", json={"exames": [{"texto": "x"}] * (api.MAX_LOTE + 1)}).status_code == 400
+        assert cliente.post("/batch", json=[1, 2]).status_code == 400
+
+
+class TestReport:
+    """Tests for GET /report/{id}"""
+
+    @pytest.mark.unit
+    def test_formats(self, cliente):
+        """Should serve a stored report as JSON, text, PDF and DOCX"""
+        identificador = cliente.post("/analyze", json={"texto": EXAME}).json()["id"]
+
+        assert cliente.get(f"/report/{identificador}").json()["meta"]["nome"] == "Maria Silva"
+        assert cliente.get(f"/report/{identificador}?formato=txt").text.startswith("Paciente: Maria Silva")
+        assert cliente.get(f"/report/{identificador}?formato=pdf").content.startswith(b"%PDF-")
+        assert cliente.get(f"/report/{identificador}?formato=docx").content.startswith(b"PK")
+        assert cliente.get(f"/report/{identificador}?formato=odt").status_code == 400
+
+    @pytest.mark.unit
+    def test_decision_trace(self, cliente):
+        """formato=trilha should return only the per-rule decisions"""
+        identificador = cliente.post("/analyze", json={"texto": EXAME}).json()["id"]
+
+        resposta = cliente.get(f"/report/{identificador}?formato=trilha")
+        assert resposta.headers["content-type"] == "application/json"
+        assert resposta.json()[0][:2] == ["anemia_drc", "hemoglobina"]
+
+    @pytest.mark.unit
+    def test_unknown_report(self, cliente):
+        """Unknown ids should return 404"""
+        assert cliente.get("/report/inexistente").status_code == 404
+
+
+class TestAutenticacao:
+    """Tests for the shared-token check"""
+
+    @pytest.mark.unit
+    @pytest.mark.security
+    def test_requests_without_valid_token_are_rejected(self):
+        """Every route should require the configured token"""
+        with TestClient(api.app) as anonimo:
+            assert anonimo.post("/analyze", json={"texto": EXAME}).status_code == 401
+            assert anonimo.post("/batch", json={"exames": [{"texto": EXAME}]}).status_code == 401
+            assert anonimo.get("/report/qualquer").status_code == 401
+            assert anonimo.get("/report/qualquer", headers={"Authorization": "Bearer errado"}).status_code == 401
+
+    @pytest.mark.unit
+    @pytest.mark.security
+    def test_api_key_header_accepted(self):
+        """X-API-Key should work as an alternative to the bearer token"""
+        with TestClient(api.app, headers={"X-API-Key": TOKEN}) as cliente:
+            assert cliente.post("/analyze", json={"texto": EXAME}).status_code == 200
+
+    @pytest.mark.unit
+    @pytest.mark.security
+    def test_unconfigured_token_fails_closed(self, monkeypatch):
+        """Without PCDT_API_TOKEN the service should refuse every request"""
+        monkeypatch.delenv("PCDT_API_TOKEN")
+        with TestClient(api.app, headers=AUTORIZACAO) as cliente:
+            assert cliente.post("/analyze", json={"texto": EXAME}).status_code == 503
+
+
+class TestProcessPool:
+    """Tests with the real process pool"""
+
+    @pytest.mark.slow
+    def test_analyze_in_worker_process(self, monkeypatch):
+        """The pipeline functions should run in a separate process"""
+        monkeypatch.setattr(api, "_executor", None)
+        with TestClient(api.app, headers=AUTORIZACAO) as cliente:
+            resposta = cliente.post("/analyze", json={"texto": EXAME})
+        assert resposta.status_code == 200
+        assert api._executor is None  # encerrado junto com a aplicação
@@ -0,0 +1,107 @@
+"""
+Tests for auditoria.py
+
+Tests the append-only audit log: record encoding, rollover and index lookups.
+"""
+import datetime
+import pytest
+
+import auditoria
+from auditoria import consultar, ler_segmento, registrar_analise, segmentos
+from diagnosis_engine import VERSAO_REGRAS, analyze_exam_text, build_report
+from identidade import chave_paciente, hash_exame
+
+UTC = datetime.timezone.utc
+
+
+@pytest.fixture(autouse=True)
+def audit_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PCDT_AUDIT_DIR", str(tmp_path))
+    yield tmp_path
+    auditoria.fechar()
+
+
+def _relatorio(nome, hemoglobina):
+    texto = f"Paciente: {nome}\nData de Nascimento: 01/02/1960\nHemoglobina: {hemoglobina} g/dL"
+    return texto, build_report(analyze_exam_text(texto))
+
+
+class TestRegistrarAnalise:
+    """Tests for writing and reading audit records"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_record_round_trip(self):
+        """Should store input hash, rule version, values and diagnoses"""
+        texto, relatorio = _relatorio("Maria Silva", "8,5")
+        registrar_analise(texto, relatorio)
+
+        [registro] = consultar()
+        assert registro["hash_exame"] == hash_exame(texto)
+        assert registro["chave_paciente"] == chave_paciente(relatorio["meta"])
+        assert registro["versao_regras"] == VERSAO_REGRAS
+        assert registro["dados"] == {"hemoglobina": 8.5}
+        assert registro["diagnosticos"] == ["Anemia da DRC"]
+
+    @pytest.mark.unit
+    def test_unidentified_patient(self):
+        """Records without a patient key should still be logged"""
+        texto = "Hemoglobina: 12 g/dL"
+        registrar_analise(texto, build_report(analyze_exam_text(texto)))
+
+        assert consultar()[0]["chave_paciente"] is None
+
+    @pytest.mark.unit
+    def test_daily_rollover(self):
+        """Records of different UTC days go to different segments"""
+        texto, relatorio = _relatorio("Maria Silva", "8,5")
+        registrar_analise(texto, relatorio, momento=datetime.datetime(2026, 3, 1, 23, 59, tzinfo=UTC))
+        registrar_analise(texto, relatorio, momento=datetime.datetime(2026, 3, 2, 0, 1, tzinfo=UTC))
+
+        assert [c.name[:8] for c in segmentos()] == ["20260301", "20260302"]
+        assert len(consultar(desde=datetime.date(2026, 3, 2))) == 1
+
+    @pytest.mark.unit
+    def test_size_rollover(self, monkeypatch):
+        """A full segment should be closed and a new one opened"""
+        monkeypatch.setattr(auditoria, "TAMANHO_SEGMENTO", 1)
+        texto, relatorio = _relatorio("Maria Silva", "8,5")
+        for _ in range(3):
+            registrar_analise(texto, relatorio)
+
+        assert len(segmentos()) == 3
+        assert len(consultar()) == 3
+
+    @pytest.mark.unit
+    def test_truncated_tail_ignored(self):
+        """An interrupted last write should not break reading the segment"""
+        texto, relatorio = _relatorio("Maria Silva", "8,5")
+        registrar_analise(texto, relatorio)
+        auditoria.fechar()
+        [caminho] = segmentos()
+        with open(caminho, "ab") as arquivo:
+            arquivo.write(b"\x00\x00\x01\x00parcial")
+
+        assert len(list(ler_segmento(caminho))) == 1
+
+
+class TestConsultarPorPaciente:
+    """Tests for patient lookups through the segment index"""
+
+    @pytest.mark.unit
+    def test_only_patient_records(self):
+        """Should return only the records of the requested patient"""
+        for nome, hb in [("Maria Silva", "8,5"), ("João Souza", "11"), ("Maria Silva", "9,2")]:
+            registrar_analise(*_relatorio(nome, hb))
+
+        registros = consultar({"nome": "Maria da Silva", "data_nascimento": "01/02/1960"})
+
+        assert [r["dados"]["hemoglobina"] for r in registros] == [8.5, 9.2]
+
+    @pytest.mark.unit
+    def test_unknown_patient(self):
+        """Unidentifiable or unknown patients have no records"""
+        registrar_analise(*_relatorio("Maria Silva", "8,5"))
+
+        assert consultar({"nome": "Não identificado"}) == []
+        assert consultar({"nome": "Pedro Lima", "data_nascimento": "01/02/1960"}) == []
@@ -67,6 +67,20 @@ class TestExtractMetadata:
         result = extract_metadata(text)
         assert result["idade"] == "Não informada"
 
+    @pytest.mark.unit
+    def test_extract_birth_date(self):
+        """Should extract the birth date used for patient identity"""
+        text = "Nome: João Silva\nData de Nascimento: 01/02/1960"
+        result = extract_metadata(text)
+        assert result["data_nascimento"] == "01/02/1960"
+
+    @pytest.mark.unit
+    def test_missing_birth_date(self):
+        """Should return 'Não informada' when birth date is missing"""
+        text = "Nome: João Silva\nIdade: 65"
+        result = extract_metadata(text)
+        assert result["data_nascimento"] == "Não informada"
+
     @pytest.mark.unit
     def test_modality_hemodialise_with_accent(self):
         """Should detect 'hemodiálise' with accent"""
@@ -562,3 +576,143 @@ class TestGenerateReport:
         assert "Sem alterações críticas detectadas" in report
         assert report is not None
         assert len(report) > 0
+
+
+class TestRuleVersioning:
+    """Tests for rule-set versioning used by incremental re-evaluation"""
+
+    @pytest.mark.unit
+    def test_version_is_stable(self):
+        """Same rules should always produce the same version"""
+        from diagnosis_engine import REGRAS, VERSAO_REGRAS, versao_regras
+        assert versao_regras(list(REGRAS)) == VERSAO_REGRAS
+
+    @pytest.mark.unit
+    def test_threshold_change_changes_version(self):
+        """Changing a threshold should produce a new version"""
+        from diagnosis_engine import REGRAS, VERSAO_REGRAS, versao_regras
+        regras = [dict(r, limiar=11) if r["id"] == "anemia_drc" else r for r in REGRAS]
+        assert versao_regras(regras) != VERSAO_REGRAS
+
+    @pytest.mark.unit
+    def test_analitos_alterados_only_reports_changed_analyte(self):
+        """Only the analyte whose rule changed should be flagged"""
+        from diagnosis_engine import REGRAS, assinaturas_regras, analitos_alterados
+        regras = [dict(r, limiar=700) if r["analito"] == "pth" else r for r in REGRAS]
+        assert analitos_alterados(assinaturas_regras(regras)) == {"pth"}
+
+    @pytest.mark.unit
+    def test_analitos_alterados_detects_new_analyte(self):
+        """A rule for a previously unruled analyte should be flagged"""
+        from diagnosis_engine import REGRAS, assinaturas_regras, analitos_alterados
+        antigas = assinaturas_regras([r for r in REGRAS if r["analito"] != "ferritina"])
+        assert analitos_alterados(antigas) == {"ferritina"}
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_evaluate_rules_matches_report(self):
+        """Rule evaluation should return diagnoses and conducts in report order"""
+        from diagnosis_engine import evaluate_rules
+        dx, condutas = evaluate_rules({"hemoglobina": 8.0, "fosforo": 6.0})
+        assert dx == ["Anemia da DRC"]
+        assert condutas == [
+            "Iniciar alfaepoetina e avaliar ferro sérico.",
+            "Iniciar quelante de fósforo (ex: sevelamer).",
+        ]
+
+
+class TestBuildReport:
+    """Tests for the structured report object"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_structured_fields(self, sample_parsed_data_anemia):
+        """Should expose diagnoses and conducts without text parsing"""
+        from diagnosis_engine import build_report, VERSAO_REGRAS
+        relatorio = build_report(sample_parsed_data_anemia)
+
+        assert relatorio["diagnosticos"] == ["Anemia da DRC"]
+        assert "Reposição de ferro (ex: sacarato férrico)." in relatorio["condutas"]
+        assert relatorio["meta"]["nome"] == "Maria Oliveira Costa"
+        assert relatorio["dados"]["hemoglobina"] == 8.5
+        assert relatorio["versao_regras"] == VERSAO_REGRAS
+
+    @pytest.mark.unit
+    def test_generate_report_renders_structure(self, sample_parsed_data_anemia):
+        """generate_report should be the text rendering of build_report"""
+        from diagnosis_engine import build_report
+        from templates_relatorio import renderizar_texto
+        assert generate_report(sample_parsed_data_anemia) == renderizar_texto(build_report(sample_parsed_data_anemia))
+
+    @pytest.mark.unit
+    def test_ambiguous_values_listed_for_review(self):
+        """Analytes extracted with low confidence should be listed in "revisar" """
+        from diagnosis_engine import build_report
+
+        parsed = analyze_exam_text("Paciente: Maria Silva\nHemoglobina: 9,5 g/dL\nKt/V: 1,2 - 1,4")
+
+        assert parsed["extracoes"]["hemoglobina"]["confianca"] == 1.0
+        assert build_report(parsed)["revisar"] == ["kt_v"]
+
+    @pytest.mark.unit
+    def test_value_after_reference_range_listed_for_review(self):
+        """A value read past a reference range should still drive the rules but go to review"""
+        from diagnosis_engine import build_report
+
+        relatorio = build_report(analyze_exam_text("Paciente: Maria Silva\nPTH (VR 15-65): 700 pg/mL"))
+
+        assert relatorio["dados"]["pth"] == 700.0
+        assert relatorio["revisar"] == ["pth"]
+
+
+class TestTrilhaDecisoes:
+    """Tests for the per-rule decision trace"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_trace_has_one_decision_per_rule(self):
+        """Every rule should be traced with its value, threshold and outcome"""
+        from diagnosis_engine import REGRAS, Decisao, build_report
+
+        relatorio = build_report({"dados": {"hemoglobina": 8.5, "pth": None}, "meta": {"nome": "Test"}})
+        trilha = relatorio["trilha"]
+
+        assert [d.regra for d in trilha] == [r["id"] for r in REGRAS]
+        assert trilha[0] == Decisao("anemia_drc", "hemoglobina", 8.5, "<", 10, True)
+        assert trilha[2] == Decisao("hiperparatireoidismo", "pth", None, ">", 600, False)
+
+    @pytest.mark.unit
+    def test_trace_is_optional(self):
+        """evaluate_rules without a trace list should behave as before"""
+        from diagnosis_engine import evaluate_rules
+
+        trilha = []
+        assert evaluate_rules({"hemoglobina": 8.5}, trilha=trilha) == evaluate_rules({"hemoglobina": 8.5})
+        assert sum(d.disparou for d in trilha) == 1
+
+    @pytest.mark.unit
+    def test_json_round_trip(self):
+        """The JSON encoding should be compact arrays that decode back to decisions"""
+        from diagnosis_engine import build_report, desserializar_trilha, serializar_trilha
+
+        trilha = build_report({"dados": {"ferritina": 50.0}, "meta": {}})["trilha"]
+        codificado = serializar_trilha(trilha)
+
+        assert codificado.startswith(b'[["anemia_drc","hemoglobina",null,"<",10,false]')
+        assert desserializar_trilha(codificado) == trilha
+
+    @pytest.mark.unit
+    def test_msgpack(self):
+        """msgpack should round-trip when installed and fail clearly otherwise"""
+        from diagnosis_engine import build_report, desserializar_trilha, serializar_trilha
+
+        trilha = build_report({"dados": {"pth": 700.0}, "meta": {}})["trilha"]
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            with pytest.raises(ValueError, match="msgpack"):
+                serializar_trilha(trilha, "msgpack")
+            with pytest.raises(ValueError, match="msgpack"):
+                desserializar_trilha(b"\x90", "msgpack")
+        else:
+            assert desserializar_trilha(serializar_trilha(trilha, "msgpack"), "msgpack") == trilha
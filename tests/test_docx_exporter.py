@@ -210,3 +210,175 @@ Paciente em diálise com alterações laboratoriais."""
         # Should have: 1 heading + 3 content lines = 4+ paragraphs
         # (heading is added, plus one paragraph per line in the loop)
         assert len(doc.paragraphs) >= 4
+
+
+class TestGerarDocxRelatorioEstruturado:
+    """Tests for DOCX generation from the structured report"""
+
+    @pytest.mark.unit
+    def test_structured_report_headings_and_bullets(self, sample_parsed_data_anemia):
+        """Should render sections as headings and lists as bullets"""
+        from diagnosis_engine import build_report
+
+        result = gerar_docx_relatorio(build_report(sample_parsed_data_anemia))
+        doc = Document(result)
+
+        titulos = [p.text for p in doc.paragraphs if p.style.name == "Heading 2"]
+        assert titulos == [
+            "Valores laboratoriais",
+            "Diagnósticos prováveis",
+            "Condutas sugeridas",
+            "Evolução clínica automática",
+        ]
+        marcadores = [p.text for p in doc.paragraphs if p.style.name == "List Bullet"]
+        assert "Anemia da DRC" in marcadores
+
+    @pytest.mark.unit
+    def test_structured_report_lab_values_table(self, sample_parsed_data_anemia):
+        """Should render extracted lab values as a table with units"""
+        from diagnosis_engine import build_report
+
+        doc = Document(gerar_docx_relatorio(build_report(sample_parsed_data_anemia)))
+
+        assert len(doc.tables) == 1
+        linhas = [[c.text for c in row.cells] for row in doc.tables[0].rows]
+        assert linhas[0] == ["Exame", "Resultado", "Unidade"]
+        assert ["Hemoglobina", "8.5", "g/dL"] in linhas
+
+    @pytest.mark.unit
+    def test_trend_charts_embedded(self, sample_parsed_data_anemia, tmp_path, monkeypatch):
+        """Should add a trends section with one picture per charted analyte"""
+        from diagnosis_engine import build_report
+
+        monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path))
+        parsed = dict(sample_parsed_data_anemia, serie={
+            "data": ["2026-01-10", "2026-02-10"],
+            "analito": ["fosforo", "fosforo"],
+            "valor": [4.8, 6.1],
+        })
+
+        doc = Document(gerar_docx_relatorio(build_report(parsed)))
+
+        assert "Tendências" in [p.text for p in doc.paragraphs if p.style.name.startswith("Heading")]
+        assert len(doc.inline_shapes) == 1
+
+
+@pytest.fixture
+def letterhead_template(tmp_path):
+    """A clinic letterhead template with header text and a fixed body line"""
+    template = Document()
+    template.sections[0].header.paragraphs[0].text = "Clínica de Diálise Exemplo"
+    template.add_paragraph("Unidade de Nefrologia")
+    caminho = tmp_path / "timbrado.docx"
+    template.save(caminho)
+    return caminho
+
+
+class TestGerarDocxLote:
+    """Tests for bulk DOCX generation with template reuse"""
+
+    @pytest.mark.unit
+    def test_one_document_per_report(self, letterhead_template, sample_parsed_data_normal, sample_parsed_data_anemia):
+        """Each report should get its own document with only its own content"""
+        from diagnosis_engine import build_report
+        from docx_exporter import gerar_docx_lote
+
+        buffers = gerar_docx_lote(
+            [build_report(sample_parsed_data_normal), build_report(sample_parsed_data_anemia)],
+            caminho_template=letterhead_template,
+        )
+
+        assert len(buffers) == 2
+        textos = ["\n".join(p.text for p in Document(b).paragraphs) for b in buffers]
+        assert "João Silva Santos" in textos[0] and "Maria Oliveira Costa" not in textos[0]
+        assert "Maria Oliveira Costa" in textos[1] and "João Silva Santos" not in textos[1]
+
+    @pytest.mark.unit
+    def test_letterhead_preserved_in_every_document(self, letterhead_template, sample_parsed_data_normal):
+        """Template header and body content should appear in each generated file"""
+        from diagnosis_engine import build_report
+        from docx_exporter import gerar_docx_lote
+
+        for buffer in gerar_docx_lote([build_report(sample_parsed_data_normal)] * 3, letterhead_template):
+            doc = Document(buffer)
+            assert doc.sections[0].header.paragraphs[0].text == "Clínica de Diálise Exemplo"
+            assert doc.paragraphs[0].text == "Unidade de Nefrologia"
+            assert len(doc.tables) == 1
+
+    @pytest.mark.unit
+    def test_template_without_builtin_styles(self, tmp_path, sample_parsed_data_anemia):
+        """Word-authored templates keep Heading/List Bullet only as latent styles"""
+        from diagnosis_engine import build_report
+        from docx_exporter import gerar_docx_lote
+
+        template = Document()
+        for nome in ("Heading 1", "Heading 2", "List Bullet", "Table Grid"):
+            estilo = template.styles[nome].element
+            estilo.getparent().remove(estilo)
+        caminho = tmp_path / "timbrado_word.docx"
+        template.save(caminho)
+
+        (buffer,) = gerar_docx_lote([build_report(sample_parsed_data_anemia)], caminho)
+        paragrafos = Document(buffer).paragraphs
+
+        titulo = next(p for p in paragrafos if p.text == "Relatório PCDT - Análise de Exames")
+        assert titulo.runs[0].bold
+        assert "• Anemia da DRC" in [p.text for p in paragrafos]
+
+    @pytest.mark.unit
+    @pytest.mark.security
+    def test_each_document_has_only_its_own_charts(self, letterhead_template, sample_parsed_data_anemia,
+                                                    tmp_path, monkeypatch):
+        """Trend charts of one patient must not leak into the next patient's file"""
+        import zipfile
+        from diagnosis_engine import build_report
+        from docx_exporter import gerar_docx_lote
+
+        monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path / "cache"))
+        relatorios = [
+            build_report(dict(sample_parsed_data_anemia, serie={
+                "data": ["2026-01-10", "2026-02-10"],
+                "analito": ["fosforo", "fosforo"],
+                "valor": [4.0 + i, 6.1 + i],
+            }))
+            for i in range(5)
+        ]
+
+        buffers = gerar_docx_lote(relatorios, letterhead_template)
+
+        imagens = []
+        for buffer in buffers:
+            with zipfile.ZipFile(buffer) as pacote:
+                midias = [nome for nome in pacote.namelist() if nome.startswith("word/media/")]
+                imagens.append(pacote.read(midias[0]) if len(midias) == 1 else midias)
+            assert len(Document(buffer).inline_shapes) == 1
+        assert all(isinstance(imagem, bytes) for imagem in imagens)
+        assert len(set(imagens)) == 5
+
+    @pytest.mark.unit
+    def test_template_loaded_once(self, letterhead_template):
+        """The template should be parsed only once for the whole batch"""
+        from unittest.mock import patch
+        import docx_exporter
+
+        with patch("docx_exporter.Document", wraps=Document) as mock_document:
+            docx_exporter.gerar_docx_lote(["Relatório A", "Relatório B", "Relatório C"], letterhead_template)
+
+        assert mock_document.call_count == 1
+
+    @pytest.mark.unit
+    def test_combined_document_with_page_breaks(self, sample_parsed_data_normal, sample_parsed_data_anemia):
+        """Combined mode should emit one document with a page break between patients"""
+        from diagnosis_engine import build_report
+        from docx_exporter import gerar_docx_lote
+
+        buffer = gerar_docx_lote(
+            [build_report(sample_parsed_data_normal), build_report(sample_parsed_data_anemia)],
+            combinado=True,
+        )
+
+        doc = Document(buffer)
+        texto = "\n".join(p.text for p in doc.paragraphs)
+        assert "João Silva Santos" in texto and "Maria Oliveira Costa" in texto
+        quebras = doc.element.body.xml.count('w:type="page"')
+        assert quebras == 1
@@ -177,3 +177,130 @@ Paciente em diálise com alterações laboratoriais compatíveis."""
         # Should be different buffer objects
         assert result1 is not result2
         assert id(result1) != id(result2)
+
+
+class TestGerarPdfRelatorioEstruturado:
+    """Tests for PDF generation from the structured report"""
+
+    @pytest.mark.unit
+    def test_structured_report_sections(self, sample_parsed_data_anemia):
+        """Should render every section of the structured report"""
+        import fitz
+        from diagnosis_engine import build_report
+
+        result = gerar_pdf_relatorio(build_report(sample_parsed_data_anemia))
+
+        with fitz.open(stream=result.read(), filetype="pdf") as pdf:
+            texto = "".join(page.get_text() for page in pdf)
+        assert "Maria Oliveira Costa" in texto
+        assert "Diagnósticos prováveis:" in texto
+        assert "- Anemia da DRC" in texto
+        assert "Evolução clínica automática:" in texto
+
+    @pytest.mark.unit
+    def test_trend_charts_embedded(self, sample_parsed_data_anemia, tmp_path, monkeypatch):
+        """Should embed one image per charted analyte when the report has a series"""
+        import fitz
+        from diagnosis_engine import build_report
+
+        monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path))
+        parsed = dict(sample_parsed_data_anemia, serie={
+            "data": ["2026-01-10", "2026-02-10", "2026-01-10", "2026-02-10"],
+            "analito": ["hemoglobina", "hemoglobina", "pth", "pth"],
+            "valor": [9.1, 8.5, 450.0, 620.0],
+        })
+
+        result = gerar_pdf_relatorio(build_report(parsed))
+
+        with fitz.open(stream=result.read(), filetype="pdf") as pdf:
+            assert sum(len(page.get_images()) for page in pdf) == 2
+
+
+@pytest.fixture
+def logotipo_png():
+    """Small PNG used as clinic letterhead logo"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (80, 40), (0, 90, 160)).save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+class TestGerarPdfConsolidado:
+    """Tests for the consolidated multi-patient PDF export"""
+
+    @pytest.mark.unit
+    def test_one_outline_entry_per_patient(self, sample_parsed_data_normal, sample_parsed_data_anemia):
+        """Should add a bookmark for every patient, pointing at their first page"""
+        import fitz
+        from diagnosis_engine import build_report
+        from exporter import gerar_pdf_consolidado
+
+        result = gerar_pdf_consolidado(
+            [build_report(sample_parsed_data_normal), build_report(sample_parsed_data_anemia)]
+        )
+
+        with fitz.open(stream=result.read(), filetype="pdf") as pdf:
+            toc = pdf.get_toc()
+            assert [titulo for _, titulo, _ in toc] == ["João Silva Santos", "Maria Oliveira Costa"]
+            assert [pagina for _, _, pagina in toc] == [1, 2]
+            assert pdf.page_count == 2
+
+    @pytest.mark.unit
+    def test_logo_embedded_once(self, logotipo_png, sample_parsed_data_normal):
+        """The letterhead image should be a single shared resource"""
+        import fitz
+        from diagnosis_engine import build_report
+        from exporter import gerar_pdf_consolidado
+
+        relatorios = [build_report(sample_parsed_data_normal)] * 10
+        result = gerar_pdf_consolidado(relatorios, logotipo=logotipo_png)
+
+        with fitz.open(stream=result.read(), filetype="pdf") as pdf:
+            xrefs = {img[0] for page in pdf for img in page.get_images()}
+            assert pdf.page_count == 10
+            assert len(xrefs) == 1
+
+    @pytest.mark.unit
+    def test_ttf_font_embedded_once(self, sample_parsed_data_normal):
+        """A custom TrueType font should be embedded once for all pages"""
+        import os
+        import fitz
+        import reportlab
+        from diagnosis_engine import build_report
+        from exporter import gerar_pdf_consolidado
+
+        vera = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+
+        def fontes_embutidas(quantidade):
+            result = gerar_pdf_consolidado([build_report(sample_parsed_data_normal)] * quantidade, fonte_ttf=vera)
+            with fitz.open(stream=result.read(), filetype="pdf") as pdf:
+                assert "Diagnósticos prováveis:" in pdf[0].get_text()
+                return {f[0] for page in pdf for f in page.get_fonts()}
+
+        # reportlab embeds one subset per 256 glyphs; the count must not grow with pages
+        assert len(fontes_embutidas(10)) == len(fontes_embutidas(1))
+
+    @pytest.mark.unit
+    def test_writes_to_given_file(self, tmp_path):
+        """Should write straight to a file path instead of an in-memory buffer"""
+        from exporter import gerar_pdf_consolidado
+
+        destino = tmp_path / "sessao.pdf"
+        gerar_pdf_consolidado(["Paciente: A\nIdade: 1", "Paciente: B\nIdade: 2"], destino=str(destino))
+
+        assert destino.read_bytes().startswith(b"%PDF-")
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    def test_size_grows_linearly(self, sample_parsed_data_normal):
+        """Doubling the number of reports should roughly double the file size"""
+        from diagnosis_engine import build_report
+        from exporter import gerar_pdf_consolidado
+
+        relatorio = build_report(sample_parsed_data_normal)
+        tamanho_20 = len(gerar_pdf_consolidado([relatorio] * 20).getvalue())
+        tamanho_40 = len(gerar_pdf_consolidado([relatorio] * 40).getvalue())
+
+        assert tamanho_40 < 2.2 * tamanho_20
@@ -0,0 +1,97 @@
+"""
+Tests for graficos.py
+
+Tests trend point selection, PNG rendering and the on-disk chart cache.
+"""
+import io
+import pytest
+from unittest.mock import patch
+
+from graficos import (
+    chave_grafico,
+    desenhar_grafico,
+    grafico_tendencia,
+    graficos_relatorio,
+    pontos_tendencia,
+)
+
+SERIE = {
+    "data": ["2026-03-10", "2026-01-10", "2026-02-10", None, "2026-01-10"],
+    "analito": ["hemoglobina", "hemoglobina", "hemoglobina", "hemoglobina", "pth"],
+    "valor": [11.2, 9.1, 10.0, 8.0, 700.0],
+}
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+class TestPontosTendencia:
+    """Tests for trend point selection"""
+
+    @pytest.mark.unit
+    def test_sorted_by_date_without_undated(self):
+        """Should return dated points in chronological order"""
+        assert pontos_tendencia(SERIE, "hemoglobina") == [
+            ("2026-01-10", 9.1), ("2026-02-10", 10.0), ("2026-03-10", 11.2)
+        ]
+
+    @pytest.mark.unit
+    def test_other_analytes_ignored(self):
+        """Should only return points of the requested analyte"""
+        assert pontos_tendencia(SERIE, "pth") == [("2026-01-10", 700.0)]
+        assert pontos_tendencia(SERIE, "fosforo") == []
+
+
+class TestGraficos:
+    """Tests for chart rendering and caching"""
+
+    @pytest.mark.unit
+    def test_renders_png(self):
+        """Should render a PNG of the configured size"""
+        from PIL import Image
+
+        png = desenhar_grafico("hemoglobina", [("2026-01-10", 9.1), ("2026-02-10", 10.0)])
+
+        imagem = Image.open(io.BytesIO(png))
+        assert imagem.format == "PNG"
+        assert imagem.size == (480, 200)
+
+    @pytest.mark.unit
+    def test_constant_values(self):
+        """Should render flat series without dividing by zero"""
+        assert desenhar_grafico("pth", [("2026-01-10", 500.0), ("2026-02-10", 500.0)])
+
+    @pytest.mark.unit
+    def test_cached_chart_not_redrawn(self, cache_dir):
+        """Same patient, analyte and points should reuse the cached PNG"""
+        pontos = [("2026-01-10", 9.1), ("2026-02-10", 10.0)]
+
+        with patch("graficos.desenhar_grafico", wraps=desenhar_grafico) as desenhar:
+            primeiro = grafico_tendencia("Maria|01/01/1960", "hemoglobina", pontos)
+            segundo = grafico_tendencia("Maria|01/01/1960", "hemoglobina", pontos)
+
+        assert primeiro == segundo
+        assert desenhar.call_count == 1
+        assert (cache_dir / "graficos" / chave_grafico("Maria|01/01/1960", "hemoglobina", pontos)).exists()
+
+    @pytest.mark.unit
+    def test_cache_key_depends_on_data(self):
+        """Different points or patients should not share a cache entry"""
+        pontos = [("2026-01-10", 9.1), ("2026-02-10", 10.0)]
+        assert chave_grafico("A", "hemoglobina", pontos) != chave_grafico("B", "hemoglobina", pontos)
+        assert chave_grafico("A", "hemoglobina", pontos) != chave_grafico("A", "hemoglobina", pontos[:1])
+
+    @pytest.mark.unit
+    def test_report_charts_need_two_points(self):
+        """Should only chart trend analytes with at least two dated results"""
+        relatorio = {"meta": {"nome": "Maria"}, "serie": SERIE}
+
+        assert [analito for analito, _ in graficos_relatorio(relatorio)] == ["hemoglobina"]
+
+    @pytest.mark.unit
+    def test_report_without_series(self):
+        """Reports without a series have no charts"""
+        assert graficos_relatorio({"meta": {"nome": "Maria"}}) == []
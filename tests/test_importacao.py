@@ -0,0 +1,59 @@
+"""
+Import-time budget for the entry points
+
+Runs `python -X importtime` in a fresh interpreter, so the numbers are those of
+a cold start: PyMuPDF, reportlab, python-docx and supabase must only load on
+first use.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Cumulative import time allowed for each entry point (ms); override on slow machines
+ORCAMENTO_MS = int(os.getenv("PCDT_ORCAMENTO_IMPORTACAO_MS", "400"))
+
+PESADOS = {"fitz", "pymupdf", "reportlab", "docx", "supabase", "PIL", "streamlit"}
+
+MODULOS = ["api", "monitor_pasta", "pdf_parser", "supabase_client", "servico_exportacao", "reavaliacao"]
+
+
+def importar(modulo):
+    """Imports `modulo` in a new interpreter; returns ({top-level package: cumulative us}, total us)."""
+    ambiente = dict(os.environ, SUPABASE_URL="https://test.supabase.co", SUPABASE_KEY="test-key")
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, env=ambiente, capture_output=True, text=True, check=True,
+    ).stderr
+
+    pacotes = {}
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, cumulativo, nome = linha[len("import time:"):].split("|")
+        if not cumulativo.strip().isdigit():
+            continue
+        pacotes[nome.strip().split(".")[0]] = int(cumulativo)
+    return pacotes, pacotes[modulo]
+
+
+class TestTempoImportacao:
+    """Tests for lazy loading of heavy dependencies"""
+
+    @pytest.mark.slow
+    @pytest.mark.parametrize("modulo", MODULOS)
+    def test_heavy_libraries_load_lazily(self, modulo):
+        """Importing an entry point should not load PDF, DOCX or database libraries"""
+        pacotes, _ = importar(modulo)
+        assert PESADOS.isdisjoint(pacotes), sorted(PESADOS & set(pacotes))
+
+    @pytest.mark.slow
+    @pytest.mark.parametrize("modulo", MODULOS)
+    def test_import_within_budget(self, modulo):
+        """Cold import of an entry point should stay within the time budget"""
+        _, total = importar(modulo)
+        assert total / 1000 < ORCAMENTO_MS
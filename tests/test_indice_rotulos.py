@@ -0,0 +1,53 @@
+"""
+Tests for indice_rotulos.py
+
+Tests the Aho–Corasick label index used to find analyte labels in one pass.
+"""
+import pytest
+from indice_rotulos import IndiceRotulos
+
+
+class TestIndiceRotulos:
+    """Tests for multi-label search"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_finds_every_label_in_text_order(self):
+        """Every occurrence of every label is returned with its value, in order"""
+        indice = IndiceRotulos({"hemoglobina": "hb", "pth": "pth", "ferritina": "fe"})
+        texto = "pth: 700 hemoglobina: 9 ferritina: 80 pth: 650"
+
+        assert indice.buscar(texto) == [
+            (0, 3, "pth"), (9, 20, "hb"), (24, 33, "fe"), (38, 41, "pth"),
+        ]
+
+    @pytest.mark.unit
+    def test_overlapping_outputs_via_failure_links(self):
+        """Raw occurrences include labels that are suffixes of others (classic he/she/hers)"""
+        indice = IndiceRotulos({"he": 1, "she": 2, "his": 3, "hers": 4})
+        assert sorted(indice.ocorrencias("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+
+    @pytest.mark.unit
+    def test_longest_label_wins_at_same_start(self):
+        """'data da coleta' is one hit, not also 'coleta'"""
+        indice = IndiceRotulos({"coleta": "c", "data da coleta": "d"})
+        assert indice.buscar("data da coleta: 01/02/2024 coleta") == [(0, 14, "d"), (27, 33, "c")]
+
+    @pytest.mark.unit
+    def test_whole_words_only(self):
+        """A label inside a longer word is not a hit"""
+        indice = IndiceRotulos({"pth": "pth", "kt/v": "ktv"})
+        assert indice.buscar("depth pthrp kt/v: 1.2") == [(12, 16, "ktv")]
+
+    @pytest.mark.unit
+    def test_no_labels_or_no_text(self):
+        """Empty catalogue and empty text return nothing"""
+        assert IndiceRotulos({}).buscar("hemoglobina") == []
+        assert IndiceRotulos({"pth": 1}).buscar("") == []
+
+    @pytest.mark.unit
+    def test_large_catalogue(self):
+        """Hundreds of labels sharing prefixes are still matched exactly"""
+        rotulos = {f"exame {numero}": numero for numero in range(500)}
+        indice = IndiceRotulos(rotulos)
+        assert [valor for _, _, valor in indice.buscar("exame 12: 1 exame 499: 2 exame 7")] == [12, 499, 7]
@@ -0,0 +1,154 @@
+"""
+Tests for ingestao_estruturada.py
+
+Tests FHIR and HL7 v2 ingestion into the analyze_exam_text format.
+"""
+import json
+import pytest
+
+from diagnosis_engine import generate_report
+from ingestao_estruturada import ingerir_arquivo, ler_fhir, ler_hl7, valor_canonico
+
+
+def _observacao(loinc, valor, unidade, data, paciente="Patient/p1", **extra):
+    return dict({
+        "resourceType": "Observation",
+        "status": "final",
+        "code": {"coding": [{"system": "http://loinc.org", "code": loinc}]},
+        "subject": {"reference": paciente},
+        "effectiveDateTime": data,
+        "valueQuantity": {"value": valor, "unit": unidade, "system": "http://unitsofmeasure.org", "code": unidade},
+    }, **extra)
+
+
+PACIENTE = {
+    "resourceType": "Patient",
+    "id": "p1",
+    "name": [{"family": "Silva", "given": ["Maria"]}],
+    "birthDate": "1960-02-01",
+}
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    caminho = tmp_path / "resultados.json"
+    caminho.write_text(json.dumps({
+        "resourceType": "Bundle",
+        "type": "collection",
+        "entry": [
+            {"fullUrl": "urn:uuid:1", "resource": PACIENTE},
+            {"resource": _observacao("718-7", 9.1, "g/dL", "2026-01-10")},
+            {"resource": _observacao("718-7", 85, "g/L", "2026-02-10T08:00:00-03:00")},
+            {"resource": _observacao("2731-8", 70, "pmol/L", "2026-02-10")},
+            {"resource": _observacao("2777-1", 6.0, "mg/dL", "2026-02-10", status="entered-in-error")},
+            {"resource": _observacao("9999-9", 1.0, "mg/dL", "2026-02-10")},
+        ],
+    }), encoding="utf-8")
+    return caminho
+
+
+HL7 = "\r".join([
+    "MSH|^~\\&|LIS|LAB|PCDT|CLINICA|202603150830||ORU^R01|1|P|2.5",
+    "PID|1||123||Souza^João^Carlos||19551120|M",
+    "OBR|1|||PAINEL|||20260315",
+    "OBX|1|NM|718-7^Hemoglobina^LN||10,4|g/dL|12-16|L|||F",
+    "OBX|2|NM|2823-3^Potássio^LN||5.8|mmol/L|3.5-5.1|H|||F|||20260314",
+    "OBX|3|ST|2731-8^PTH^LN||<10|pg/mL||||F",
+    "OBX|4|NM|1751-7^Albumina^LN||3.1|g/dL|||||X",
+    "MSH|^~\\&|LIS|LAB|PCDT|CLINICA|202603150900||ORU^R01|2|P|2.5",
+    "PID|1||456||Lima^Ana||19700101|F",
+    "OBX|1|NM|2731-8^PTH^LN||820|pg/mL||H|||F",
+]) + "\r"
+
+
+class TestFhir:
+    """Tests for FHIR Observation ingestion"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_bundle_maps_loinc_and_units(self, bundle):
+        """Should map LOINC codes to analytes and convert units to canonical"""
+        [exame] = list(ler_fhir(bundle))
+
+        assert exame["dados"]["hemoglobina"] == 8.5  # mais recente, 85 g/L
+        assert exame["dados"]["pth"] == 660.1
+        assert exame["dados"]["fosforo"] is None  # entered-in-error ignorado
+        assert exame["meta"]["nome"] == "Maria Silva"
+        assert exame["meta"]["data_nascimento"] == "01/02/1960"
+        assert exame["meta"]["idade"] == "66"
+
+    @pytest.mark.unit
+    def test_series_keeps_every_date(self, bundle):
+        """The series should carry every dated result for trend charts"""
+        [exame] = list(ler_fhir(bundle))
+        pares = list(zip(exame["serie"]["data"], exame["serie"]["analito"], exame["serie"]["valor"]))
+        assert ("2026-01-10", "hemoglobina", 9.1) in pares
+        assert ("2026-02-10", "hemoglobina", 8.5) in pares
+
+    @pytest.mark.unit
+    def test_feeds_generate_report(self, bundle):
+        """The ingested exam should go straight to generate_report"""
+        [exame] = list(ler_fhir(bundle))
+        relatorio = generate_report(exame)
+        assert "Anemia da DRC" in relatorio
+        assert "Hiperparatireoidismo secundário" in relatorio
+
+    @pytest.mark.unit
+    def test_ndjson_groups_by_patient(self, tmp_path):
+        """NDJSON resources should be grouped by subject"""
+        caminho = tmp_path / "obs.ndjson"
+        linhas = [PACIENTE, _observacao("718-7", 11, "g/dL", "2026-03-01"),
+                  _observacao("718-7", 9, "g/dL", "2026-03-01", paciente="Patient/p2")]
+        caminho.write_text("\n".join(json.dumps(l) for l in linhas) + "\n", encoding="utf-8")
+
+        exames = list(ingerir_arquivo(caminho))
+
+        assert [e["meta"]["nome"] for e in exames] == ["Maria Silva", "Não identificado"]
+        assert [e["dados"]["hemoglobina"] for e in exames] == [11, 9]
+
+
+class TestHl7:
+    """Tests for HL7 v2 ORU ingestion"""
+
+    @pytest.mark.unit
+    def test_one_exam_per_message(self, tmp_path):
+        """Should yield one exam per MSH with PID demographics"""
+        caminho = tmp_path / "lote.hl7"
+        caminho.write_text(HL7, encoding="utf-8", newline="")
+
+        primeiro, segundo = ler_hl7(caminho)
+
+        assert primeiro["meta"]["nome"] == "João Carlos Souza"
+        assert primeiro["meta"]["data_nascimento"] == "20/11/1955"
+        assert primeiro["dados"]["hemoglobina"] == 10.4
+        assert primeiro["dados"]["potassio"] == 5.8
+        assert primeiro["dados"]["pth"] is None  # valor textual "<10"
+        assert primeiro["dados"]["albumina"] is None  # OBX cancelado (X)
+        assert segundo["dados"]["pth"] == 820.0
+
+    @pytest.mark.unit
+    def test_observation_dates(self, tmp_path):
+        """OBX-14 should win over the OBR-7 request date"""
+        caminho = tmp_path / "lote.hl7"
+        caminho.write_text(HL7.replace("\r", "\n"), encoding="utf-8")
+
+        primeiro = next(ler_hl7(caminho))
+
+        datas = dict(zip(primeiro["serie"]["analito"], primeiro["serie"]["data"]))
+        assert datas == {"hemoglobina": "2026-03-15", "potassio": "2026-03-14"}
+
+
+class TestIngestao:
+    """Tests for format dispatch and unit handling"""
+
+    @pytest.mark.unit
+    def test_unknown_unit_dropped(self):
+        """Results in units the registry does not accept should be dropped"""
+        assert valor_canonico("hemoglobina", 9.0, "mg/dL") is None
+        assert valor_canonico("potassio", 4.0, "meq/L") == 4.0
+
+    @pytest.mark.unit
+    def test_unsupported_extension(self, tmp_path):
+        """Should reject files that are neither FHIR nor HL7"""
+        with pytest.raises(ValueError):
+            ingerir_arquivo(tmp_path / "exame.pdf")
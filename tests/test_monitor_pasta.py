@@ -0,0 +1,158 @@
+"""
+Tests for monitor_pasta.py
+
+Tests the watch-folder daemon: stability debounce, done/failed folders and progress.
+"""
+import json
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import auditoria
+from monitor_pasta import ARQUIVO_PROGRESSO, carregar_progresso, executar, hash_arquivo, mover
+
+
+@pytest.fixture(autouse=True)
+def isolamento(tmp_path, monkeypatch):
+    monkeypatch.setenv("PCDT_AUDIT_DIR", str(tmp_path / "auditoria"))
+    monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path / "cache"))
+    yield
+    auditoria.fechar()
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    caminho = tmp_path / "entrada"
+    caminho.mkdir()
+    return caminho
+
+
+def _pdf(caminho, texto="Paciente: Maria Silva\nHemoglobina: 8.5 g/dL"):
+    import fitz
+
+    with fitz.open() as pdf:
+        pagina = pdf.new_page()
+        for i, linha in enumerate(texto.split("\n")):
+            pagina.insert_text((72, 72 + 15 * i), linha)
+        pdf.save(caminho)
+
+
+def _rodar(pasta, ate, timeout=5, **kwargs):
+    """Runs the monitor on a background thread until `ate()` is true"""
+    parar = threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        thread = threading.Thread(target=executar, args=(pasta,), kwargs=dict(
+            intervalo=0.02, estabilidade=0.1, parar=parar, executor=executor, **kwargs
+        ))
+        thread.start()
+        limite = time.monotonic() + timeout
+        while not ate() and time.monotonic() < limite:
+            time.sleep(0.02)
+        parar.set()
+        thread.join()
+
+
+class TestMonitorPasta:
+    """Tests for the watch-folder loop"""
+
+    @pytest.mark.unit
+    @patch('supabase_client.salvar_analise', return_value=7)
+    @pytest.mark.parametrize("usar_watchdog", [True, False])
+    def test_pdf_processed_and_moved(self, salvar, pasta, usar_watchdog):
+        """A dropped PDF should be analysed, stored and moved to processados/"""
+        _pdf(pasta / "exame.pdf")
+        digest = hash_arquivo(pasta / "exame.pdf")
+
+        _rodar(pasta, lambda: (pasta / "processados" / "exame.pdf").exists(), usar_watchdog=usar_watchdog)
+
+        assert (pasta / "processados" / "exame.pdf").exists()
+        relatorio = salvar.call_args.args[0]
+        assert relatorio["diagnosticos"] == ["Anemia da DRC"]
+        assert carregar_progresso(pasta)[digest]["status"] == "processado"
+        assert carregar_progresso(pasta)[digest]["pacientes"] == [7]
+
+    @pytest.mark.unit
+    @patch('supabase_client.salvar_analise')
+    def test_broken_file_goes_to_failed(self, salvar, pasta):
+        """Unreadable files should be moved to falhas/ with the error recorded"""
+        (pasta / "quebrado.pdf").write_bytes(b"not a pdf")
+
+        _rodar(pasta, lambda: (pasta / "falhas" / "quebrado.pdf").exists())
+
+        assert (pasta / "falhas" / "quebrado.pdf").exists()
+        [registro] = carregar_progresso(pasta).values()
+        assert registro["status"] == "falha" and registro["erro"]
+        assert not salvar.called
+
+    @pytest.mark.unit
+    @patch('supabase_client.salvar_analise')
+    def test_file_still_being_written_waits(self, salvar, pasta):
+        """A file that keeps changing should not be picked up"""
+        caminho = pasta / "copiando.pdf"
+        caminho.write_bytes(b"%PDF-")
+        parar = threading.Event()
+
+        def escrever():
+            while not parar.is_set():
+                with open(caminho, "ab") as arquivo:
+                    arquivo.write(b"x")
+                time.sleep(0.02)
+
+        escritor = threading.Thread(target=escrever)
+        escritor.start()
+        try:
+            _rodar(pasta, lambda: False, timeout=0.5)
+        finally:
+            parar.set()
+            escritor.join()
+
+        assert caminho.exists()
+        assert carregar_progresso(pasta) == {}
+
+    @pytest.mark.unit
+    @patch('supabase_client.salvar_analise')
+    def test_already_stored_file_not_reprocessed(self, salvar, pasta):
+        """After a restart, files recorded as processed are only moved"""
+        _pdf(pasta / "exame.pdf")
+        progresso = {hash_arquivo(pasta / "exame.pdf"): {"status": "processado"}}
+        (pasta / ARQUIVO_PROGRESSO).write_text(json.dumps(progresso), encoding="utf-8")
+
+        _rodar(pasta, lambda: (pasta / "processados" / "exame.pdf").exists())
+
+        assert (pasta / "processados" / "exame.pdf").exists()
+        assert not salvar.called
+
+    @pytest.mark.unit
+    @patch('supabase_client.salvar_analise', return_value=None)
+    def test_structured_file(self, salvar, pasta):
+        """HL7 files should go through structured ingestion"""
+        (pasta / "resultado.hl7").write_text(
+            "MSH|^~\\&|LIS|LAB|||202603150830||ORU^R01|1|P|2.5\r"
+            "PID|1||1||Lima^Ana||19700101|F\r"
+            "OBX|1|NM|2731-8^PTH^LN||820|pg/mL||H|||F\r",
+            encoding="utf-8", newline="",
+        )
+
+        _rodar(pasta, lambda: (pasta / "processados" / "resultado.hl7").exists())
+
+        assert salvar.call_args.args[0]["dados"]["pth"] == 820.0
+
+
+class TestMover:
+    """Tests for moving files to the result folders"""
+
+    @pytest.mark.unit
+    def test_name_collision_keeps_both(self, tmp_path):
+        """Moving onto an existing name should not overwrite it"""
+        destino = tmp_path / "processados"
+        destino.mkdir()
+        (destino / "a.pdf").write_bytes(b"antigo")
+        (tmp_path / "a.pdf").write_bytes(b"novo")
+
+        alvo = mover(tmp_path / "a.pdf", destino)
+
+        assert alvo != destino / "a.pdf"
+        assert (destino / "a.pdf").read_bytes() == b"antigo"
+        assert alvo.read_bytes() == b"novo"
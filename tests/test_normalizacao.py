@@ -0,0 +1,77 @@
+"""
+Tests for normalizacao.py
+
+Tests the canonical text used by the extractors and the offset map back to the original.
+"""
+import pytest
+from normalizacao import dobrar_caractere, normalizar, posicao_original, trecho_original
+
+
+class TestNormalizar:
+    """Tests for the single normalization pass"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_case_accents_and_decimal_comma(self):
+        """Should casefold, strip accents and use a decimal point"""
+        assert normalizar("CÁLCIO: 9,2 mg/dL")[0] == "calcio: 9.2 mg/dl"
+
+    @pytest.mark.unit
+    def test_whitespace_collapsed(self):
+        """Runs of spaces, tabs, newlines and non-breaking spaces become one space"""
+        assert normalizar("PTH: \t 750\n\n pg/mL")[0] == "pth: 750 pg/ml"
+
+    @pytest.mark.unit
+    def test_ligatures_and_invisible_characters(self):
+        """NFKC expands ligatures; soft hyphens and zero-width characters disappear"""
+        assert normalizar("Ferritina \ufb01nal ure\u00adia")[0] == "ferritina final ureia"
+        assert dobrar_caractere("\u200b") == ""
+
+    @pytest.mark.unit
+    def test_hyphenated_line_break_joined(self):
+        """A word split across lines is joined back; other hyphens are kept"""
+        assert normalizar("Hemo-\nglobina: 10 g/dL")[0] == "hemoglobina: 10 g/dl"
+        assert normalizar("Kt/V: 1,2 - 1,4")[0] == "kt/v: 1.2 - 1.4"
+
+    @pytest.mark.unit
+    def test_commas_outside_numbers_kept(self):
+        """Only a comma between digits is a decimal separator"""
+        assert normalizar("Cálcio, Fósforo: 4, 5")[0] == "calcio, fosforo: 4, 5"
+
+
+class TestPosicoes:
+    """Tests for the offset map"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_spans_map_back_to_original(self):
+        """Any span of the normalized text maps to the text it came from"""
+        original = "Paciente  Maria\nFÓSFORO:   5,6 mg/dL"
+        normalizado, mapa = normalizar(original)
+        inicio = normalizado.index("fosforo")
+        fim = normalizado.index("mg/dl") + len("mg/dl")
+
+        inicio_original, fim_original = trecho_original(mapa, inicio, fim)
+        assert original[inicio_original:fim_original] == "FÓSFORO:   5,6 mg/dL"
+
+    @pytest.mark.unit
+    def test_expanded_characters_share_position(self):
+        """Every character produced by a ligature points at the ligature"""
+        original = "a\ufb01b"
+        normalizado, mapa = normalizar(original)
+        assert normalizado == "afib"
+        assert [posicao_original(mapa, i) for i in range(5)] == [0, 1, 1, 2, 3]
+        assert trecho_original(mapa, 1, 3) == (1, 2)
+
+    @pytest.mark.unit
+    def test_empty_span(self):
+        """An empty span at the end maps to the end of the original"""
+        normalizado, mapa = normalizar("PTH  ")
+        assert trecho_original(mapa, len(normalizado), len(normalizado)) == (5, 5)
+
+    @pytest.mark.unit
+    def test_plain_ascii_has_single_breakpoint(self):
+        """Single-spaced ASCII text maps one-to-one without per-character entries"""
+        normalizado, (inicios_normalizado, _) = normalizar("Hemoglobina: 10,5 g/dL\nPTH: 750 pg/mL")
+        assert normalizado == "hemoglobina: 10.5 g/dl pth: 750 pg/ml"
+        assert list(inicios_normalizado) == [0]
@@ -209,3 +209,330 @@ class TestExtractTextFromPDF:
         assert "Page 50" in result
         assert isinstance(result, str)
         assert len(result) > 1000  # Should have substantial content
+
+
+def _scanned_pdf(pages=1):
+    """Builds a PDF whose pages contain only an image (no text layer)"""
+    from PIL import Image
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for numero in range(pages):
+        imagem = Image.new("RGB", (200, 100), (255, 255 - numero, 255))
+        c.drawImage(ImageReader(imagem), 100, 500, 200, 100)
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def _mixed_pdf(paginas):
+    """Builds a PDF from a list of pages: lines of text, or None for an image-only page"""
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for numero, linhas in enumerate(paginas):
+        if linhas is None:
+            imagem = Image.new("RGB", (200, 100), (255, 255 - numero, 255))
+            c.drawImage(ImageReader(imagem), 100, 500, 200, 100)
+        else:
+            for i, linha in enumerate(linhas):
+                c.drawString(100, 750 - i * 20, linha)
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+class TestOCRFallback:
+    """Tests for OCR of scanned pages and the per-page cache"""
+
+    @pytest.fixture(autouse=True)
+    def cache_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path))
+        return tmp_path
+
+    @pytest.mark.unit
+    def test_scanned_page_uses_ocr(self, monkeypatch):
+        """Should fill in text for image-only pages via OCR"""
+        import pdf_parser
+        monkeypatch.setattr(pdf_parser, "_ocr_png", lambda png: "Hemoglobina: 9.0 g/dL")
+
+        result = extract_text_from_pdf(_scanned_pdf(), ocr_workers=1)
+
+        assert "Hemoglobina: 9.0 g/dL" in result
+
+    @pytest.mark.unit
+    def test_ocr_output_is_cached_per_page(self, monkeypatch, cache_dir):
+        """Should not run OCR again for a page already in the cache"""
+        import pdf_parser
+        chamadas = []
+
+        def fake_ocr(png):
+            chamadas.append(png)
+            return "PTH: 700 pg/mL"
+
+        monkeypatch.setattr(pdf_parser, "_ocr_png", fake_ocr)
+        pdf_bytes = _scanned_pdf().getvalue()
+
+        primeiro = extract_text_from_pdf(io.BytesIO(pdf_bytes), ocr_workers=1)
+        segundo = extract_text_from_pdf(io.BytesIO(pdf_bytes), ocr_workers=1)
+
+        assert primeiro == segundo == "PTH: 700 pg/mL"
+        assert len(chamadas) == 1
+        assert len(list((cache_dir / "ocr").iterdir())) == 1
+
+    @pytest.mark.unit
+    def test_pages_with_text_layer_skip_ocr(self, monkeypatch):
+        """Should never OCR pages that already have text"""
+        import pdf_parser
+        from reportlab.pdfgen import canvas
+
+        monkeypatch.setattr(pdf_parser, "_ocr_png", lambda png: pytest.fail("OCR should not run"))
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer)
+        c.drawString(100, 750, "Hemoglobina: 11.5 g/dL")
+        c.save()
+        buffer.seek(0)
+
+        assert "Hemoglobina" in extract_text_from_pdf(buffer)
+
+    @pytest.mark.unit
+    def test_ocr_disabled(self, monkeypatch):
+        """Should leave scanned pages empty when OCR is turned off"""
+        import pdf_parser
+        monkeypatch.setattr(pdf_parser, "_ocr_png", lambda png: pytest.fail("OCR should not run"))
+
+        assert extract_text_from_pdf(_scanned_pdf(), ocr=False).strip() == ""
+
+    @pytest.mark.unit
+    def test_missing_ocr_engine_is_not_cached(self, monkeypatch, cache_dir):
+        """Should keep the page empty and retry later when no OCR engine exists"""
+        import pdf_parser
+        monkeypatch.setattr(pdf_parser, "_ocr_png", lambda png: None)
+
+        assert extract_text_from_pdf(_scanned_pdf(), ocr_workers=1) == ""
+        assert list((cache_dir / "ocr").iterdir()) == []
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    def test_multiple_scanned_pages_in_process_pool(self):
+        """Should OCR several pages in parallel and keep page order"""
+        result = extract_text_from_pdf(_scanned_pdf(pages=3), ocr_workers=2)
+        assert isinstance(result, str)
+
+
+class TestTriagemPaginas:
+    """Tests for the lab-page triage pre-pass"""
+
+    @pytest.mark.unit
+    def test_pontuar_pagina_lab_sheet_scores_high(self, sample_exam_text_normal):
+        """A lab result sheet should score well above the threshold"""
+        from pdf_parser import pontuar_pagina, LIMIAR_TRIAGEM
+        assert pontuar_pagina(sample_exam_text_normal) > LIMIAR_TRIAGEM
+
+    @pytest.mark.unit
+    def test_pontuar_pagina_prescription_scores_low(self):
+        """A prescription page should score below the threshold"""
+        from pdf_parser import pontuar_pagina, LIMIAR_TRIAGEM
+        receita = "Receituário\nUso contínuo\nLosartana 50 mg, 1 comprimido ao dia"
+        assert pontuar_pagina(receita) < LIMIAR_TRIAGEM
+
+    @pytest.mark.unit
+    def test_triar_paginas_falls_back_to_all_pages(self):
+        """Should keep every page when none looks like a lab report"""
+        from pdf_parser import triar_paginas
+        assert triar_paginas(["Termo de consentimento", "Receita"]) == [0, 1]
+
+    @pytest.mark.unit
+    def test_extract_only_lab_pages_from_bundle(self):
+        """Should drop non-lab pages from a mixed upload"""
+        from reportlab.pdfgen import canvas
+
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer)
+        c.drawString(100, 750, "Termo de consentimento livre e esclarecido")
+        c.showPage()
+        c.drawString(100, 750, "Hemoglobina: 9.5 g/dL")
+        c.drawString(100, 730, "Ferritina: 80 ng/mL")
+        c.showPage()
+        c.drawString(100, 750, "Receita: sevelamer 800 mg")
+        c.save()
+        buffer.seek(0)
+
+        result = extract_text_from_pdf(buffer, somente_laboratorio=True)
+
+        assert "Hemoglobina" in result
+        assert "consentimento" not in result
+        assert "Receita" not in result
+
+    @pytest.mark.unit
+    def test_identification_page_is_kept(self):
+        """A cover page with the patient's name and birth date must survive triage"""
+        buffer = _mixed_pdf([
+            ["Paciente: Maria Silva", "Data de Nascimento: 01/02/1960"],
+            ["Hemoglobina: 9.5 g/dL", "Ferritina: 80 ng/mL"],
+            ["Receita: sevelamer 800 mg"],
+        ])
+
+        result = extract_text_from_pdf(buffer, somente_laboratorio=True)
+
+        assert "Maria Silva" in result and "Hemoglobina" in result
+        assert "Receita" not in result
+
+    @pytest.mark.unit
+    def test_scanned_pages_triaged_after_ocr(self, monkeypatch, tmp_path):
+        """Scanned pages are OCR'd and triaged on the OCR text even when the text layer has lab pages"""
+        import pdf_parser
+
+        monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path))
+        textos = iter([
+            "Paciente: Maria Silva",
+            "PTH: 700 pg/mL\nFósforo: 6.1 mg/dL\nCálcio: 9.0 mg/dL",
+            "Termo de consentimento",
+        ])
+        monkeypatch.setattr(pdf_parser, "_executar_ocr", lambda pngs, workers: [next(textos) for _ in pngs])
+        buffer = _mixed_pdf([
+            None, ["Hemoglobina: 9.5 g/dL", "Ferritina: 80 ng/mL"], None, ["Receita: sevelamer 800 mg"], None,
+        ])
+
+        result = extract_text_from_pdf(buffer, ocr_workers=1, somente_laboratorio=True)
+
+        assert result.startswith("Paciente: Maria Silva") and "Hemoglobina" in result
+        assert "PTH: 700 pg/mL" in result  # folha de laboratório escaneada depois da primeira página
+        assert "consentimento" not in result and "Receita" not in result
+
+    @pytest.mark.unit
+    def test_text_pages_outside_triage_skip_ocr(self, monkeypatch, tmp_path):
+        """Only image-only pages go to OCR; text pages dropped by triage are not rendered"""
+        import pdf_parser
+
+        monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path))
+        ocr = []
+        monkeypatch.setattr(pdf_parser, "_ocr_png", lambda png: ocr.append(png) or "Termo de consentimento")
+        buffer = _mixed_pdf([["Hemoglobina: 9.5 g/dL", "Ferritina: 80 ng/mL"], ["Receita: sevelamer 800 mg"], None])
+
+        result = extract_text_from_pdf(buffer, ocr_workers=1, somente_laboratorio=True)
+
+        assert len(ocr) == 1
+        assert result.startswith("Hemoglobina") and "Receita" not in result and "consentimento" not in result
+
+    @pytest.mark.unit
+    def test_fully_scanned_exam_triaged_after_ocr(self, monkeypatch, tmp_path):
+        """Without a usable text layer every page is OCR'd and triaged on the OCR text"""
+        import pdf_parser
+
+        monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path))
+        textos = iter(["Termo de consentimento", "Hemoglobina: 9.5 g/dL Ferritina: 80 ng/mL"])
+        monkeypatch.setattr(pdf_parser, "_executar_ocr", lambda pngs, workers: [next(textos) for _ in pngs])
+
+        result = extract_text_from_pdf(_scanned_pdf(pages=2), ocr_workers=1, somente_laboratorio=True)
+
+        assert result == "Hemoglobina: 9.5 g/dL Ferritina: 80 ng/mL"
+
+
+def _text_pdf(pages):
+    """Builds a text PDF with one numbered line per page"""
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for numero in range(pages):
+        c.drawString(100, 750, f"Pagina {numero}")
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+class TestLimites:
+    """Tests for size/page limits, upload spooling and page windows"""
+
+    @pytest.fixture(autouse=True)
+    def cache_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("PCDT_CACHE_DIR", str(tmp_path / "cache"))
+        return tmp_path
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_size_limit(self):
+        """Should refuse a PDF larger than max_bytes without parsing it"""
+        from pdf_parser import ArquivoGrandeDemais
+
+        with pytest.raises(ArquivoGrandeDemais, match="limite"):
+            extract_text_from_pdf(_text_pdf(3), max_bytes=100)
+
+    @pytest.mark.unit
+    def test_page_limit(self):
+        """Should refuse a PDF with more pages than max_paginas"""
+        from pdf_parser import ArquivoGrandeDemais
+
+        with pytest.raises(ArquivoGrandeDemais, match="páginas"):
+            extract_text_from_pdf(_text_pdf(5), max_paginas=4)
+        assert "Pagina 3" in extract_text_from_pdf(_text_pdf(4), max_paginas=4)
+
+    @pytest.mark.unit
+    def test_limit_error_is_a_value_error(self):
+        """Callers that already handle ValueError keep working"""
+        with pytest.raises(ValueError):
+            extract_text_from_pdf(_text_pdf(2), max_paginas=1)
+
+    @pytest.mark.unit
+    def test_large_upload_spooled_to_temp_file(self, monkeypatch, cache_dir):
+        """Uploads over the in-memory threshold go through a temp file that is removed afterwards"""
+        import tempfile
+        import pdf_parser
+
+        monkeypatch.setattr(pdf_parser, "LIMITE_MEMORIA_UPLOAD", 64)
+        monkeypatch.setattr(pdf_parser, "_BLOCO", 100)
+        monkeypatch.setattr(tempfile, "tempdir", str(cache_dir))
+
+        result = extract_text_from_pdf(_text_pdf(3))
+
+        assert "Pagina 0" in result and "Pagina 2" in result
+        assert list(cache_dir.glob("*.pdf")) == []
+
+    @pytest.mark.unit
+    def test_file_on_disk_opened_by_path(self, monkeypatch, tmp_path):
+        """An open regular file is read from disk, never copied into memory"""
+        import pdf_parser
+
+        caminho = tmp_path / "exame.pdf"
+        caminho.write_bytes(_text_pdf(2).getvalue())
+        monkeypatch.setattr(pdf_parser, "_spool", lambda *a: pytest.fail("should not copy"))
+
+        with open(caminho, "rb") as arquivo:
+            assert "Pagina 1" in extract_text_from_pdf(arquivo)
+
+    @pytest.mark.unit
+    def test_upload_name_matching_other_file_is_not_trusted(self, tmp_path, monkeypatch):
+        """An in-memory upload whose name matches a file on disk is still read from memory"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "exame.pdf").write_bytes(b"outro arquivo")
+        upload = _text_pdf(1)
+        upload.name = "exame.pdf"
+
+        assert "Pagina 0" in extract_text_from_pdf(upload)
+
+    @pytest.mark.unit
+    def test_ocr_runs_per_page_window(self, monkeypatch):
+        """Only one window of rendered pages is held for OCR at a time, in page order"""
+        import pdf_parser
+
+        lotes = []
+        monkeypatch.setattr(pdf_parser, "JANELA_PAGINAS", 2)
+        monkeypatch.setattr(
+            pdf_parser, "_executar_ocr",
+            lambda pngs, workers: lotes.append(len(pngs)) or [f"ocr{len(lotes)}-{i} " for i in range(len(pngs))],
+        )
+
+        result = extract_text_from_pdf(_scanned_pdf(pages=5), ocr_workers=1)
+
+        assert lotes == [2, 2, 1]
+        assert result == "ocr1-0 ocr1-1 ocr2-0 ocr2-1 ocr3-0 "
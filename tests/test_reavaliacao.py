@@ -0,0 +1,99 @@
+"""
+Tests for reavaliacao.py
+
+Tests incremental re-evaluation of stored reports with a mocked Supabase client.
+"""
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+
+from diagnosis_engine import VERSAO_REGRAS, REGRAS, assinaturas_regras
+
+
+def _assinaturas_com_limiar(analito, limiar):
+    """Signatures of a rule set where one analyte had a different threshold"""
+    regras = [dict(r, limiar=limiar) if r["analito"] == analito else r for r in REGRAS]
+    return assinaturas_regras(regras)
+
+
+class TestReavaliarRelatorio:
+    """Tests for recomputing a single stored row"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_recomputes_report_from_stored_dados(self):
+        """Should rebuild resumo and conteudo with the current rules"""
+        from reavaliacao import reavaliar_relatorio
+
+        linha = {
+            "id": 5,
+            "nome": "João Silva",
+            "idade": "65",
+            "modalidade": "Hemodiálise",
+            "dados": {"hemoglobina": 8.0, "pth": 700.0},
+        }
+        atualizacao = reavaliar_relatorio(linha)
+
+        assert atualizacao["id"] == 5
+        assert atualizacao["resumo"] == "Anemia da DRC, Hiperparatireoidismo secundário"
+        assert "João Silva" in atualizacao["conteudo"]
+        assert atualizacao["versao_regras"] == VERSAO_REGRAS
+
+
+class TestReavaliarVersao:
+    """Tests for batch re-evaluation of one rule-set version"""
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_only_touched_analytes_are_selected(self, mock_supabase):
+        """Should filter rows by the analytes whose rules changed"""
+        from reavaliacao import reavaliar_versao
+
+        tabela = MagicMock()
+        mock_supabase.table.return_value = tabela
+        consulta = tabela.select.return_value.eq.return_value.or_.return_value
+        consulta.gt.return_value.order.return_value.limit.return_value.execute.return_value = Mock(data=[])
+
+        total = reavaliar_versao("antiga", _assinaturas_com_limiar("pth", 800))
+
+        assert total == 0
+        tabela.select.return_value.eq.return_value.or_.assert_called_once_with("dados->>pth.not.is.null")
+        tabela.update.assert_called_once_with({"versao_regras": VERSAO_REGRAS})
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_rows_written_back_in_bulk_per_batch(self, mock_supabase):
+        """Should issue one upsert per batch and page by id"""
+        from reavaliacao import reavaliar_versao
+
+        tabela = MagicMock()
+        mock_supabase.table.return_value = tabela
+        limite = tabela.select.return_value.eq.return_value.or_.return_value.gt.return_value.order.return_value.limit
+        limite.return_value.execute.side_effect = [
+            Mock(data=[{"id": 1, "dados": {"hemoglobina": 9.0}}, {"id": 2, "dados": {"hemoglobina": 12.0}}]),
+            Mock(data=[{"id": 3, "dados": {"hemoglobina": 7.0}}]),
+        ]
+
+        total = reavaliar_versao("antiga", _assinaturas_com_limiar("hemoglobina", 11), tamanho_lote=2)
+
+        assert total == 3
+        assert tabela.upsert.call_count == 2
+        primeiro_lote = tabela.upsert.call_args_list[0].args[0]
+        assert [linha["id"] for linha in primeiro_lote] == [1, 2]
+        assert tabela.upsert.call_args_list[0].kwargs == {"on_conflict": "id"}
+        tabela.select.return_value.eq.return_value.or_.return_value.gt.assert_called_with("id", 2)
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_unchanged_rules_skip_recomputation(self, mock_supabase):
+        """Should only bump the version when no analyte rule changed"""
+        from reavaliacao import reavaliar_versao
+
+        tabela = MagicMock()
+        mock_supabase.table.return_value = tabela
+
+        total = reavaliar_versao("antiga", assinaturas_regras())
+
+        assert total == 0
+        assert not tabela.select.called
+        assert not tabela.upsert.called
+        tabela.update.return_value.eq.assert_called_once_with("versao_regras", "antiga")
@@ -0,0 +1,80 @@
+"""
+Tests for registros.py
+
+Tests the slotted result records and their dict compatibility layer.
+"""
+import json
+import pickle
+import pytest
+
+from diagnosis_engine import analyze_exam_text, build_report
+from registros import Extracao, Metadados, ResultadoExame
+
+
+def _resultado():
+    return ResultadoExame(
+        dados={"hemoglobina": 9.5, "pth": None},
+        meta=Metadados(nome="Maria Silva", idade="60", data_nascimento="Não informada", modalidade="Hemodiálise"),
+        extracoes={"hemoglobina": Extracao(9.5, "g/dL", 1.0, [], (0, 21), (13, 16))},
+    )
+
+
+class TestRegistros:
+    """Tests for the record types"""
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_slotted_records_have_no_instance_dict(self):
+        """Records use __slots__: no per-instance __dict__ and no stray attributes"""
+        resultado = _resultado()
+        for registro in (resultado, resultado.meta, resultado.extracoes["hemoglobina"]):
+            assert not hasattr(registro, "__dict__")
+        with pytest.raises(AttributeError):
+            resultado.meta.apelido = "Mari"
+
+    @pytest.mark.unit
+    @pytest.mark.critical
+    def test_dict_style_access_still_works(self):
+        """Old code reading by key keeps working"""
+        resultado = _resultado()
+        assert resultado["meta"]["nome"] == "Maria Silva"
+        assert resultado["extracoes"]["hemoglobina"]["confianca"] == 1.0
+        assert resultado.get("inexistente", 0) == 0
+        assert dict(resultado.meta)["modalidade"] == "Hemodiálise"
+        with pytest.raises(KeyError):
+            resultado["inexistente"]
+
+    @pytest.mark.unit
+    def test_optional_fields_behave_as_missing_keys(self):
+        """extracoes/serie set to None are absent, as in the old dicts"""
+        resultado = ResultadoExame(dados={}, meta=_resultado().meta)
+        assert "serie" not in resultado and resultado.get("serie") is None
+        resultado["serie"] = {"data": [], "analito": [], "valor": []}
+        assert "serie" in resultado and resultado.serie["data"] == []
+
+    @pytest.mark.unit
+    def test_para_dict_is_json_ready(self):
+        """para_dict converts nested records into the old plain-dict format"""
+        convertido = _resultado().para_dict()
+        assert convertido["meta"] == {
+            "nome": "Maria Silva", "idade": "60", "data_nascimento": "Não informada", "modalidade": "Hemodiálise",
+        }
+        assert "serie" not in convertido
+        assert json.loads(json.dumps(convertido))["extracoes"]["hemoglobina"]["unidade"] == "g/dL"
+
+    @pytest.mark.unit
+    def test_records_pickle_for_process_pools(self):
+        """Records cross process boundaries (export and API pools)"""
+        resultado = _resultado()
+        assert pickle.loads(pickle.dumps(resultado)) == resultado
+
+    @pytest.mark.unit
+    def test_analyze_exam_text_returns_records(self):
+        """analyze_exam_text results support attribute access and feed build_report"""
+        resultado = analyze_exam_text("Paciente: Maria Silva\nHemoglobina: 9,5 g/dL")
+        assert isinstance(resultado, ResultadoExame)
+        assert resultado.meta.nome == "Maria Silva"
+        assert resultado.extracoes["hemoglobina"].valor == 9.5
+        relatorio = build_report(resultado)
+        assert relatorio["meta"]["nome"] == "Maria Silva"
+        assert isinstance(relatorio["meta"], dict)
@@ -0,0 +1,87 @@
+"""
+Tests for servico_exportacao.py
+
+Tests concurrent export rendering and in-flight request deduplication.
+"""
+import io
+import threading
+import pytest
+
+import servico_exportacao
+from servico_exportacao import exportar, hash_relatorio, submeter
+
+
+@pytest.fixture
+def renderizador_lento(monkeypatch):
+    """Replaces the PDF renderer with one that blocks until released"""
+    liberar = threading.Event()
+    chamadas = []
+
+    def renderizar(relatorio):
+        chamadas.append(relatorio)
+        liberar.wait(5)
+        return io.BytesIO(b"%PDF-fake")
+
+    monkeypatch.setitem(servico_exportacao.FORMATOS, "pdf", renderizar)
+    return liberar, chamadas
+
+
+class TestExportar:
+    """Tests for the export service"""
+
+    @pytest.mark.unit
+    def test_renders_pdf_and_docx(self, sample_parsed_data_anemia):
+        """Should return futures resolving to PDF and DOCX bytes"""
+        from diagnosis_engine import build_report
+
+        futuros = exportar(build_report(sample_parsed_data_anemia))
+
+        assert futuros["pdf"].result(timeout=10).startswith(b"%PDF-")
+        assert futuros["docx"].result(timeout=10).startswith(b"PK")
+
+    @pytest.mark.unit
+    def test_unknown_format_raises(self):
+        """Should reject formats without a renderer"""
+        with pytest.raises(ValueError):
+            submeter("texto", "odt")
+
+    @pytest.mark.unit
+    def test_in_flight_requests_are_deduplicated(self, renderizador_lento):
+        """Identical requests while rendering should share one future"""
+        liberar, chamadas = renderizador_lento
+
+        primeiro = submeter({"meta": {"nome": "A"}}, "pdf")
+        segundo = submeter({"meta": {"nome": "A"}}, "pdf")
+        liberar.set()
+
+        assert primeiro is segundo
+        assert primeiro.result(timeout=5) == b"%PDF-fake"
+        assert len(chamadas) == 1
+
+    @pytest.mark.unit
+    def test_finished_requests_render_again(self, renderizador_lento):
+        """Once finished, a new request should start a new render"""
+        liberar, chamadas = renderizador_lento
+        liberar.set()
+
+        submeter("Relatório X", "pdf").result(timeout=5)
+        submeter("Relatório X", "pdf").result(timeout=5)
+
+        assert len(chamadas) == 2
+
+    @pytest.mark.unit
+    def test_different_reports_not_deduplicated(self, renderizador_lento):
+        """Different report contents should get separate futures"""
+        liberar, _ = renderizador_lento
+
+        primeiro = submeter("Relatório 1", "pdf")
+        segundo = submeter("Relatório 2", "pdf")
+        liberar.set()
+
+        assert primeiro is not segundo
+
+    @pytest.mark.unit
+    def test_hash_relatorio_ignores_key_order(self):
+        """Structured reports with the same content should hash identically"""
+        assert hash_relatorio({"a": 1, "b": [1, 2]}) == hash_relatorio({"b": [1, 2], "a": 1})
+        assert hash_relatorio("texto") != hash_relatorio("texto 2")
@@ -194,6 +194,22 @@ class TestRegistrarRelatorio:
         # Note: In production, credentials should come from environment variables
         # This is a known security issue that should be fixed
 
+    @pytest.mark.unit
+    def test_client_created_on_first_use(self):
+        """The client should be created once, on first access, and reused"""
+        import supabase_client
+
+        assert supabase_client._cliente() is supabase_client.supabase
+        assert supabase_client._cliente() is supabase_client._cliente_criado
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_patched_client_is_used(self, mock_supabase):
+        """Replacing supabase_client.supabase should redirect every query"""
+        import supabase_client
+
+        assert supabase_client._cliente() is mock_supabase
+
     @pytest.mark.unit
     @patch('supabase_client.supabase')
     def test_registrar_relatorio_preserves_special_characters(self, mock_supabase):
@@ -253,3 +269,396 @@ class TestRegistrarRelatorio:
         call_args = mock_table.insert.call_args[0][0]
         assert len(call_args["conteudo"]) > 10000
         assert call_args["conteudo"] == long_text
+
+
+class TestIdentidadePaciente:
+    """Tests for patient identity normalization and hashing"""
+
+    @pytest.mark.unit
+    def test_normalizar_nome_ignores_accents_case_and_particles(self):
+        """Name variants of the same patient should normalize identically"""
+        from supabase_client import normalizar_nome
+
+        assert normalizar_nome("José Márcio da Silva") == normalizar_nome("JOSE  MARCIO SILVA")
+        assert normalizar_nome("José Márcio da Silva") == "jose marcio silva"
+
+    @pytest.mark.unit
+    def test_normalizar_nome_placeholder_is_empty(self):
+        """Placeholder names from extraction should not produce an identity"""
+        from supabase_client import normalizar_nome
+
+        assert normalizar_nome("Não identificado") == ""
+        assert normalizar_nome(None) == ""
+
+    @pytest.mark.unit
+    def test_chave_paciente_uses_birth_date(self):
+        """Same name with different birth dates should be different patients"""
+        from supabase_client import chave_paciente
+
+        a = chave_paciente({"nome": "João Silva", "data_nascimento": "01/02/1960"})
+        b = chave_paciente({"nome": "Joao Silva", "data_nascimento": "01/02/1960"})
+        c = chave_paciente({"nome": "João Silva", "data_nascimento": "03/04/1970"})
+
+        assert a == b
+        assert a != c
+        assert len(a) == 64
+
+    @pytest.mark.unit
+    def test_chave_paciente_without_name_is_none(self):
+        """Unidentified patients should not get an identity key"""
+        from supabase_client import chave_paciente
+
+        assert chave_paciente({"nome": "Não identificado"}) is None
+        assert chave_paciente({}) is None
+
+    @pytest.mark.unit
+    def test_hash_exame_ignores_whitespace(self):
+        """Re-extractions with different spacing should hash identically"""
+        from supabase_client import hash_exame
+
+        assert hash_exame("Hemoglobina: 9.5 g/dL\n") == hash_exame("Hemoglobina:  9.5   g/dL")
+        assert hash_exame("Hemoglobina: 9.5 g/dL") != hash_exame("Hemoglobina: 9.6 g/dL")
+
+
+class TestRegistroDeduplicado:
+    """Tests for the patient upsert and deduplicated report path"""
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_registrar_paciente_upserts_by_identity(self, mock_supabase):
+        """Should upsert on the identity key and return the patient id"""
+        from supabase_client import registrar_paciente, chave_paciente
+
+        mock_supabase.table.return_value.upsert.return_value.execute.return_value = Mock(data=[{"id": 7}])
+        meta = {"nome": "João Silva", "data_nascimento": "01/02/1960", "modalidade": "Hemodiálise"}
+
+        paciente_id = registrar_paciente(meta)
+
+        assert paciente_id == 7
+        mock_supabase.table.assert_called_once_with("pacientes")
+        args, kwargs = mock_supabase.table.return_value.upsert.call_args
+        assert args[0]["chave_identidade"] == chave_paciente(meta)
+        assert args[0]["data_nascimento"] == "1960-02-01"
+        assert kwargs["on_conflict"] == "chave_identidade"
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_registrar_paciente_unidentified_skips_database(self, mock_supabase):
+        """Should not create a patient row without a usable name"""
+        from supabase_client import registrar_paciente
+
+        assert registrar_paciente({"nome": "Não identificado"}) is None
+        assert not mock_supabase.table.called
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_registrar_relatorio_with_exam_text_upserts_by_hash(self, mock_supabase):
+        """Should link the patient and ignore duplicate exams by content hash"""
+        from supabase_client import registrar_relatorio, hash_exame
+
+        mock_supabase.table.return_value.upsert.return_value.execute.return_value = Mock(data=[{"id": 3}])
+        meta = {"nome": "João Silva", "idade": "65", "modalidade": "Hemodiálise"}
+
+        registrar_relatorio(meta, "Resumo", "Relatório", texto_exame="Hemoglobina: 9 g/dL")
+
+        tabelas = [c.args[0] for c in mock_supabase.table.call_args_list]
+        assert tabelas == ["pacientes", "relatorios_pcdt"]
+        args, kwargs = mock_supabase.table.return_value.upsert.call_args
+        assert args[0]["paciente_id"] == 3
+        assert args[0]["hash_exame"] == hash_exame("Hemoglobina: 9 g/dL")
+        assert kwargs == {"on_conflict": "hash_exame", "ignore_duplicates": True}
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_buscar_historico_filters_by_patient_id(self, mock_supabase):
+        """History lookup should hit the patient row, not scan names"""
+        from supabase_client import buscar_historico_paciente
+
+        tabela = mock_supabase.table.return_value
+        tabela.select.return_value.eq.return_value.limit.return_value.execute.return_value = Mock(data=[{"id": 9}])
+        consulta = tabela.select.return_value.eq.return_value.order.return_value.limit.return_value
+        consulta.execute.return_value = Mock(data=[{"id": 1}, {"id": 2}])
+
+        historico = buscar_historico_paciente({"nome": "João Silva"})
+
+        assert historico == [{"id": 1}, {"id": 2}]
+        tabela.select.return_value.eq.assert_any_call("paciente_id", 9)
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_buscar_historico_unknown_patient(self, mock_supabase):
+        """Should return an empty history for patients never registered"""
+        from supabase_client import buscar_historico_paciente
+
+        tabela = mock_supabase.table.return_value
+        tabela.select.return_value.eq.return_value.limit.return_value.execute.return_value = Mock(data=[])
+
+        assert buscar_historico_paciente({"nome": "João Silva"}) == []
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_registrar_relatorio_stores_dados_and_rule_version(self, mock_supabase):
+        """Should store extracted values and the rule version for re-evaluation"""
+        import supabase_client
+        from diagnosis_engine import VERSAO_REGRAS
+
+        supabase_client._versoes_registradas.clear()
+        dados = {"hemoglobina": 9.0, "pth": None}
+
+        supabase_client.registrar_relatorio({"nome": "Test"}, "Resumo", "Texto", dados=dados)
+        supabase_client.registrar_relatorio({"nome": "Test"}, "Resumo", "Texto", dados=dados)
+
+        tabelas = [c.args[0] for c in mock_supabase.table.call_args_list]
+        assert tabelas == ["versoes_regras", "relatorios_pcdt", "relatorios_pcdt"]
+        call_args = mock_supabase.table.return_value.insert.call_args[0][0]
+        assert call_args["dados"] == dados
+        assert call_args["versao_regras"] == VERSAO_REGRAS
+
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_registrar_relatorio_estruturado(self, mock_supabase):
+        """Should persist the structure directly, without re-parsing text"""
+        import supabase_client
+        from diagnosis_engine import build_report
+
+        parsed = {
+            "dados": {"hemoglobina": 8.0, "pth": 700.0},
+            "meta": {"nome": "Test", "idade": "50", "modalidade": "Hemodiálise"},
+        }
+        relatorio = build_report(parsed)
+        supabase_client.registrar_relatorio_estruturado(relatorio)
+
+        call_args = mock_supabase.table.return_value.insert.call_args[0][0]
+        assert call_args["resumo"] == "Anemia da DRC, Hiperparatireoidismo secundário"
+        assert call_args["diagnosticos"] == ["Anemia da DRC", "Hiperparatireoidismo secundário"]
+        assert call_args["dados"] == parsed["dados"]
+        assert "Diagnósticos prováveis:" in call_args["conteudo"]
+        assert call_args["trilha"][0] == ["anemia_drc", "hemoglobina", 8.0, "<", 10, True]
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_collection_date_from_series(self, mock_supabase):
+        """The report should carry the latest collection date, not the upload date"""
+        import supabase_client
+        from diagnosis_engine import build_report
+
+        relatorio = build_report({
+            "dados": {"hemoglobina": 9.0},
+            "meta": {"nome": "Test"},
+            "serie": {"data": ["2024-01-10", None, "2024-03-05"], "analito": ["hemoglobina"] * 3, "valor": [9.0] * 3},
+        })
+        supabase_client.registrar_relatorio_estruturado(relatorio, data_padrao="2026-10-19")
+
+        assert mock_supabase.table.return_value.insert.call_args[0][0]["data_coleta"] == "2024-03-05"
+
+    @pytest.mark.unit
+    def test_collection_date_falls_back_to_default(self):
+        """Reports without dated results should use the default date"""
+        from supabase_client import data_coleta_relatorio
+
+        assert data_coleta_relatorio({"serie": {"data": [None]}}, "2026-10-19") == "2026-10-19"
+        assert data_coleta_relatorio({}) is None
+
+class TestRegistrarSerieResultados:
+    """Tests for the bulk write of a result series"""
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_whole_series_in_one_upsert(self, mock_supabase):
+        """Should write every (date, analyte, value) with a single call"""
+        from supabase_client import registrar_serie_resultados
+
+        serie = {
+            "data": ["2024-03-15", "2024-03-15", "2024-02-15"],
+            "analito": ["hemoglobina", "pth", "hemoglobina"],
+            "valor": [9.8, 700.0, 10.2],
+        }
+        total = registrar_serie_resultados(4, serie)
+
+        assert total == 3
+        mock_supabase.table.assert_called_once_with("resultados_laboratoriais")
+        args, kwargs = mock_supabase.table.return_value.upsert.call_args
+        assert len(args[0]) == 3
+        assert args[0][2] == {"paciente_id": 4, "data_coleta": "2024-02-15", "analito": "hemoglobina", "valor": 10.2}
+        assert kwargs["on_conflict"] == "paciente_id,data_coleta,analito"
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_undated_values_use_default_date(self, mock_supabase):
+        """Undated values should use data_padrao, or be skipped without it"""
+        from supabase_client import registrar_serie_resultados
+
+        serie = {"data": [None], "analito": ["pth"], "valor": [400.0]}
+
+        assert registrar_serie_resultados(4, serie) == 0
+        assert not mock_supabase.table.called
+        assert registrar_serie_resultados(4, serie, data_padrao="2024-05-01") == 1
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_unknown_patient_skips_write(self, mock_supabase):
+        """Should not write results that cannot be linked to a patient"""
+        from supabase_client import registrar_serie_resultados
+
+        serie = {"data": ["2024-03-15"], "analito": ["pth"], "valor": [400.0]}
+        assert registrar_serie_resultados(None, serie) == 0
+        assert not mock_supabase.table.called
+
+
+
+class TestResumoPacientes:
+    """Tests for the per-patient summary read by the dashboard"""
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_listar_without_filters(self, mock_supabase):
+        """Should read one page of resumo_pacientes, latest exam first"""
+        from supabase_client import listar_resumo_pacientes
+
+        consulta = mock_supabase.table.return_value.select.return_value
+        ordenada = consulta.order.return_value.order.return_value
+        ordenada.range.return_value.execute.return_value = Mock(data=[{"paciente_id": 3}], count=120)
+
+        itens, total = listar_resumo_pacientes(pagina=1, tamanho=50)
+
+        assert itens == [{"paciente_id": 3}] and total == 120
+        mock_supabase.table.assert_called_once_with("resumo_pacientes")
+        consulta.order.assert_called_once_with("ultimo_exame", desc=True)
+        ordenada.range.assert_called_once_with(50, 99)
+        assert not consulta.eq.called and not consulta.contains.called
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_listar_filters_by_modality_and_diagnosis(self, mock_supabase):
+        """Filters should map to the indexed modality and diagnosis columns"""
+        from supabase_client import listar_resumo_pacientes
+
+        consulta = mock_supabase.table.return_value.select.return_value
+        listar_resumo_pacientes(modalidade="Hemodiálise", diagnostico="Anemia da DRC")
+
+        consulta.eq.assert_called_once_with("modalidade", "Hemodiálise")
+        consulta.eq.return_value.contains.assert_called_once_with("diagnosticos", ["Anemia da DRC"])
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_contar_diagnosticos_reads_view(self, mock_supabase):
+        """Diagnosis counts should come from the aggregated view"""
+        from supabase_client import contar_diagnosticos
+
+        linhas = [{"diagnostico": "Anemia da DRC", "modalidade": "Hemodiálise", "pacientes": 4}]
+        mock_supabase.table.return_value.select.return_value.execute.return_value = Mock(data=linhas)
+
+        assert contar_diagnosticos() == linhas
+        mock_supabase.table.assert_called_once_with("contagem_diagnosticos")
+
+
+class TestFilaRevisao:
+    """Tests for the manual review queue"""
+
+    RELATORIO_OK = {
+        "meta": {"nome": "Maria Silva"},
+        "dados": {"hemoglobina": 9.5, "pth": None},
+        "revisar": [],
+    }
+
+    @pytest.mark.unit
+    def test_no_reason_for_clean_report(self):
+        """A named report with confident values needs no review"""
+        from supabase_client import motivos_revisao
+        assert motivos_revisao(self.RELATORIO_OK) == []
+
+    @pytest.mark.unit
+    def test_reasons_and_priority(self):
+        """Missing name/values should outrank ambiguous values"""
+        from supabase_client import motivos_revisao, prioridade_revisao
+
+        sem_nome = {"meta": {"nome": "Não identificado"}, "dados": {"pth": None}}
+        ambiguo = dict(self.RELATORIO_OK, revisar=["kt_v"])
+
+        assert motivos_revisao(sem_nome) == ["nome não identificado", "nenhum analito encontrado"]
+        assert motivos_revisao(ambiguo) == ["extração ambígua: kt_v"]
+        assert prioridade_revisao(motivos_revisao(sem_nome)) > prioridade_revisao(motivos_revisao(ambiguo))
+
+    @pytest.mark.unit
+    def test_reference_range_in_exam_gives_reason(self):
+        """A value read past a reference range should put the exam in the queue"""
+        from diagnosis_engine import analyze_exam_text, build_report
+        from supabase_client import motivos_revisao
+
+        relatorio = build_report(analyze_exam_text("Paciente: Maria Silva\nPTH 15 a 65 pg/mL 700 pg/mL"))
+
+        assert motivos_revisao(relatorio) == ["extração ambígua: pth"]
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_enfileirar_stores_excerpt_once_per_exam(self, mock_supabase):
+        """Should upsert by exam hash with the text around each ambiguous value"""
+        from supabase_client import enfileirar_revisao, hash_exame
+
+        texto = "Paciente: Maria Silva\nKt/V: 1,2 - 1,4\n"
+        relatorio = dict(self.RELATORIO_OK, revisar=["kt_v"])
+        extracoes = {"kt_v": {"trecho": (22, 31)}}
+
+        assert enfileirar_revisao(relatorio, texto, extracoes) == ["extração ambígua: kt_v"]
+
+        mock_supabase.table.assert_called_once_with("fila_revisao")
+        args, kwargs = mock_supabase.table.return_value.upsert.call_args
+        assert args[0]["hash_exame"] == hash_exame(texto)
+        assert "Kt/V: 1,2 - 1,4" in args[0]["trechos"]["kt_v"]
+        assert kwargs == {"on_conflict": "hash_exame", "ignore_duplicates": True}
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_enfileirar_skips_clean_report(self, mock_supabase):
+        """Reports without review reasons should not touch the queue"""
+        from supabase_client import enfileirar_revisao
+
+        assert enfileirar_revisao(self.RELATORIO_OK, "texto") == []
+        assert not mock_supabase.table.called
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_listar_loads_only_requested_page(self, mock_supabase):
+        """Should request a single page range and return the exact total"""
+        from supabase_client import listar_fila_revisao
+
+        consulta = mock_supabase.table.return_value.select.return_value.eq.return_value
+        ordenada = consulta.order.return_value.order.return_value
+        ordenada.range.return_value.execute.return_value = Mock(data=[{"id": 41}], count=45)
+
+        itens, total = listar_fila_revisao(pagina=2, tamanho=20)
+
+        assert itens == [{"id": 41}] and total == 45
+        ordenada.range.assert_called_once_with(40, 59)
+        assert mock_supabase.table.return_value.select.call_args.kwargs == {"count": "exact"}
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_reivindicar_is_conditional_update(self, mock_supabase):
+        """Claiming should only succeed when the conditional update hit the row"""
+        from supabase_client import reivindicar_revisao
+
+        filtro = mock_supabase.table.return_value.update.return_value.eq.return_value.or_
+        filtro.return_value.execute.return_value = Mock(data=[{"id": 7}])
+        assert reivindicar_revisao(7, "ana") is True
+
+        dados = mock_supabase.table.return_value.update.call_args.args[0]
+        assert dados["status"] == "em_revisao" and dados["revisor"] == "ana"
+        assert filtro.call_args.args[0].startswith("status.eq.pendente,and(status.eq.em_revisao,bloqueado_em.lt.")
+
+        filtro.return_value.execute.return_value = Mock(data=[])
+        assert reivindicar_revisao(7, "bruno") is False
+
+    @pytest.mark.unit
+    @patch('supabase_client.supabase')
+    def test_concluir_requires_own_claim(self, mock_supabase):
+        """Only the reviewer holding the claim can complete the item"""
+        from supabase_client import concluir_revisao
+
+        update = mock_supabase.table.return_value.update
+        update.return_value.eq.return_value.eq.return_value.eq.return_value.execute.return_value = Mock(data=[])
+
+        assert concluir_revisao(7, "bruno", {"kt_v": 1.2}) is False
+        update.return_value.eq.return_value.eq.assert_called_once_with("revisor", "bruno")
+        assert update.call_args.args[0]["dados_revisados"] == {"kt_v": 1.2}
@@ -0,0 +1,69 @@
+"""
+Tests for templates_relatorio.py
+
+Tests template compilation and rendering of structured reports.
+"""
+import pytest
+from templates_relatorio import (
+    compilar_template,
+    renderizar,
+    renderizar_texto,
+    renderizar_evolucao,
+)
+
+
+@pytest.fixture
+def relatorio_estruturado():
+    return {
+        "meta": {"nome": "João Silva", "idade": "65", "modalidade": "Hemodiálise"},
+        "dados": {"hemoglobina": 8.5},
+        "diagnosticos": ["Anemia da DRC"],
+        "condutas": ["Iniciar alfaepoetina e avaliar ferro sérico."],
+        "evolucao": renderizar_evolucao(["Anemia da DRC"]),
+    }
+
+
+class TestCompilarTemplate:
+    """Tests for template compilation"""
+
+    @pytest.mark.unit
+    def test_compiled_parts(self):
+        """Should split literals and fields once"""
+        assert compilar_template("Olá $nome!") == (("Olá ", "nome"), ("!", None))
+
+    @pytest.mark.unit
+    def test_braced_and_escaped_fields(self):
+        """Should support ${campo} and $$ like string.Template"""
+        compilado = compilar_template("${nome}x custa $$10")
+        assert renderizar(compilado, {"nome": "A"}) == "Ax custa $10"
+
+    @pytest.mark.unit
+    def test_invalid_placeholder_raises(self):
+        """Should reject malformed placeholders at compile time"""
+        with pytest.raises(ValueError):
+            compilar_template("Valor: $")
+
+
+class TestRenderizarTexto:
+    """Tests for text rendering of structured reports"""
+
+    @pytest.mark.unit
+    def test_default_template_sections(self, relatorio_estruturado):
+        """Should render the standard report layout"""
+        texto = renderizar_texto(relatorio_estruturado)
+        assert texto.startswith("Paciente: João Silva\nIdade: 65\nModalidade: Hemodiálise\n")
+        assert "\nDiagnósticos prováveis:\n- Anemia da DRC\n" in texto
+        assert "\nCondutas sugeridas:\n- Iniciar alfaepoetina" in texto
+        assert texto.endswith("compatíveis com Anemia da DRC. Seguir PCDT vigente.")
+
+    @pytest.mark.unit
+    def test_custom_unit_template(self, relatorio_estruturado):
+        """A unit-specific template should reuse the same structure"""
+        compilado = compilar_template("$nome ($modalidade): $diagnosticos_texto")
+        assert renderizar_texto(relatorio_estruturado, compilado) == "João Silva (Hemodiálise): Anemia da DRC"
+
+    @pytest.mark.unit
+    def test_evolucao_joins_diagnoses(self):
+        """Evolution text should list every diagnosis"""
+        texto = renderizar_evolucao(["Anemia da DRC", "Hiperparatireoidismo secundário"])
+        assert "Anemia da DRC, Hiperparatireoidismo secundário" in texto